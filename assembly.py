@@ -0,0 +1,390 @@
+"""
+Contains functionality for laying out trains of meshing gears.
+
+An Assembly places a list of external gears according to the pairs which
+mesh, calculating the center distance of each pair and rotating each gear
+so that its teeth fall into the spaces of the gear it meshes with:
+
+    pinion = gear.Gear(48, 20, 20)
+    wheel = gear.Gear(48, 60, 20)
+
+    # The wheel is to the right of the first pinion, and the second pinion
+    # is below the wheel
+    train = assembly.Assembly([pinion, wheel, pinion], [(0, 1, 0), (1, 2, 90)], bores=[0.125, 0.25, 0.125])
+
+    train.write_svg('train.svg', scale=500)
+
+When the assembly is written as an SVG or DXF, the first tooth of each
+distinct gear is written once (as an SVG ``g`` element within ``defs``, or
+a DXF block), and the teeth and gears refer to it (as SVG ``use`` elements
+or DXF inserts), so large trains are written quickly and compactly.
+
+"""
+
+import math
+
+from dxfwrite import DXFEngine as dxf
+from lxml import etree
+
+from geometry import compression, primitives, svg_utils
+import gear
+
+# The largest distance, as a fraction of the center distance, by which the
+# gears of a mesh between two gears which have already been placed (i.e.
+# which closes a loop) may be out of place
+MESH_TOLERANCE = 1e-9
+
+def _get_spec(g):
+    """
+    Get a value which is equal for gears which have the same geometry.
+
+    :param g: A gear.Gear object.
+
+    :returns: A tuple of the class of the gear and the attributes on which its geometry depends.
+    """
+
+    names = set()
+    for dependencies in g.CACHE_DEPENDENCIES.values():
+        names.update(dependencies)
+
+    return (g.__class__,) + tuple(getattr(g, name) for name in sorted(names))
+
+class Assembly(primitives.Geometry):
+    """
+    An immutable geometry made up of meshing gears.
+
+    Each mesh is a tuple in the form ``(i, j, direction)`` or
+    ``(i, j, direction, center_distance)``, where ``i`` and ``j`` are the
+    indices of the gears and ``direction`` is the angle, in degrees, of the
+    line from the center of gear ``i`` to the center of gear ``j``. The
+    center distance is that at which the gears mesh without backlash (see
+    gear.get_center_distance) unless it is specified. If the direction is
+    None, the gears share a shaft (e.g. the gears of a compound train), so
+    they have the same center and rotation.
+
+    The first gear is placed at the origin without rotation, and the other
+    gears are placed by following the meshes from it, so every gear must be
+    connected to the first one. A mesh between two gears which have already
+    been placed must agree with their positions.
+
+    Each gear is rotated so that the line of centers of each mesh passes
+    through corresponding points of the two gears: where the line crosses a
+    space of the first gear, it crosses a tooth of the second, and so on.
+    The phase of a gear therefore depends on the phase of the gear from
+    which it is placed (but not on the meshes which close loops).
+
+    The items of the teeth are generated as they are iterated over (see
+    geometry.primitives.InstancedGeometry), so the assembly can also be
+    exported by the other methods of geometry.primitives.Geometry.
+
+    """
+
+    def __init__(self, gears, meshes = (), approximation_steps = gear.Gear.DEFAULT_APPROXIMATION_STEPS, kerf = 0, bores = None, lod = None):
+        """
+        :param gears: A list of gear.Gear objects (internal gears are not supported).
+        :param meshes: A list of meshes, each in the form ``(i, j, direction[, center_distance])``.
+        :param approximation_steps: The number of steps to use to approximate the involute.
+        :param kerf: The amount by which to offset the output gear profiles (to account for kerf).
+        :param bores: A list of the diameters of the bores of the gears (or None for no bores).
+        :param lod: The level of detail (see gear.Gear.get_lod_steps), or None for full detail.
+
+        :raises: An Exception if a gear is not supported, the gears of a mesh
+            cannot mesh, a mesh disagrees with the positions of its gears, or
+            a gear is not connected to the first gear.
+        """
+
+        if len(gears) == 0:
+            raise Exception('An assembly must contain at least one gear.')
+
+        for i, g in enumerate(gears):
+            if not isinstance(g, gear.Gear) or isinstance(g, gear.InternalGear):
+                raise Exception('Gear {} is not an external gear.'.format(i))
+
+        if bores == None:
+            bores = [0] * len(gears)
+
+        placements = self._place(gears, meshes)
+
+        # The first tooth of each distinct gear, and each distinct gear with
+        # its bore, in the form (tooth index, teeth, circular pitch, bore)
+        teeth = []
+        templates = []
+        instances = []
+
+        tooth_indices = {}
+        template_indices = {}
+
+        for g, bore, placement in zip(gears, bores, placements):
+            spec = _get_spec(g)
+
+            if not tooth_indices.has_key(spec):
+                tooth_indices[spec] = len(teeth)
+                teeth.append(g.get_tooth_geometry(approximation_steps, kerf, lod).items)
+
+            key = (spec, bore)
+
+            if not template_indices.has_key(key):
+                template_indices[key] = len(templates)
+                templates.append((tooth_indices[spec], g.teeth, g.get_circular_pitch(), bore))
+
+            instances.append((template_indices[key], placement[0], placement[1], g.get_outside_diameter() / 2 + kerf))
+
+        self._set(gears=tuple(gears),
+                  meshes=tuple(meshes),
+                  placements=tuple(placements),
+                  kerf=kerf,
+                  teeth=tuple(teeth),
+                  templates=tuple(templates),
+                  instances=tuple(instances))
+
+    def _place(self, gears, meshes):
+        """
+        Place the gears by following the meshes from the first gear.
+
+        :returns: A list of the placement of each gear, in the form ``((x, y), angle)``.
+        """
+
+        centers = [None] * len(gears)
+        angles = [None] * len(gears)
+
+        centers[0] = (0.0, 0.0)
+        angles[0] = 0.0
+
+        remaining = list(meshes)
+
+        while len(remaining) > 0:
+            unplaced = []
+
+            for mesh in remaining:
+                i, j, direction = mesh[:3]
+
+                if centers[i] == None and centers[j] == None:
+                    unplaced.append(mesh)
+                    continue
+
+                if direction == None:
+                    distance = 0
+                    beta = 0
+                else:
+                    distance = self._get_center_distance(gears, mesh)
+                    beta = direction * math.pi / 180
+
+                # Place the gear which has not been placed from the other gear,
+                # in the opposite direction if necessary
+                if centers[j] == None:
+                    self._place_gear(gears, centers, angles, i, j, beta, distance, direction == None)
+                elif centers[i] == None:
+                    self._place_gear(gears, centers, angles, j, i, beta + math.pi, distance, direction == None)
+                else:
+                    x = centers[i][0] + distance * math.cos(beta)
+                    y = centers[i][1] + distance * math.sin(beta)
+
+                    if math.hypot(x - centers[j][0], y - centers[j][1]) > MESH_TOLERANCE * max(distance, 1):
+                        raise Exception('Gears {} and {} are not in the places required by their mesh.'.format(i, j))
+
+            if len(unplaced) == len(remaining):
+                break
+
+            remaining = unplaced
+
+        for i in range(len(gears)):
+            if centers[i] == None:
+                raise Exception('Gear {} is not connected to the first gear.'.format(i))
+
+        return zip(centers, angles)
+
+    def _get_center_distance(self, gears, mesh):
+        """
+        Get the center distance of a mesh.
+
+        :param gears: The gears of the assembly.
+        :param mesh: The mesh, in the form ``(i, j, direction[, center_distance])``.
+
+        :raises: An Exception if the gears cannot mesh.
+        :returns: The center distance.
+        """
+
+        g_1 = gears[mesh[0]]
+        g_2 = gears[mesh[1]]
+
+        if g_1.pitch != g_2.pitch or g_1.pressure_angle != g_2.pressure_angle:
+            raise Exception('Gears {} and {} have different pitches or pressure angles, so they cannot mesh.'.format(mesh[0], mesh[1]))
+
+        if len(mesh) > 3 and mesh[3] != None:
+            return mesh[3]
+
+        return float(gear.get_center_distance(g_1.pitch, g_1.teeth, g_2.teeth, g_1.pressure_angle,
+                                              g_1.profile_shift, g_2.profile_shift))
+
+    def _place_gear(self, gears, centers, angles, i, j, beta, distance, coaxial):
+        """
+        Place gear ``j`` relative to gear ``i``, which has already been placed.
+
+        :param beta: The angle of the line from the center of gear ``i`` to that of gear ``j``, in radians.
+        :param distance: The center distance.
+        :param coaxial: True if the gears share a shaft.
+        """
+
+        centers[j] = (centers[i][0] + distance * math.cos(beta),
+                      centers[i][1] + distance * math.sin(beta))
+
+        if coaxial:
+            angles[j] = angles[i]
+            return
+
+        # The center of a space of a gear is at angle 0, so this is the
+        # fraction of the circular pitch of gear i by which the line of
+        # centers is past the center of a space
+        f = ((beta - angles[i]) / gears[i].get_circular_pitch()) % 1
+
+        # The gears turn in opposite directions, so the line of centers must
+        # be the same fraction of a pitch before the center of a tooth of gear j
+        angles[j] = (beta + math.pi - ((0.5 - f) % 1) * gears[j].get_circular_pitch()) % (2 * math.pi)
+
+    @property
+    def items(self):
+        return tuple(self.iter_items())
+
+    def iter_items(self):
+        for template_index, center, angle, radius in self.instances:
+            tooth_index, teeth, circular_pitch, bore = self.templates[template_index]
+
+            for k in xrange(teeth):
+                for item in self.teeth[tooth_index]:
+                    yield item.get_transformed(angle + k * circular_pitch, center)
+
+            if bore > 0:
+                yield primitives.Circle(center, bore / 2 - self.kerf)
+
+    def get_placements(self):
+        """
+        Get the placement of each gear.
+
+        :returns: A list of placements, each in the form ``((x, y), angle)``, where the angle is in radians.
+        """
+
+        return list(self.placements)
+
+    def get_bounds(self):
+        """
+        Get the bounds of the outside circles of the gears.
+
+        The tips of the teeth lie on the outside circles, so the bounds are
+        found without generating the items.
+
+        :returns: The bounds, in the form ``((min_x, min_y), (max_x, max_y))``.
+        """
+
+        return ((min(center[0] - radius for _, center, _, radius in self.instances),
+                 min(center[1] - radius for _, center, _, radius in self.instances)),
+                (max(center[0] + radius for _, center, _, radius in self.instances),
+                 max(center[1] + radius for _, center, _, radius in self.instances)))
+
+    def write_svg(self, file_name, scale=1, margin_factor=0.2, style={}, precision=svg_utils.DEFAULT_PRECISION):
+        """
+        Create an SVG in which the teeth and gears refer to shared templates.
+
+        The first tooth of each distinct gear is written as a ``g`` element
+        (with the id ``tooth-<index>``) and each distinct gear as a ``g``
+        element (``gear-<index>``) of rotated ``use`` elements, within
+        ``defs``. Each gear of the assembly is a ``use`` element which
+        translates and rotates its template.
+
+        The file is compressed if its name ends with ``.svgz`` or ``.gz``.
+
+        See geometry.primitives.Geometry.write_svg for the parameters.
+
+        """
+
+        tree = svg_utils.get_svg_tree(xlink=True)
+        root = tree.getroot()
+
+        size, offset = self.get_bounds_and_margin(margin_factor, scale)
+        svg_utils.set_dimensions(root, size)
+
+        href = '{%s}href' % svg_utils.XLINK_NAMESPACE
+
+        defs = etree.SubElement(root, 'defs')
+
+        for tooth_index, items in enumerate(self.teeth):
+            n = etree.SubElement(defs, 'g')
+            n.attrib['id'] = 'tooth-{}'.format(tooth_index)
+
+            for item in items:
+                item.append_to_svg(n, (0, 0), scale, {}, precision)
+
+        for template_index, (tooth_index, teeth, circular_pitch, bore) in enumerate(self.templates):
+            n = etree.SubElement(defs, 'g')
+            n.attrib['id'] = 'gear-{}'.format(template_index)
+
+            for k in range(teeth):
+                u = etree.SubElement(n, 'use')
+                u.attrib[href] = '#tooth-{}'.format(tooth_index)
+
+                if k > 0:
+                    u.attrib['transform'] = 'rotate({})'.format(svg_utils.format_number(math.degrees(k * circular_pitch), precision))
+
+            if bore > 0:
+                primitives.Circle((0, 0), bore / 2 - self.kerf).append_to_svg(n, (0, 0), scale, {}, precision)
+
+        # The templates inherit the style from the group of the use elements
+        # which refer to them (see svg_utils.append_style_group)
+        group = svg_utils.append_style_group(root, style, scale)
+
+        for template_index, center, angle, _ in self.instances:
+            u = etree.SubElement(group, 'use')
+            u.attrib[href] = '#gear-{}'.format(template_index)
+            u.attrib['transform'] = 'translate({} {}) rotate({})'.format(svg_utils.format_number(center[0] * scale + offset[0], precision),
+                                                                         svg_utils.format_number(center[1] * scale + offset[1], precision),
+                                                                         svg_utils.format_number(math.degrees(angle), precision))
+
+        svg_utils.write_svg(tree, file_name)
+
+    def write_dxf(self, file_name, layer='GEOMETRY'):
+        """
+        Create a DXF in which the teeth and gears refer to shared blocks.
+
+        The first tooth of each distinct gear is written as a block (named
+        ``TOOTH<index>``) and each distinct gear as a block (``GEAR<index>``)
+        of rotated inserts of it. Each gear of the assembly is an insert of
+        its block.
+
+        The file is compressed if its name ends with ``.gz``.
+
+        :param file_name: The name of the DXF file to write.
+        :param layer: The name of the layer to which to add the geometry.
+
+        """
+
+        drawing = dxf.drawing(file_name)
+
+        # The y axis of a DXF is reversed (see geometry.primitives.Polyline.append_to_dxf),
+        # so the rotations are too
+        for tooth_index, items in enumerate(self.teeth):
+            block = dxf.block('TOOTH{}'.format(tooth_index))
+
+            for item in items:
+                item.append_to_dxf(block)
+
+            drawing.blocks.add(block)
+
+        for template_index, (tooth_index, teeth, circular_pitch, bore) in enumerate(self.templates):
+            block = dxf.block('GEAR{}'.format(template_index))
+
+            for k in range(teeth):
+                block.add(dxf.insert('TOOTH{}'.format(tooth_index), rotation=-math.degrees(k * circular_pitch)))
+
+            if bore > 0:
+                primitives.Circle((0, 0), bore / 2 - self.kerf).append_to_dxf(block)
+
+            drawing.blocks.add(block)
+
+        for template_index, center, angle, _ in self.instances:
+            drawing.add(dxf.insert('GEAR{}'.format(template_index), insert=(center[0], -center[1]), rotation=-math.degrees(angle)))
+
+        f = compression.open_output(file_name)
+
+        try:
+            drawing.save_to_fileobj(f)
+        finally:
+            f.close()
@@ -0,0 +1,267 @@
+"""
+Contains functionality for building and querying a catalog of gears.
+
+A catalog is an SQLite database containing the parameters and derived
+dimensions (pitch, base, outside and root diameters) of every gear in a
+grid of parameters, and optionally the serialized geometry of each gear
+(see geometry/serialization.py). The dimensions are indexed, so gears can
+be looked up by range without generating them:
+
+    c = catalog.Catalog('gears.db')
+    c.add_gears(pitches=[24, 32, 48], teeth=range(12, 121), pressure_angles=[14.5, 20], bores=[0, 0.125, 0.25])
+
+    for entry in c.find(pitch_diameter=(0.9, 1.1), bore=0.25):
+        print entry.teeth, entry.pitch, entry.outside_diameter
+
+The geometry of an entry is only read from the database (or generated, if
+it was not stored) when ``get_geometry`` is called.
+
+"""
+
+import itertools
+import sqlite3
+
+from geometry import serialization
+import gear
+
+# The columns of the gears table, other than the id and the geometry
+COLUMNS = ('pitch',
+           'teeth',
+           'pressure_angle',
+           'addendum_factor',
+           'dedendum_factor',
+           'approximation_steps',
+           'kerf',
+           'bore',
+           'pitch_diameter',
+           'base_diameter',
+           'outside_diameter',
+           'root_diameter')
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS gears (
+    id INTEGER PRIMARY KEY,
+    pitch REAL NOT NULL,
+    teeth INTEGER NOT NULL,
+    pressure_angle REAL NOT NULL,
+    addendum_factor REAL NOT NULL,
+    dedendum_factor REAL NOT NULL,
+    approximation_steps INTEGER NOT NULL,
+    kerf REAL NOT NULL,
+    bore REAL NOT NULL,
+    pitch_diameter REAL NOT NULL,
+    base_diameter REAL NOT NULL,
+    outside_diameter REAL NOT NULL,
+    root_diameter REAL NOT NULL,
+    geometry BLOB
+);
+CREATE INDEX IF NOT EXISTS gears_pitch_diameter ON gears (pitch_diameter);
+CREATE INDEX IF NOT EXISTS gears_outside_diameter ON gears (outside_diameter);
+CREATE INDEX IF NOT EXISTS gears_bore ON gears (bore, pitch_diameter);
+CREATE INDEX IF NOT EXISTS gears_mesh ON gears (pitch, pressure_angle, pitch_diameter);
+'''
+
+_SELECT = 'SELECT id, {0} FROM gears'.format(', '.join(COLUMNS))
+
+class CatalogEntry:
+    """
+    A gear in a catalog.
+
+    The parameters and derived dimensions of the gear are available as
+    attributes (see ``COLUMNS``).
+
+    """
+
+    def __init__(self, catalog, row):
+        self.catalog = catalog
+        self.id = row[0]
+
+        for name, value in zip(COLUMNS, row[1:]):
+            setattr(self, name, value)
+
+    def get_gear(self):
+        """
+        Get a Gear object with the parameters of the entry.
+
+        :returns: A gear.Gear object.
+
+        """
+
+        return gear.Gear(self.pitch, self.teeth, self.pressure_angle, self.addendum_factor, self.dedendum_factor)
+
+    def get_geometry(self):
+        """
+        Get the geometry of the gear, reading it from the catalog if it was stored.
+
+        :returns: A geometry.primitives.Geometry object.
+
+        """
+
+        geom = self.catalog.get_geometry(self.id)
+
+        if geom == None:
+            geom = self.get_gear().get_geometry(self.approximation_steps, self.kerf, self.bore)
+
+        return geom
+
+class Catalog:
+    """
+    A catalog of gears, stored in an SQLite database.
+
+    """
+
+    def __init__(self, file_name=':memory:'):
+        """
+        Open a catalog, creating it if it does not exist.
+
+        :param file_name: The name of the database file.
+
+        """
+
+        self.connection = sqlite3.connect(file_name)
+        self.connection.executescript(_SCHEMA)
+
+    def close(self):
+        self.connection.close()
+
+    def add_gears(self, pitches, teeth, pressure_angles, bores=(0,), kerfs=(0,),
+                  addendum_factor=gear.Gear.DEFAULT_ADDENDUM,
+                  dedendum_factor=gear.Gear.DEFAULT_DEDENDUM,
+                  approximation_steps=gear.Gear.DEFAULT_APPROXIMATION_STEPS,
+                  store_geometry=False):
+        """
+        Add every combination of the specified parameters to the catalog.
+
+        :param pitches: The pitches.
+        :param teeth: The numbers of teeth.
+        :param pressure_angles: The pressure angles, in degrees.
+        :param bores: The center bores (0 for no bore).
+        :param kerfs: The amounts of kerf.
+        :param addendum_factor: The addendum factor of every gear.
+        :param dedendum_factor: The dedendum factor of every gear.
+        :param approximation_steps: The number of steps used to approximate the involute.
+        :param store_geometry: True to generate and store the geometry of each gear.
+
+        :returns: The number of gears added.
+
+        """
+
+        def get_rows():
+            for p, n, a in itertools.product(pitches, teeth, pressure_angles):
+                # The derived values (and the teeth) of a gear are cached, so
+                # each gear is only generated once for all bores
+                g = gear.Gear(p, n, a, addendum_factor, dedendum_factor)
+
+                dimensions = (g.get_pitch_diameter(),
+                              g.get_base_diameter(),
+                              g.get_outside_diameter(),
+                              g.get_root_diameter())
+
+                for k, b in itertools.product(kerfs, bores):
+                    blob = None
+                    if store_geometry:
+                        blob = sqlite3.Binary(serialization.dumps(g.get_geometry(approximation_steps, k, b)))
+
+                    yield (p, n, a, addendum_factor, dedendum_factor, approximation_steps, k, b) + dimensions + (blob,)
+
+        cursor = self.connection.cursor()
+
+        with self.connection:
+            cursor.executemany('INSERT INTO gears ({0}, geometry) VALUES ({1})'.format(', '.join(COLUMNS),
+                                                                                      ', '.join(['?'] * (len(COLUMNS) + 1))),
+                               get_rows())
+
+        return cursor.rowcount
+
+    def find(self, limit=None, **ranges):
+        """
+        Find the gears whose parameters or dimensions are within the specified ranges.
+
+        For example, ``find(pitch_diameter=(0.9, 1.1), bore=0.25)`` finds the
+        gears with a pitch diameter between 0.9 and 1.1 and a bore of 0.25.
+
+        :param limit: The maximum number of gears to return.
+        :param ranges: The range of each column, in the form ``(min, max)`` (either of which may be None), or a single value.
+
+        :raises: An Exception if a column does not exist.
+        :returns: A list of CatalogEntry objects, ordered by pitch diameter.
+
+        """
+
+        conditions = []
+        values = []
+
+        for name, value in ranges.items():
+            if name not in COLUMNS:
+                raise Exception('Unknown catalog column: {0}'.format(name))
+
+            if isinstance(value, (tuple, list)):
+                if value[0] != None:
+                    conditions.append('{0} >= ?'.format(name))
+                    values.append(value[0])
+
+                if value[1] != None:
+                    conditions.append('{0} <= ?'.format(name))
+                    values.append(value[1])
+            else:
+                conditions.append('{0} = ?'.format(name))
+                values.append(value)
+
+        return self._select(conditions, values, limit)
+
+    def find_mates(self, entry, center_distance, tolerance=1e-9, limit=None, **ranges):
+        """
+        Find the gears which mesh with a gear at the specified center distance.
+
+        Mating gears have the same pitch and pressure angle, and the sum of
+        their pitch diameters is twice the center distance.
+
+        :param entry: The CatalogEntry of the gear.
+        :param center_distance: The center distance.
+        :param tolerance: The largest difference from the center distance.
+        :param limit: The maximum number of gears to return.
+        :param ranges: Further ranges to apply (see ``find``).
+
+        :returns: A list of CatalogEntry objects, ordered by pitch diameter.
+
+        """
+
+        pitch_diameter = 2 * center_distance - entry.pitch_diameter
+
+        ranges = dict(ranges)
+        ranges['pitch'] = entry.pitch
+        ranges['pressure_angle'] = entry.pressure_angle
+        ranges['pitch_diameter'] = (pitch_diameter - 2 * tolerance, pitch_diameter + 2 * tolerance)
+
+        return self.find(limit, **ranges)
+
+    def _select(self, conditions, values, limit):
+        query = _SELECT
+
+        if len(conditions) > 0:
+            query += ' WHERE ' + ' AND '.join(conditions)
+
+        query += ' ORDER BY pitch_diameter, id'
+
+        if limit != None:
+            query += ' LIMIT ?'
+            values = values + [limit]
+
+        return [CatalogEntry(self, row) for row in self.connection.execute(query, values)]
+
+    def get_geometry(self, gear_id):
+        """
+        Read the stored geometry of a gear.
+
+        :param gear_id: The id of the gear.
+
+        :returns: A geometry.primitives.Geometry object, or None if the geometry was not stored.
+
+        """
+
+        row = self.connection.execute('SELECT geometry FROM gears WHERE id = ?', (gear_id,)).fetchone()
+
+        if row == None or row[0] == None:
+            return None
+
+        return serialization.loads(str(row[0]))
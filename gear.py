@@ -11,8 +11,13 @@ See the testing/ directory for examples of using this module.
 
 """
 
-from geometry import primitives
+from geometry import importers, primitives, svg_utils
 import math
+import numpy
+import os
+import shutil
+import tempfile
+import time
 import geometric_functions
 
 def get_t_value(r, od):
@@ -54,18 +59,264 @@ def get_point_for_t(r, t):
     
     return (x, y)
 
+# The coefficients of alpha**3, alpha**5, ... in the Taylor series of 
+# tan(alpha) - alpha, which is used for small angles, where subtracting 
+# alpha from tan(alpha) would lose most of the precision of the result
+_INVOLUTE_SERIES = (1/3.0, 2/15.0, 17/315.0, 62/2835.0, 1382/155925.0, 21844/6081075.0,
+                    929569/638512875.0, 6404582/10854718875.0, 443861162/1856156927625.0,
+                    18888466084/194896477400625.0, 113927491862/2900518163668125.0)
+
+# The largest angle for which the series is used
+_INVOLUTE_SERIES_LIMIT = 0.25
+
+def involute(alpha):
+    """
+    Evaluate the involute function, ``inv(alpha) = tan(alpha) - alpha``.
+    
+    :param alpha: The pressure angle in radians (a number or an array).
+    
+    :returns: The involute function of each angle.
+    
+    """
+    
+    alpha = numpy.asarray(alpha, dtype=float)
+    alpha_2 = alpha * alpha
+    
+    series = numpy.zeros_like(alpha)
+    for c in reversed(_INVOLUTE_SERIES):
+        series = series * alpha_2 + c
+    
+    return numpy.where(numpy.abs(alpha) <= _INVOLUTE_SERIES_LIMIT, series * alpha_2 * alpha, numpy.tan(alpha) - alpha)
+
+# The largest number of Newton iterations used to invert the involute function
+INVERSE_INVOLUTE_ITERATIONS = 50
+
+def inverse_involute(inv):
+    """
+    Invert the involute function, finding the angle ``alpha`` in [0, pi/2) 
+    for which ``tan(alpha) - alpha = inv``.
+    
+    The function is inverted over a whole array at once using Newton's 
+    method, to the full precision of a float. Since ``tan(alpha) - alpha >= 
+    alpha**3 / 3``, the root is at most ``(3 inv)**(1/3)``, so the first 
+    estimate ``atan(inv + (3 inv)**(1/3))`` is never below it; the involute 
+    function is increasing and convex, so each iteration then approaches the
+    root from above without overshooting it.
+    
+    :param inv: The value of the involute function (a non-negative number or an array).
+    
+    :raises: An Exception if ``inv`` is a single negative number.
+    :returns: The angle in radians (a float, or an array with the shape of 
+        ``inv``, which is NaN wherever ``inv`` is negative, so that one 
+        infeasible value does not prevent the rest from being solved).
+    
+    """
+    
+    inv = numpy.asarray(inv, dtype=float)
+    
+    if inv.ndim == 0 and inv < 0:
+        raise Exception('The involute function is not defined for negative values.')
+    
+    # The involute function is not defined for negative values; they are
+    # solved as 0, and replaced with NaN at the end
+    infeasible = inv < 0
+    inv = numpy.where(infeasible, 0, inv)
+    
+    alpha = numpy.arctan(inv + numpy.cbrt(3 * inv))
+    
+    for i in range(INVERSE_INVOLUTE_ITERATIONS):
+        tan = numpy.tan(alpha)
+        slope = tan * tan
+        
+        # The slope is only 0 at alpha = 0, where the root has been found
+        step = numpy.where(slope > 0, (involute(alpha) - inv) / numpy.where(slope > 0, slope, 1), 0)
+        alpha = alpha - step
+        
+        # Once the root has been found, the steps are only due to rounding,
+        # which is largest just above the angles at which the series is used
+        if not numpy.any(numpy.abs(step) > 64 * numpy.finfo(float).eps * alpha):
+            break
+    
+    if alpha.ndim == 0:
+        return float(alpha)
+    
+    return numpy.where(infeasible, numpy.nan, alpha)
+
+def get_operating_pressure_angle(teeth_1, teeth_2, pressure_angle, shift_1 = 0, shift_2 = 0):
+    """
+    Get the operating (working) pressure angle of a pair of external gears 
+    with profile shifts, meshing without backlash.
+    
+    Every argument may be an array (the arrays are broadcast together), so 
+    whole catalogs of pairs can be solved in one call.
+    
+    :param teeth_1: The number of teeth of the first gear.
+    :param teeth_2: The number of teeth of the second gear.
+    :param pressure_angle: The pressure angle, in degrees.
+    :param shift_1: The profile shift coefficient of the first gear.
+    :param shift_2: The profile shift coefficient of the second gear.
+    
+    :raises: An Exception if a single pair of gears cannot mesh (the sum of 
+        the profile shifts is too negative).
+    :returns: The operating pressure angle, in degrees (NaN for each pair 
+        of an array which cannot mesh).
+    
+    """
+    
+    teeth_1, teeth_2, pressure_angle, shift_1, shift_2 = numpy.broadcast_arrays(
+        *[numpy.asarray(v, dtype=float) for v in (teeth_1, teeth_2, pressure_angle, shift_1, shift_2)])
+    
+    alpha = pressure_angle * math.pi / 180
+    inv_w = involute(alpha) + 2 * numpy.tan(alpha) * (shift_1 + shift_2) / (teeth_1 + teeth_2)
+    
+    # The involute function of the operating pressure angle cannot be negative
+    if inv_w.ndim == 0 and inv_w < 0:
+        raise Exception('The gears cannot mesh; the sum of the profile shifts is too negative.')
+    
+    return numpy.degrees(inverse_involute(inv_w))
+
+def get_center_distance(pitch, teeth_1, teeth_2, pressure_angle, shift_1 = 0, shift_2 = 0):
+    """
+    Get the center distance of a pair of external gears with profile shifts, 
+    meshing without backlash.
+    
+    Every argument may be an array (see ``get_operating_pressure_angle``).
+    
+    :param pitch: The pitch.
+    :param teeth_1: The number of teeth of the first gear.
+    :param teeth_2: The number of teeth of the second gear.
+    :param pressure_angle: The pressure angle, in degrees.
+    :param shift_1: The profile shift coefficient of the first gear.
+    :param shift_2: The profile shift coefficient of the second gear.
+    
+    :raises: An Exception if a single pair of gears cannot mesh.
+    :returns: The center distance (NaN for each pair of an array which cannot mesh).
+    
+    """
+    
+    operating_angle = get_operating_pressure_angle(teeth_1, teeth_2, pressure_angle, shift_1, shift_2)
+    
+    pitch = numpy.asarray(pitch, dtype=float)
+    alpha = numpy.asarray(pressure_angle, dtype=float) * math.pi / 180
+    
+    return ((numpy.asarray(teeth_1, dtype=float) + teeth_2) / (2 * pitch) * 
+            numpy.cos(alpha) / numpy.cos(numpy.radians(operating_angle)))
+
+def get_profile_shift_sum(pitch, teeth_1, teeth_2, pressure_angle, center_distance):
+    """
+    Get the sum of the profile shift coefficients which a pair of external 
+    gears needs to mesh without backlash at a given center distance.
+    
+    The sum can be divided between the gears as required, e.g. with
+    ``shift_2 = shift_sum - shift_1``. Every argument may be an array (see
+    ``get_operating_pressure_angle``).
+    
+    :param pitch: The pitch.
+    :param teeth_1: The number of teeth of the first gear.
+    :param teeth_2: The number of teeth of the second gear.
+    :param pressure_angle: The pressure angle, in degrees.
+    :param center_distance: The center distance.
+    
+    :raises: An Exception if the gears cannot mesh at the center distance.
+    :returns: The sum of the profile shift coefficients.
+    
+    """
+    
+    teeth_sum = numpy.asarray(teeth_1, dtype=float) + teeth_2
+    alpha = numpy.asarray(pressure_angle, dtype=float) * math.pi / 180
+    
+    cos_w = teeth_sum / (2 * numpy.asarray(pitch, dtype=float)) * numpy.cos(alpha) / center_distance
+    
+    # The center distance must be larger than the sum of the base radii
+    if numpy.any(cos_w >= 1) or numpy.any(cos_w <= 0):
+        raise Exception('The gears cannot mesh at the center distance; increase the center distance.')
+    
+    return teeth_sum * (involute(numpy.arccos(cos_w)) - involute(alpha)) / (2 * numpy.tan(alpha))
+
 
 class Gear:
     DEFAULT_ADDENDUM = 1
     DEFAULT_DEDENDUM = 1.25
     DEFAULT_APPROXIMATION_STEPS = 20
     
-    def __init__(self, pitch, teeth, pressure_angle, addendum_factor = DEFAULT_ADDENDUM, dedendum_factor = DEFAULT_DEDENDUM):
+    # The smallest number of steps used to approximate the involute at the
+    # coarsest level of detail; each subsequent level doubles the number of 
+    # steps (see get_lod_steps).
+    COARSE_APPROXIMATION_STEPS = 2
+    
+    # The level of detail at which each flank is drawn as a single arc
+    LOD_ENVELOPE = 0
+    
+    # The number of points along each segment of the flank at which its
+    # distance from the involute is measured (see get_approximation_error)
+    APPROXIMATION_ERROR_SAMPLES = 16
+    
+    # The attributes on which each cached value depends. When one of these 
+    # attributes is changed, the values which depend on it are discarded.
+    CACHE_DEPENDENCIES = {
+        'pitch_diameter': ('pitch', 'teeth'),
+        'base_diameter': ('pitch', 'teeth', 'pressure_angle'),
+        'outside_diameter': ('pitch', 'teeth', 'addendum_factor', 'profile_shift'),
+        'root_diameter': ('pitch', 'teeth', 'pressure_angle', 'dedendum_factor', 'profile_shift'),
+        'circular_pitch': ('teeth',),
+        'involute_samples': ('pitch', 'teeth', 'pressure_angle', 'addendum_factor', 'profile_shift'),
+        'flank': ('pitch', 'teeth', 'pressure_angle', 'addendum_factor', 'dedendum_factor', 'profile_shift'),
+        'offset_flank': ('pitch', 'teeth', 'pressure_angle', 'addendum_factor', 'dedendum_factor', 'profile_shift'),
+        'teeth_geometry': ('pitch', 'teeth', 'pressure_angle', 'addendum_factor', 'dedendum_factor', 'profile_shift'),
+    }
+    
+    def __init__(self, pitch, teeth, pressure_angle, addendum_factor = DEFAULT_ADDENDUM, dedendum_factor = DEFAULT_DEDENDUM, profile_shift = 0):
+        """
+        :param pitch: The (diametral) pitch.
+        :param teeth: The number of teeth.
+        :param pressure_angle: The pressure angle, in degrees.
+        :param addendum_factor: The addendum, as a multiple of 1 / pitch.
+        :param dedendum_factor: The dedendum, as a multiple of 1 / pitch.
+        :param profile_shift: The profile shift coefficient; the profile is moved 
+            away from the center by ``profile_shift / pitch``, which enlarges the
+            outside and root diameters and thickens the teeth.
+        """
+        
+        # Cached values, in the form {name: (key, value)}
+        self.__dict__['_cache'] = {}
+        
         self.pitch = pitch
         self.teeth = teeth
         self.pressure_angle = pressure_angle
         self.addendum_factor = addendum_factor
         self.dedendum_factor = dedendum_factor
+        self.profile_shift = profile_shift
+        
+    def __setattr__(self, name, value):
+        self.__dict__[name] = value
+        
+        # Discard the cached values which depend on the attribute
+        for cached_name, dependencies in self.CACHE_DEPENDENCIES.items():
+            if name in dependencies:
+                self._cache.pop(cached_name, None)
+                
+    def _get_cached(self, name, key, compute):
+        """
+        Get a cached value, computing it if necessary.
+        
+        Only the most recently computed value is kept for each name, so
+        changing an argument (e.g. the kerf) replaces the cached value for
+        the stages which depend on it, but not for earlier stages.
+        
+        :param name: The name of the value (a key of ``CACHE_DEPENDENCIES``).
+        :param key: The arguments used to compute the value.
+        :param compute: A function which computes the value.
+        
+        :returns: The value.
+        """
+        
+        cached = self._cache.get(name)
+        
+        if cached == None or cached[0] != key:
+            cached = (key, compute())
+            self._cache[name] = cached
+            
+        return cached[1]
         
     def get_pitch_diameter(self):
         """
@@ -74,6 +325,9 @@ class Gear:
         :returns: The pitch diameter.
         """
         
+        return self._get_cached('pitch_diameter', None, self._compute_pitch_diameter)
+    
+    def _compute_pitch_diameter(self):
         teeth = float(self.teeth)
         pitch = float(self.pitch)
         
@@ -85,6 +339,9 @@ class Gear:
         
         :returns: The base diameter.
         """
+        return self._get_cached('base_diameter', None, self._compute_base_diameter)
+    
+    def _compute_base_diameter(self):
         pressure_angle = float(self.pressure_angle)
         return self.get_pitch_diameter() * math.cos(pressure_angle * math.pi / 180)
     
@@ -94,8 +351,11 @@ class Gear:
         
         :returns: The outside diameter.
         """
+        return self._get_cached('outside_diameter', None, self._compute_outside_diameter)
+    
+    def _compute_outside_diameter(self):
         pitch = float(self.pitch)
-        return self.get_pitch_diameter() + 2 * self.addendum_factor / pitch
+        return self.get_pitch_diameter() + 2 * (self.addendum_factor + self.profile_shift) / pitch
     
     def get_root_diameter(self):
         """
@@ -103,8 +363,11 @@ class Gear:
         
         :returns: The root diameter.
         """
+        return self._get_cached('root_diameter', None, self._compute_root_diameter)
+    
+    def _compute_root_diameter(self):
         pitch = float(self.pitch)
-        return self.get_base_diameter() - 2 * self.dedendum_factor / pitch
+        return self.get_base_diameter() - 2 * (self.dedendum_factor - self.profile_shift) / pitch
     
     def get_circular_pitch(self):
         """
@@ -112,20 +375,109 @@ class Gear:
         
         :returns: The circular pitch.
         """
+        return self._get_cached('circular_pitch', None, self._compute_circular_pitch)
+    
+    def _compute_circular_pitch(self):
         teeth = float(self.teeth)
         return 2 * math.pi / teeth
+    
+    def get_helix_twist(self, face_width, helix_angle):
+        """
+        Get the angle through which the profile of a helical gear turns across its face.
+        
+        :param face_width: The face width of the gear.
+        :param helix_angle: The helix angle at the pitch diameter, in degrees.
         
-    def get_geometry(self, approximation_steps = DEFAULT_APPROXIMATION_STEPS, kerf = 0, bore = 0):
+        :returns: The twist angle, in radians.
         """
-        Get a geometry.primitives.Geometry object which represents the gear.
+        helix_angle = float(helix_angle)
+        return face_width * math.tan(helix_angle * math.pi / 180) / (self.get_pitch_diameter() / 2)
+    
+    def get_lod_steps(self, lod, approximation_steps = DEFAULT_APPROXIMATION_STEPS):
+        """
+        Get the number of steps used to approximate the involute at a level of detail.
         
-        :param approximation_steps: The number of steps to use to approximate the involute.
-        :param kerf: The amount by which to offset the output gear profile (to account for kerf).
-        :param bore: The diameter of the bore of the gear (or 0 for no bore).
+        The levels end at ``approximation_steps``, and each level doubles the
+        number of steps of the previous level, so that the samples of each 
+        level are reused by the next (see ``_get_involute_samples``). Level
+        ``LOD_ENVELOPE`` (0) and level 1 use the fewest steps from which 
+        ``approximation_steps`` is reached by doubling, but no fewer than
+        ``COARSE_APPROXIMATION_STEPS`` (e.g. 2, 4, 8 and 16 steps for 16 
+        steps, or 5, 10 and 20 steps for 20 steps).
         
-        :returns: A geometry.primitives.Geometry objects which represents the gear.
+        :param lod: The level of detail, or None for full detail.
+        :param approximation_steps: The number of steps used at full detail.
+        
+        :returns: The number of steps.
+        """
+        
+        if lod == None:
+            return approximation_steps
+        
+        steps = approximation_steps
+        
+        while steps % 2 == 0 and steps // 2 >= Gear.COARSE_APPROXIMATION_STEPS:
+            steps //= 2
+        
+        return min(approximation_steps, steps * 2 ** max(lod - 1, 0))
+    
+    def _get_involute_samples(self, approximation_steps):
+        """
+        Get the points at which the involute is sampled, from the base circle to the outside diameter.
+        
+        If the previously computed samples used a number of steps which divides
+        ``approximation_steps`` (e.g. when a coarse level of detail is refined),
+        those points are reused and only the new points are computed.
+        
+        :returns: A list of ``approximation_steps + 1`` points.
+        """
+        
+        return self._get_cached('involute_samples', approximation_steps, 
+                                lambda: self._compute_involute_samples(approximation_steps))
+    
+    def _compute_involute_samples(self, approximation_steps):
+        # The base radius
+        r = self.get_base_diameter() / 2
+        
+        # Get the value of t for the point at which the involute intersects
+        # the outside diameter.
+        t_od = get_t_value(r, self.get_outside_diameter())
+        
+        # Given the specified number of points at which to approximate the involute,
+        # determine the amount by which t should be incremented for each step
+        step_inc = t_od / approximation_steps
+        
+        # The samples from the previous call, if they can be reused
+        previous = self._cache.get('involute_samples')
+        
+        if previous != None and approximation_steps % previous[0] == 0:
+            factor = approximation_steps // previous[0]
+            previous_vals = previous[1]
+        else:
+            factor = None
+        
+        vals = []
+        
+        for i in range(approximation_steps+1):
+            if factor != None and i % factor == 0:
+                vals.append(previous_vals[i // factor])
+            else:
+                vals.append(get_point_for_t(r, i * step_inc))
+            
+        return vals
+    
+    def _get_flank(self, approximation_steps):
+        """
+        Get the flank of the first tooth, before it is offset by the kerf.
+        
+        :returns: A tuple in the form ``(vals, vals_2, rot_angle, top_rot_angle)``,
+            where ``vals`` and ``vals_2`` are the points of the two edges of the
+            tooth, and the angles determine the extents of the root and outer arcs.
         """
         
+        return self._get_cached('flank', approximation_steps, lambda: self._compute_flank(approximation_steps))
+    
+    def _compute_flank(self, approximation_steps):
         # Ensure that teeth is a floating point value so that all division operations are floating point
         teeth = float(self.teeth)
         
@@ -143,28 +495,13 @@ class Gear:
         # the outside diameter.
         t_od = get_t_value(r, outside_diameter)
         
-        # Given the specified number of points at which to approximate the involute,
-        # determine the amount by which t should be incremented for each step
-        step_inc = t_od / approximation_steps
-        
         # An array to hold the approximation point values
-        vals = []
-        
-        # Add the value of the approximation at the intersection of the root circle
-        vals.append((root_diameter / 2, 0))
+        vals = self._get_flank_points(approximation_steps)
         
-        # Populate the list of values
-        for i in range(approximation_steps+1):
-            vals.append(get_point_for_t(r, i * step_inc))
+        # The angle of the start of the flank (at the root circle)
+        start_angle = math.atan2(vals[0][1], vals[0][0])
             
-        # Get the position of the pinch point
-        t = get_t_value(r, pitch_diameter)
-        p = get_point_for_t(r, t)
-        a_t = math.atan2(p[1], p[0])
-        
-        # Determine the angle to which the pinch point should be rotated so that
-        # the circular pitch is correct
-        rot_angle = (2*math.pi) / teeth / 4 - a_t
+        rot_angle = self._get_flank_rotation()
         
         # Rotate the list of values to the appropriate point for the first tooth
         vals = geometric_functions.get_rotated_points(vals, rot_angle)
@@ -179,9 +516,75 @@ class Gear:
         
         top_rot_angle = (circular_pitch - 2 * a_t_2 - 2 * rot_angle) / 2
         
+        return (vals, vals_2, rot_angle + start_angle, top_rot_angle)
+    
+    def _get_flank_rotation(self):
+        """
+        Get the angle through which the flank is rotated into place for the first tooth.
+        
+        :returns: The angle, in radians.
+        """
+        
+        teeth = float(self.teeth)
+        
+        # The base radius
+        r = self.get_base_diameter() / 2
+        
+        # Get the position of the pinch point
+        t = get_t_value(r, self.get_pitch_diameter())
+        p = get_point_for_t(r, t)
+        a_t = math.atan2(p[1], p[0])
+        
+        # Determine the angle to which the pinch point should be rotated so that
+        # the circular pitch is correct. A profile shift thickens the tooth at
+        # the pitch circle by 2 * shift * tan(pressure angle) / pitch, which 
+        # narrows the space by the corresponding angle.
+        shift_angle = 2 * self.profile_shift * math.tan(float(self.pressure_angle) * math.pi / 180) / teeth
+        return (2*math.pi) / teeth / 4 - shift_angle - a_t
+    
+    def _get_flank_points(self, approximation_steps):
+        """
+        Get the points of the flank of the first tooth, before it is rotated into place.
+        
+        The flank runs radially from the root circle to the base circle, then
+        follows the involute to the outside diameter.
+        
+        :returns: A list of points.
+        """
+        
+        # Add the value of the approximation at the intersection of the root circle
+        vals = [(self.get_root_diameter() / 2, 0)]
+        
+        # Populate the list of values
+        vals.extend(self._get_involute_samples(approximation_steps))
+        
+        return vals
+    
+    def _get_offset_flank(self, approximation_steps, kerf):
+        """
+        Get the flank of the first tooth, offset by the kerf.
+        
+        :returns: A tuple in the form ``(vals_os, vals_2_os, rot_angle_os, top_rot_angle_os)``
+            (see ``_get_flank``).
+        """
+        
+        return self._get_cached('offset_flank', (approximation_steps, kerf), 
+                                lambda: self._compute_offset_flank(approximation_steps, kerf))
+    
+    def _compute_offset_flank(self, approximation_steps, kerf):
+        vals, vals_2, rot_angle, top_rot_angle = self._get_flank(approximation_steps)
+        
         # Offset the points by the specified kerf
         if kerf != 0:
-            vals_os = geometric_functions.offset_line(vals, kerf)
+            outside_diameter = self.get_outside_diameter()
+            root_diameter = self.get_root_diameter()
+            circular_pitch = self.get_circular_pitch()
+            
+            vals_os = geometric_functions.offset_line_without_reversals(vals, kerf)
+            
+            # Offsetting the corner at the base circle towards its inside
+            # can leave a small loop
+            vals_os = geometric_functions.remove_loops(vals_os)
             
             # Extend or trim the line so that the ends are the appropriate
             # distance from the center
@@ -194,6 +597,14 @@ class Gear:
             # Update the angles
             rot_angle_os = rot_angle + geometric_functions.get_angle_between_points(vals[0], vals_os[0])
             top_rot_angle_os = (circular_pitch - 2 * math.atan2(vals_os[-1][1], vals_os[-1][0])) / 2
+            
+            if top_rot_angle_os < 0:
+                # The flanks of the tip cross before they reach the outside
+                # circle (the offset tip is pointed), so they are trimmed 
+                # where they meet, and there is no outer arc
+                vals_os = geometric_functions.trim_end_of_line_at_angle(vals_os, circular_pitch / 2)
+                vals_2_os = geometric_functions.get_scaled_points(vals_os, 1, -1)
+                top_rot_angle_os = 0
         else:
             # The geometry will not be offset
             vals_os = vals
@@ -201,46 +612,965 @@ class Gear:
             rot_angle_os = rot_angle
             top_rot_angle_os = top_rot_angle
             
-        # Create a list for the geometry
-        geom = primitives.Geometry([])
+        return (vals_os, vals_2_os, rot_angle_os, top_rot_angle_os)
+    
+    def _get_envelope_start(self, vals):
+        """
+        Get the index of the first point of the involute part of a flank (after the radial segment).
+        
+        :param vals: The points of the flank (see ``_get_flank``).
+        
+        :returns: The index.
+        """
+        
+        return 1
+    
+    def _get_envelope_flank(self, vals, kerf = 0):
+        """
+        Approximate a flank by its leading segment and a single arc.
+        
+        The arc passes through the first and last points of the involute part
+        of the flank (see ``_get_envelope_start``) and through the point of the
+        involute (offset by the kerf) halfway between them, in terms of the 
+        involute parameter, so that the fit does not depend on how the points
+        of the flank are spaced (e.g. when the offset flank is extended to the
+        outside circle). If the involute part is a single point (or the points
+        are collinear), the whole flank is kept as a polyline.
+        
+        :param vals: The points of the flank (see ``_get_flank``).
+        :param kerf: The amount by which the flank is offset.
+        
+        :returns: A tuple in the form ``(segment, arc)``, where ``segment`` is a
+            list of points and ``arc`` is in the form ``(center, radius, start_angle, end_angle)``
+            (or None if the points are collinear).
+        """
+        
+        start = self._get_envelope_start(vals)
+        
+        if len(vals) - start < 2:
+            return (vals, None)
+        
+        p1 = vals[start]
+        p3 = vals[-1]
+        
+        # The involute parameter (the length of the tangent to the base circle,
+        # divided by its radius) of the ends
+        r = self.get_base_diameter() / 2
+        u_1, u_3 = [math.sqrt(max((math.hypot(p[0], p[1]) / r) ** 2 - 1, 0)) for p in (p1, p3)]
+        
+        p2 = self._get_involute_point(r * math.sqrt(1 + ((u_1 + u_3) / 2) ** 2), kerf)
+        
+        circle = geometric_functions.get_circle_through_points(p1, p2, p3)
+        
+        if circle == None:
+            return (vals, None)
+        
+        center, radius = circle
+        
+        # The angles of the points; angles are measured clockwise, since the y-axis points down
+        angles = [math.atan2(center[1] - p[1], p[0] - center[0]) for p in (p1, p2, p3)]
+        a2 = (angles[1] - angles[0]) % (2*math.pi)
+        a3 = (angles[2] - angles[0]) % (2*math.pi)
+        
+        # Arcs are drawn with increasing angle, so choose the direction which
+        # passes through the middle point
+        if a2 < a3:
+            arc = (center, radius, angles[0], angles[0] + a3)
+        else:
+            arc = (center, radius, angles[0] + a3 - 2*math.pi, angles[0])
+            
+        return (vals[:start + 1], arc)
+    
+    def _get_involute_point(self, radius, kerf = 0):
+        """
+        Get the point of the involute of the flank of the first tooth (rotated
+        into place, and offset by the kerf) at a radius.
+        
+        Offsetting an involute turns it by ``kerf / base radius`` (see 
+        ``_get_involute_deviation``).
+        
+        :param radius: The radius, which is at least the base radius.
+        :param kerf: The amount by which the involute is offset.
+        
+        :returns: The point.
+        """
+        
+        r = self.get_base_diameter() / 2
+        angle = self._get_flank_rotation() - kerf / r + float(involute(math.acos(min(r / radius, 1))))
+        
+        return (radius * math.cos(angle), radius * math.sin(angle))
+    
+    def _get_teeth_geometry(self, approximation_steps, kerf, envelope = False):
+        """
+        Get the items which make up the teeth of the gear (the edges and arcs of every tooth).
+        
+        :param envelope: True to draw each flank as a single arc (see ``_get_envelope_flank``).
+        
+        :returns: A tuple of geometry.primitives objects.
+        """
+        
+        return self._get_cached('teeth_geometry', (approximation_steps, kerf, envelope), 
+                                lambda: self._compute_teeth_geometry(approximation_steps, kerf, envelope))
+    
+    def _compute_teeth_geometry(self, approximation_steps, kerf, envelope):
+        items = []
         
         # Add the tooth geometry
         for i in range(self.teeth):
-            # Draw two edges per tooth
-            vals_os_rot = geometric_functions.get_rotated_points(vals_os, i*circular_pitch)
-            geom.items.append(primitives.Polyline(vals_os_rot))
+            items.extend(self._get_tooth(i, approximation_steps, kerf, envelope))
             
+        return tuple(items)
+    
+    def _get_tooth(self, i, approximation_steps, kerf, envelope = False):
+        """
+        Get the items which make up a single tooth (its edges and the arcs which adjoin them).
+        
+        :param i: The index of the tooth.
+        
+        :returns: A list of geometry.primitives objects.
+        """
+        
+        vals_os, vals_2_os, rot_angle_os, top_rot_angle_os = self._get_offset_flank(approximation_steps, kerf)
+        
+        outside_diameter = self.get_outside_diameter()
+        root_diameter = self.get_root_diameter()
+        circular_pitch = self.get_circular_pitch()
+        
+        if envelope:
+            vals_os, arc = self._get_envelope_flank(vals_os, kerf)
+            vals_2_os = geometric_functions.get_scaled_points(vals_os, 1, -1)
+        
+        items = []
+        
+        # Draw two edges per tooth (unless the envelope of a flank with no
+        # leading segment leaves only its first point)
+        if len(vals_os) > 1:
+            vals_os_rot = geometric_functions.get_rotated_points(vals_os, i*circular_pitch)
+            items.append(primitives.Polyline(vals_os_rot))
+        
             vals_os_rot = geometric_functions.get_rotated_points(vals_2_os, i*circular_pitch)
-            geom.items.append(primitives.Polyline(vals_os_rot))
-            
-            # Draw two arcs per tooth
-            # Inner arc
+            items.append(primitives.Polyline(vals_os_rot))
+        
+        if envelope and arc != None:
+            # Draw the involute of each edge as an arc. Rotating a point
+            # by an angle reduces its (clockwise) arc angle by the same amount,
+            # and mirroring it negates the angle.
+            center, radius, start_angle, end_angle = arc
             a = i * circular_pitch
-            geom.items.append(primitives.Arc((0, 0),
-                                root_diameter / 2 + kerf,
-                                a - rot_angle_os,
-                                a + rot_angle_os))
             
-            # Outer arc
-            geom.items.append(primitives.Arc((0, 0),
+            c = geometric_functions.get_rotated_points([center], a)[0]
+            items.append(primitives.Arc(c, radius, start_angle - a, end_angle - a))
+            
+            c = geometric_functions.get_rotated_points([(center[0], -center[1])], a)[0]
+            items.append(primitives.Arc(c, radius, -end_angle - a, -start_angle - a))
+        
+        # Draw two arcs per tooth
+        # Inner arc
+        a = i * circular_pitch
+        items.append(primitives.Arc((0, 0),
+                            root_diameter / 2 + kerf,
+                            a - rot_angle_os,
+                            a + rot_angle_os))
+        
+        # Outer arc (unless the tip is pointed)
+        if top_rot_angle_os > 0:
+            items.append(primitives.Arc((0, 0),
                                 outside_diameter / 2 + kerf,
                                 a + circular_pitch / 2 - top_rot_angle_os,
                                 a + circular_pitch / 2 + top_rot_angle_os))
+        
+        return items
+        
+    def get_geometry(self, approximation_steps = DEFAULT_APPROXIMATION_STEPS, kerf = 0, bore = 0, lod = None):
+        """
+        Get a geometry.primitives.Geometry object which represents the gear.
+        
+        The stages of the generation are cached, so calling this method again
+        after changing only the kerf reuses the flank of the teeth, and 
+        changing only the bore reuses the teeth.
+        
+        :param approximation_steps: The number of steps to use to approximate the involute.
+        :param kerf: The amount by which to offset the output gear profile (to account for kerf).
+        :param bore: The diameter of the bore of the gear (or 0 for no bore).
+        :param lod: The level of detail (see ``get_lod_steps``), or None for full detail.
+        
+        :returns: A geometry.primitives.Geometry objects which represents the gear.
+        """
+        
+        steps = self.get_lod_steps(lod, approximation_steps)
+        envelope = lod == Gear.LOD_ENVELOPE
+        
+        # Create a builder for the geometry. The items are immutable, so the
+        # cached teeth can be shared between geometries.
+        builder = primitives.GeometryBuilder(self._get_teeth_geometry(steps, kerf, envelope))
             
         # Draw the bore
         if bore > 0:
-            geom.items.append(primitives.Circle((0, 0),
+            builder.add(primitives.Circle((0, 0),
                                    bore / 2 - kerf))
             
-        return geom
-
-def _positive_int(raw_val):
-    """
-    Parse the input value and ensure that it is a positive integer.
+        return builder.build()
     
-    :param raw_val: The input value.
-    :raises: An Exception if the input value is not an integer or is not positive.
-    :returns: A positive integer.
+    def get_tooth_geometry(self, approximation_steps = DEFAULT_APPROXIMATION_STEPS, kerf = 0, lod = None):
+        """
+        Get a geometry.primitives.Geometry object which represents the first tooth of the gear.
+        
+        The teeth of the gear are copies of the first tooth, each rotated by
+        the circular pitch relative to the previous one.
+        
+        :param approximation_steps: The number of steps to use to approximate the involute.
+        :param kerf: The amount by which to offset the output gear profile (to account for kerf).
+        :param lod: The level of detail (see ``get_lod_steps``), or None for full detail.
+        
+        :returns: A geometry.primitives.Geometry object which represents the tooth.
+        """
+        
+        steps = self.get_lod_steps(lod, approximation_steps)
+        
+        return primitives.Geometry(self._get_tooth(0, steps, kerf, lod == Gear.LOD_ENVELOPE))
+    
+    def iter_geometry(self, approximation_steps = DEFAULT_APPROXIMATION_STEPS, kerf = 0, bore = 0, tolerance = None):
+        """
+        Generate the geometry of the gear progressively, from coarse to fine.
+        
+        The first geometry draws each flank as a single arc (``LOD_ENVELOPE``).
+        Each subsequent geometry doubles the number of steps used to 
+        approximate the involute, reusing the points of the previous level,
+        until ``approximation_steps`` is reached.
+        
+        :param approximation_steps: The number of steps to use to approximate the involute at full detail.
+        :param kerf: The amount by which to offset the output gear profile (to account for kerf).
+        :param bore: The diameter of the bore of the gear (or 0 for no bore).
+        :param tolerance: If specified, stop refining once no point of the involute moves by more than this amount.
+        
+        :returns: A generator of tuples in the form ``(lod, geometry)``.
+        """
+        
+        yield (Gear.LOD_ENVELOPE, self.get_geometry(approximation_steps, kerf, bore, Gear.LOD_ENVELOPE))
+        
+        lod = 1
+        
+        while True:
+            steps = self.get_lod_steps(lod, approximation_steps)
+            geom = self.get_geometry(approximation_steps, kerf, bore, lod)
+            
+            yield (lod, geom)
+            
+            if steps >= approximation_steps:
+                break
+            
+            if tolerance != None and lod > 1:
+                # The distance between the new points (which have odd indices)
+                # and the lines of the previous level
+                vals = self._get_involute_samples(steps)
+                error = 0
+                
+                for i in range(1, len(vals) - 1, 2):
+                    error = max(error, geometric_functions.get_distance_to_line(vals[i], vals[i-1], vals[i+1]))
+                    
+                if error <= tolerance:
+                    break
+                
+            lod += 1
+    
+    def get_form_diameter(self):
+        """
+        Get the diameter at which the involute part of the flank starts (the
+        form diameter). Inside it, the flank is a radial line (or, for a 
+        HobbedGear, the trochoidal fillet).
+        
+        :returns: The form diameter.
+        """
+        
+        return 2 * self._get_involute_start_radius()
+
+    def _get_involute_start_radius(self):
+        """
+        Get the radius at which the involute part of the flank starts.
+        
+        :returns: The radius.
+        """
+        
+        return self.get_base_diameter() / 2
+    
+    def get_approximation_error(self, approximation_steps = DEFAULT_APPROXIMATION_STEPS, kerf = 0):
+        """
+        Measure the largest distance between the flank of the first tooth and the true involute.
+        
+        Each rotation of an involute is parallel to it, so the distance from a
+        point to the involute is the base radius multiplied by the angle
+        between the point and the involute at the same radius. The distance is
+        measured at ``APPROXIMATION_ERROR_SAMPLES`` points along each segment
+        of the flank, between the start of the involute and the outside circle.
+        
+        The offset flank (see geometric_functions.offset_line) is compared with
+        the involute offset by the kerf, which is the involute turned by
+        ``kerf / base radius``, so the rounding of its corners is included.
+        
+        :param approximation_steps: The number of steps to use to approximate the involute.
+        :param kerf: The amount by which to offset the flank.
+        
+        :returns: A tuple in the form ``(flank_error, offset_error)``, the largest
+            distances of the flank and of the offset flank from the involute.
+        """
+        
+        # The flank is offset as it is in get_tooth_geometry
+        kerf = self._get_flank_kerf(kerf)
+        
+        vals = self._get_flank(approximation_steps)[0]
+        vals_os = self._get_offset_flank(approximation_steps, kerf)[0]
+        
+        return (self._get_involute_deviation(vals, 0), self._get_involute_deviation(vals_os, kerf))
+    
+    def _get_flank_kerf(self, kerf):
+        """
+        Get the amount by which the flank is offset to account for the kerf.
+        
+        :param kerf: The amount by which to offset the output gear profile.
+        
+        :returns: The offset of the flank.
+        """
+        
+        return kerf
+    
+    def _get_involute_deviation(self, points, kerf):
+        """
+        Get the largest distance between the segments of a flank and the involute, offset by the kerf.
+        
+        :param points: The points of the flank, rotated into place for the first tooth.
+        
+        :returns: The distance.
+        """
+        
+        r = self.get_base_diameter() / 2
+        
+        # The involute is unwound from the base circle by the ratio u of the
+        # length of the tangent to the radius. Offsetting it unwinds it 
+        # further, so the offset involute spans these values of u.
+        u_start = math.sqrt(max((self._get_involute_start_radius() / r) ** 2 - 1, 0)) + kerf / r
+        u_end = math.sqrt((self.get_outside_diameter() / 2 / r) ** 2 - 1) + kerf / r
+        
+        points = numpy.asarray(points, dtype=float)
+        t = numpy.arange(Gear.APPROXIMATION_ERROR_SAMPLES)[:, None] / float(Gear.APPROXIMATION_ERROR_SAMPLES)
+        
+        # The points along each segment, followed by the last point
+        x = numpy.append((points[:-1, 0] + t * (points[1:, 0] - points[:-1, 0])).ravel(), points[-1, 0])
+        y = numpy.append((points[:-1, 1] + t * (points[1:, 1] - points[:-1, 1])).ravel(), points[-1, 1])
+        
+        # The involute is outside the base circle
+        rho = numpy.hypot(x, y)
+        outside = rho >= r
+        
+        rho = numpy.maximum(rho, r)
+        u = numpy.sqrt((rho / r) ** 2 - 1)
+        
+        # The angle through which the involute would have to be turned to
+        # pass through each point
+        angle = numpy.arctan2(y, x) - (self._get_flank_rotation() - kerf / r + involute(numpy.arccos(r / rho)))
+        
+        # The nearest point of the involute to each point is where the normal
+        # through it touches the base circle, at u + angle; only the points 
+        # which are nearest to the offset involute (rather than to its 
+        # extension towards the base circle) are measured
+        nearest = u + angle
+        inside = outside & (nearest >= u_start) & (nearest <= u_end)
+        
+        if not numpy.any(inside):
+            return 0.0
+        
+        return float(numpy.max(r * numpy.abs(angle[inside])))
+
+def _check_no_options(method_name, options):
+    """
+    Make sure that no unexpected keyword arguments were passed to a method.
+    
+    The keyword arguments which are specific to a kind of gear (e.g. the rim
+    of an internal gear) can only be passed by keyword, so that a value
+    passed in the position of another argument (e.g. the bore of a Gear) is
+    not silently used for them.
+    
+    :param method_name: The name of the method.
+    :param options: The remaining keyword arguments.
+    :raises: A TypeError if there are any.
+    """
+    
+    if len(options) > 0:
+        raise TypeError('{0}() got an unexpected keyword argument \'{1}\''.format(method_name, sorted(options.keys())[0]))
+
+class InternalGear(Gear):
+    """
+    An internal (ring) gear, whose teeth point towards its center.
+    
+    The teeth of an internal gear have the same shape as the spaces between 
+    the teeth of an external gear, so the same flank is used, extending 
+    from the tips of the teeth (inside) to their roots (outside). Accordingly,
+    ``get_root_diameter`` is the diameter of the tips of the teeth (the 
+    smallest diameter of the profile) and ``get_outside_diameter`` is the 
+    diameter of their roots (the largest diameter of the profile).
+    
+    A positive profile shift moves the profile away from the center, as for 
+    an external gear, so it enlarges both diameters and thins the teeth.
+    
+    The geometry is generated by rotating a single cached tooth, and the 
+    teeth are streamed to the exporters (see geometry.primitives.InstancedGeometry).
+    
+    """
+    
+    CACHE_DEPENDENCIES = dict(Gear.CACHE_DEPENDENCIES)
+    CACHE_DEPENDENCIES.update({
+        'outside_diameter': ('pitch', 'teeth', 'dedendum_factor', 'profile_shift'),
+        'root_diameter': ('pitch', 'teeth', 'addendum_factor', 'profile_shift'),
+        'involute_samples': ('pitch', 'teeth', 'pressure_angle', 'dedendum_factor', 'profile_shift'),
+        'tooth_template': ('pitch', 'teeth', 'pressure_angle', 'addendum_factor', 'dedendum_factor', 'profile_shift'),
+    })
+    
+    def _compute_outside_diameter(self):
+        pitch = float(self.pitch)
+        return self.get_pitch_diameter() + 2 * (self.dedendum_factor + self.profile_shift) / pitch
+    
+    def _compute_root_diameter(self):
+        pitch = float(self.pitch)
+        return self.get_pitch_diameter() - 2 * (self.addendum_factor - self.profile_shift) / pitch
+    
+    def _get_flank_points(self, approximation_steps):
+        """
+        Get the points of the flank of the first tooth, before it is rotated into place.
+        
+        If the tips of the teeth are outside the base circle, the involute is 
+        trimmed at the tips; otherwise, it is extended radially to them.
+        
+        :returns: A list of points.
+        """
+        
+        r = self.get_root_diameter() / 2
+        
+        if r <= self.get_base_diameter() / 2:
+            return Gear._get_flank_points(self, approximation_steps)
+        
+        return geometric_functions.extend_or_trim_start_of_line(self._get_involute_samples(approximation_steps), r)
+    
+    def _get_envelope_start(self, vals):
+        # If the involute is trimmed at the tips of the teeth, the flank has 
+        # no radial segment (see _get_flank_points)
+        if self.get_root_diameter() > self.get_base_diameter():
+            return 0
+        
+        return 1
+        
+    def get_geometry(self, approximation_steps = Gear.DEFAULT_APPROXIMATION_STEPS, kerf = 0, **options):
+        """
+        Get a geometry.primitives.InstancedGeometry object which represents the gear.
+        
+        The rim and the level of detail can only be passed by keyword (an 
+        internal gear has no bore, which is the third argument of Gear.get_geometry).
+        
+        :param approximation_steps: The number of steps to use to approximate the involute.
+        :param kerf: The amount by which to offset the output gear profile (to account for kerf).
+        :param rim: The outside diameter of the ring (or 0 for no rim).
+        :param lod: The level of detail (see ``get_lod_steps``), or None for full detail.
+        
+        :raises: A TypeError if any other keyword arguments are passed.
+        :returns: A geometry.primitives.InstancedGeometry object which represents the gear.
+        """
+        
+        rim = options.pop('rim', 0)
+        lod = options.pop('lod', None)
+        _check_no_options('get_geometry', options)
+        
+        # The material is outside of the profile, so the profile is offset
+        # inwards to account for the kerf (see get_tooth_geometry)
+        template = self.get_tooth_geometry(approximation_steps, kerf, lod).items
+        
+        items = []
+        
+        # Draw the rim
+        if rim > 0:
+            items.append(primitives.Circle((0, 0),
+                                           rim / 2 + kerf))
+        
+        return primitives.InstancedGeometry(template, self.teeth, self.get_circular_pitch(), items=items)
+    
+    def get_tooth_geometry(self, approximation_steps = Gear.DEFAULT_APPROXIMATION_STEPS, kerf = 0, lod = None):
+        # The material is outside of the profile, so the profile is offset
+        # inwards to account for the kerf
+        steps = self.get_lod_steps(lod, approximation_steps)
+        envelope = lod == Gear.LOD_ENVELOPE
+        
+        template = self._get_cached('tooth_template', (steps, kerf, envelope),
+                                    lambda: self._get_tooth(0, steps, self._get_flank_kerf(kerf), envelope))
+        
+        return primitives.Geometry(template)
+    
+    def _get_flank_kerf(self, kerf):
+        # The material is outside of the profile, so the flank is offset inwards
+        return -kerf
+    
+class HobbedGear(Gear):
+    """
+    An external gear whose teeth are generated by a rack cutter (e.g. the 
+    axial section of a hob), including the trochoidal fillets at their roots.
+    
+    The cutter is a rack whose teeth have flanks inclined at the pressure 
+    angle and tips rounded with ``tip_radius``. It is rolled along the pitch
+    circle through ``cutter_positions`` positions, and the flank of each 
+    tooth is the envelope of the positions, i.e. the boundary of the space 
+    which the cutter sweeps. The straight flanks of the cutter generate the
+    involute, and the rounded tips generate the fillet, which meets the root
+    circle tangentially (and undercuts the involute if there are too few 
+    teeth).
+    
+    The root diameter is the diameter cut by the tips of the cutter,
+    ``pitch diameter - 2 * (dedendum - shift) / pitch``, rather than the root
+    diameter of a Gear (which is measured from the base diameter).
+    
+    """
+    
+    # The number of positions of the cutter at which the envelope is taken
+    DEFAULT_CUTTER_POSITIONS = 1000
+    
+    CACHE_DEPENDENCIES = dict(Gear.CACHE_DEPENDENCIES)
+    CACHE_DEPENDENCIES.update({
+        'root_diameter': ('pitch', 'teeth', 'dedendum_factor', 'profile_shift'),
+        'flank': Gear.CACHE_DEPENDENCIES['flank'] + ('tip_radius', 'cutter_positions'),
+        'offset_flank': Gear.CACHE_DEPENDENCIES['offset_flank'] + ('tip_radius', 'cutter_positions'),
+        'teeth_geometry': Gear.CACHE_DEPENDENCIES['teeth_geometry'] + ('tip_radius', 'cutter_positions'),
+    })
+    
+    def __init__(self, pitch, teeth, pressure_angle, addendum_factor = Gear.DEFAULT_ADDENDUM, dedendum_factor = Gear.DEFAULT_DEDENDUM, 
+                 profile_shift = 0, tip_radius = None, cutter_positions = DEFAULT_CUTTER_POSITIONS):
+        """
+        :param tip_radius: The radius of the tips of the cutter teeth (see ``get_tip_radius``).
+        :param cutter_positions: The number of positions of the cutter.
+        
+        See Gear for the other parameters.
+        """
+        
+        Gear.__init__(self, pitch, teeth, pressure_angle, addendum_factor, dedendum_factor, profile_shift)
+        
+        self.tip_radius = tip_radius
+        self.cutter_positions = cutter_positions
+        
+    def _compute_root_diameter(self):
+        pitch = float(self.pitch)
+        return self.get_pitch_diameter() - 2 * (self.dedendum_factor - self.profile_shift) / pitch
+    
+    def get_tip_radius(self):
+        """
+        Get the radius of the tips of the cutter teeth.
+        
+        By default, this is the largest radius for which the straight flanks
+        of the cutter reach the working depth (the addendum of a mating gear),
+        so the fillet is entirely below the active part of the involute. The 
+        radius is limited to that of a fully rounded tip.
+        
+        :raises: An Exception if the flanks of the cutter teeth intersect.
+        :returns: The tip radius.
+        """
+        
+        pitch = float(self.pitch)
+        pressure_angle = float(self.pressure_angle) * math.pi / 180
+        
+        # The half-width of the tip of a cutter tooth with sharp corners
+        tip_width = math.pi / pitch / 4 - self.dedendum_factor / pitch * math.tan(pressure_angle)
+        
+        if tip_width <= 0:
+            raise Exception('The flanks of the cutter teeth intersect; reduce the dedendum.')
+        
+        full_radius = tip_width * math.cos(pressure_angle) / (1 - math.sin(pressure_angle))
+        
+        if self.tip_radius != None:
+            if self.tip_radius > full_radius:
+                raise Exception('The tip radius is too large; the largest tip radius is {0}.'.format(full_radius))
+            
+            return self.tip_radius
+        
+        clearance = (self.dedendum_factor - self.addendum_factor) / pitch
+        
+        return min(max(clearance, 0) / (1 - math.sin(pressure_angle)), full_radius)
+    
+    def _get_involute_start_radius(self):
+        """
+        Get the radius at which the involute part of the flank starts (the
+        form radius), which is generated by the lowest point of the straight
+        flank of the cutter.
+        
+        If the gear is undercut, this is the base radius, so the undercut is
+        measured as a deviation from the involute.
+        
+        :returns: The radius.
+        """
+        
+        pitch = float(self.pitch)
+        pressure_angle = float(self.pressure_angle) * math.pi / 180
+        
+        # The height of the lowest point of the straight flank above the
+        # pitch line, and the distance from the pitch point to the point of
+        # the line of action at which it cuts the gear
+        height = (self.profile_shift - self.dedendum_factor) / pitch + self.get_tip_radius() * (1 - math.sin(pressure_angle))
+        distance = self.get_pitch_diameter() / 2 * math.sin(pressure_angle) + height / math.sin(pressure_angle)
+        
+        return math.hypot(self.get_base_diameter() / 2, max(distance, 0))
+    
+    def _get_flank_points(self, approximation_steps):
+        """
+        Get the points of the flank of the first tooth, before it is rotated into place.
+        
+        The flank is sampled at ``2 * approximation_steps`` radii, which are
+        closer together near the root circle, where the fillet curves most.
+        
+        :returns: A list of points.
+        """
+        
+        pitch = float(self.pitch)
+        pressure_angle = float(self.pressure_angle) * math.pi / 180
+        
+        pitch_radius = self.get_pitch_diameter() / 2
+        outside_radius = self.get_outside_diameter() / 2
+        root_radius = self.get_root_diameter() / 2
+        rho = self.get_tip_radius()
+        
+        # The profile of half of a cutter tooth, in the frame of the rack: u
+        # is along the reference line from the middle of the tooth, and v is
+        # away from the gear. The reference line is the profile shift
+        # outside the pitch circle, on which the cutter rolls.
+        depth = self.dedendum_factor / pitch
+        height = outside_radius - root_radius
+        reference = self.profile_shift / pitch
+        
+        def get_flank_u(v):
+            return math.pi / pitch / 4 + v * math.tan(pressure_angle)
+        
+        # The center of the rounded tip, and the points at which it meets the
+        # tip and the flank
+        center_u = get_flank_u(rho - depth) - rho / math.cos(pressure_angle)
+        center_v = rho - depth
+        
+        tip = (center_u, -depth)
+        tangent = (center_u + rho * math.cos(pressure_angle), center_v - rho * math.sin(pressure_angle))
+        top = (get_flank_u(height), height)
+        
+        # The positions of the cutter, given by the angle through which it 
+        # has rolled, from where the middle of the tooth is at angle 0 (the
+        # middle of the space). The cutter is only inside the blank for
+        # angles within the distance it travels across the outside circle.
+        travel = math.sqrt(outside_radius ** 2 - root_radius ** 2)
+        angles = numpy.linspace(-travel / pitch_radius, (top[0] + travel) / pitch_radius, self.cutter_positions)
+        
+        cos = numpy.cos(angles)[:, None]
+        sin = numpy.sin(angles)[:, None]
+        
+        def to_gear(u, v):
+            # The point in the frame of the gear, for every position
+            r = pitch_radius + reference + v
+            w = u - pitch_radius * angles[:, None]
+            
+            return (r * cos - w * sin, r * sin + w * cos)
+        
+        # The radii at which the flank is sampled
+        steps = 2 * approximation_steps
+        radii = root_radius + (outside_radius - root_radius) * (numpy.arange(1, steps + 1) / float(steps)) ** 2
+        
+        crossings = numpy.full((self.cutter_positions, steps), -numpy.inf)
+        
+        # The straight parts of the profile (the tip and the flank)
+        for a, b in ((tip, tangent), (tangent, top)) if rho > 0 else (((0, -depth), tip), (tip, top)):
+            ax, ay = to_gear(*a)
+            bx, by = to_gear(*b)
+            
+            dx = bx - ax
+            dy = by - ay
+            
+            # Solve |a + t d| = r for t
+            qa = dx * dx + dy * dy
+            qb = 2 * (ax * dx + ay * dy)
+            qc = ax * ax + ay * ay - radii * radii
+            
+            disc = qb * qb - 4 * qa * qc
+            
+            for sign in (-1, 1):
+                t = (-qb + sign * numpy.sqrt(numpy.maximum(disc, 0))) / (2 * qa)
+                valid = (disc >= 0) & (t >= 0) & (t <= 1)
+                
+                angle = numpy.arctan2(ay + t * dy, ax + t * dx)
+                crossings = numpy.where(valid, numpy.maximum(crossings, angle), crossings)
+        
+        # The rounded tip, which crosses each circle where the circle of the 
+        # tip does, between the tip and the flank
+        if rho > 0:
+            cx, cy = to_gear(center_u, center_v)
+            c2 = cx * cx + cy * cy
+            c = numpy.sqrt(c2)
+            
+            # The angle at the origin between the center and the crossings
+            cos_phi = (c2 + radii * radii - rho * rho) / (2 * c * radii)
+            valid = numpy.abs(cos_phi) <= 1
+            phi = numpy.arccos(numpy.clip(cos_phi, -1, 1))
+            
+            center_angle = numpy.arctan2(cy, cx)
+            
+            # The arc spans the directions from the center of the tip between 
+            # (0, -1) and (cos(a), -sin(a)) in the frame of the rack; a point
+            # is on it if it is on the flank side of the tip and below the
+            # tangent point
+            for sign in (-1, 1):
+                angle = center_angle + sign * phi
+                
+                px = radii * numpy.cos(angle) - cx
+                py = radii * numpy.sin(angle) - cy
+                
+                # The point relative to the center, in the frame of the rack
+                pu = -px * sin + py * cos
+                pv = px * cos + py * sin
+                
+                on_arc = valid & (pu >= 0) & (pv <= 0) & (pu * math.sin(pressure_angle) + pv * math.cos(pressure_angle) <= 0)
+                crossings = numpy.where(on_arc, numpy.maximum(crossings, angle), crossings)
+        
+        flank_angles = crossings.max(axis=0)
+        
+        # The flank meets the root circle where the end of the flat tip 
+        # touches it, directly below the point at which the cutter rolls
+        points = [(root_radius * math.cos(tip[0] / pitch_radius), root_radius * math.sin(tip[0] / pitch_radius))]
+        points.extend(zip(radii * numpy.cos(flank_angles), radii * numpy.sin(flank_angles)))
+        
+        # Rotate the flank back, so that it is rotated into place with the 
+        # involute of a Gear (see _compute_flank)
+        return geometric_functions.get_rotated_points(points, -self._get_flank_rotation())
+    
+    def _get_envelope_start(self, vals):
+        # The involute starts at the form radius; the fillet below it is kept as a polyline
+        r = self._get_involute_start_radius()
+        
+        for i in range(1, len(vals)):
+            if math.hypot(vals[i][0], vals[i][1]) >= r:
+                return i
+        
+        return len(vals) - 1
+    
+    def _compute_flank(self, approximation_steps):
+        vals, vals_2, rot_angle, top_rot_angle = Gear._compute_flank(self, approximation_steps)
+        
+        # The outer arc joins the end of the generated flank, which is 
+        # only approximately the end of the involute
+        top_rot_angle = (self.get_circular_pitch() - 2 * math.atan2(vals[-1][1], vals[-1][0])) / 2
+        
+        return (vals, vals_2, rot_angle, top_rot_angle)
+    
+class Rack:
+    """
+    A straight rack. 
+    
+    A rack is the limit of an involute gear as the number of teeth (and so 
+    the base diameter) becomes infinite, at which point the involute becomes
+    a straight flank inclined at the pressure angle.
+    
+    The pitch line is the x-axis, and the teeth point in the negative 
+    y-direction (up, in an SVG). The geometry is generated by translating a
+    single tooth, and the teeth are streamed to the exporters (see 
+    geometry.primitives.InstancedGeometry), so very long racks can be written
+    without creating an object for every tooth.
+    
+    """
+    
+    def __init__(self, pitch, teeth, pressure_angle, addendum_factor = Gear.DEFAULT_ADDENDUM, dedendum_factor = Gear.DEFAULT_DEDENDUM):
+        self.pitch = pitch
+        self.teeth = teeth
+        self.pressure_angle = pressure_angle
+        self.addendum_factor = addendum_factor
+        self.dedendum_factor = dedendum_factor
+        
+    def get_circular_pitch(self):
+        """
+        Get the distance between adjacent teeth, along the pitch line.
+        
+        :returns: The circular pitch.
+        """
+        
+        pitch = float(self.pitch)
+        return math.pi / pitch
+    
+    def get_length(self):
+        """
+        Get the length of the toothed part of the rack.
+        
+        :returns: The length.
+        """
+        
+        return self.teeth * self.get_circular_pitch()
+    
+    def _get_tooth_points(self, kerf):
+        """
+        Get the profile of the first tooth, from the middle of the space before
+        it to the middle of the space after it.
+        
+        :raises: An Exception if the flanks of the teeth intersect.
+        :returns: A list of points.
+        """
+        
+        pitch = float(self.pitch)
+        circular_pitch = self.get_circular_pitch()
+        
+        pressure_angle = float(self.pressure_angle) * math.pi / 180
+        slope = math.tan(pressure_angle)
+        
+        # The tips and roots of the teeth, offset by the kerf
+        tip_y = -self.addendum_factor / pitch - kerf
+        root_y = self.dedendum_factor / pitch - kerf
+        
+        # The x-coordinate of the leading flank at a given y-coordinate. The
+        # flank crosses the pitch line a quarter of the circular pitch from 
+        # the start of the tooth, and is offset by the kerf along its normal.
+        def get_flank_x(y):
+            return circular_pitch / 4 - kerf / math.cos(pressure_angle) - y * slope
+        
+        if get_flank_x(root_y) <= 0 or get_flank_x(tip_y) >= circular_pitch / 2:
+            raise Exception('The flanks of the rack teeth intersect; reduce the addendum, dedendum or kerf.')
+        
+        return [(0, root_y),
+                (get_flank_x(root_y), root_y),
+                (get_flank_x(tip_y), tip_y),
+                (circular_pitch - get_flank_x(tip_y), tip_y),
+                (circular_pitch - get_flank_x(root_y), root_y),
+                (circular_pitch, root_y)]
+        
+    def get_geometry(self, approximation_steps = None, kerf = 0, **options):
+        """
+        Get a geometry.primitives.InstancedGeometry object which represents the rack.
+        
+        The arguments are in the same order as those of Gear.get_geometry; 
+        the flanks of a rack are straight, so the number of steps is ignored.
+        The back of the rack can only be passed by keyword.
+        
+        :param approximation_steps: Ignored.
+        :param kerf: The amount by which to offset the output profile (to account for kerf).
+        :param back: The distance from the roots of the teeth to the back of the rack (defaults to the whole depth of the teeth).
+        
+        :raises: A TypeError if any other keyword arguments are passed.
+        :returns: A geometry.primitives.InstancedGeometry object which represents the rack.
+        """
+        
+        back = options.pop('back', None)
+        _check_no_options('get_geometry', options)
+        
+        pitch = float(self.pitch)
+        
+        if back == None:
+            back = (self.addendum_factor + self.dedendum_factor) / pitch
+        
+        template = [primitives.Polyline(self._get_tooth_points(kerf))]
+        
+        # Close the profile around the ends and the back of the rack
+        length = self.get_length()
+        root_y = self.dedendum_factor / pitch - kerf
+        back_y = self.dedendum_factor / pitch + back + kerf
+        
+        outline = primitives.Polyline([(length, root_y),
+                                       (length + kerf, root_y),
+                                       (length + kerf, back_y),
+                                       (-kerf, back_y),
+                                       (-kerf, root_y),
+                                       (0, root_y)])
+        
+        return primitives.InstancedGeometry(template, self.teeth, offset=(self.get_circular_pitch(), 0), items=[outline])
+
+# The fields of the table returned by get_approximation_report
+APPROXIMATION_FIELDS = [('steps', int),
+                        ('vertices', int),
+                        ('flank_error', float),
+                        ('offset_error', float),
+                        ('time', float),
+                        ('svg_bytes', int),
+                        ('dxf_bytes', int)]
+
+# The numbers of steps compared by default (each about 1.5 times the previous)
+DEFAULT_REPORT_STEPS = (2, 3, 4, 6, 8, 12, 16, 24, 32, 48, 64, 96, 128)
+
+def get_approximation_report(g, steps = DEFAULT_REPORT_STEPS, kerf = 0, bore = 0, svg_options = {}):
+    """
+    Compare the accuracy of the geometry of a gear with its cost, for several numbers of steps.
+    
+    The table has a row for each number of steps, containing:
+    
+    * ``vertices``: the number of vertices of the polylines of the geometry.
+    * ``flank_error`` and ``offset_error``: the largest distances of the
+      flank and of the flank offset by the kerf from the involute (see
+      Gear.get_approximation_error).
+    * ``time``: the time taken to generate the geometry, in seconds,
+      starting with no cached values.
+    * ``svg_bytes`` and ``dxf_bytes``: the sizes of the SVG and DXF files.
+    
+    The cached values of the gear are discarded before each geometry is generated.
+    
+    :param g: The gear.
+    :param steps: The numbers of steps to use to approximate the involute.
+    :param kerf: The amount by which to offset the output gear profile (to account for kerf).
+    :param bore: The diameter of the bore of the gear (or 0 for no bore, which is required for an InternalGear).
+    :param svg_options: The keyword arguments of geometry.primitives.Geometry.write_svg.
+    
+    :raises: An Exception if the gear is a Rack.
+    :returns: A NumPy structured array with the fields ``APPROXIMATION_FIELDS``.
+    """
+    
+    if not isinstance(g, Gear):
+        raise Exception('The approximation report requires a Gear or an InternalGear; the flanks of a rack are straight.')
+    
+    # Only a Gear has a bore (see InternalGear.get_geometry)
+    options = {}
+    
+    if bore > 0:
+        options['bore'] = bore
+    
+    table = numpy.zeros(len(steps), dtype=APPROXIMATION_FIELDS)
+    
+    directory = tempfile.mkdtemp()
+    svg_name = os.path.join(directory, 'gear.svg')
+    dxf_name = os.path.join(directory, 'gear.dxf')
+    
+    try:
+        for row, approximation_steps in zip(table, steps):
+            g._cache.clear()
+            
+            start = time.time()
+            geom = g.get_geometry(approximation_steps, kerf, **options)
+            row['time'] = time.time() - start
+            
+            row['steps'] = approximation_steps
+            row['vertices'] = sum(len(item.points) for item in geom.items if isinstance(item, primitives.Polyline))
+            row['flank_error'], row['offset_error'] = g.get_approximation_error(approximation_steps, kerf)
+            
+            geom.write_svg(svg_name, **svg_options)
+            geom.write_dxf(dxf_name)
+            
+            row['svg_bytes'] = os.path.getsize(svg_name)
+            row['dxf_bytes'] = os.path.getsize(dxf_name)
+    finally:
+        shutil.rmtree(directory)
+    
+    return table
+
+def get_cheapest_steps(table, tolerance):
+    """
+    Find the number of steps with the fewest vertices whose offset flank is within a tolerance of the involute.
+    
+    :param table: A table returned by ``get_approximation_report``.
+    :param tolerance: The largest acceptable distance from the involute.
+    
+    :returns: The number of steps, or None if no number of steps is accurate enough.
+    """
+    
+    accurate = table[table['offset_error'] <= tolerance]
+    
+    if len(accurate) == 0:
+        return None
+    
+    return int(accurate['steps'][numpy.argmin(accurate['vertices'])])
+
+def _positive_int(raw_val):
+    """
+    Parse the input value and ensure that it is a positive integer.
+    
+    :param raw_val: The input value.
+    :raises: An Exception if the input value is not an integer or is not positive.
+    :returns: A positive integer.
     
     """
     
@@ -274,10 +1604,70 @@ def _positive_float(raw_val):
     
     return val
 
+def _lod_spec(raw_val):
+    """
+    Parse a level of detail for an output format, in the form ``FORMAT=LEVEL``.
+    
+    :param raw_val: The input value.
+    :raises: An Exception if the input value is not in the expected form.
+    :returns: A tuple in the form ``(extension, level)``, e.g. ``('.svg', 0)``.
+    
+    """
+    
+    try:
+        fmt, level = raw_val.split('=')
+        level = int(level)
+    except:
+        raise Exception('Expecting a level of detail in the form FORMAT=LEVEL; got {0}'.format(raw_val))
+    
+    if level < 0:
+        raise Exception('Expecting a non-negative level of detail; got {0}'.format(raw_val))
+    
+    return ('.' + fmt.lower().lstrip('.'), level)
+
 import argparse
 import sys
 
-def run_with_args(input_args):
+def _print_approximation_report(g, args):
+    """
+    Print the table of ``get_approximation_report`` and the recommended number of steps.
+    
+    :param g: The gear.
+    :param args: The parsed command line arguments.
+    
+    """
+    
+    style = {'stroke': 'black', 
+             'stroke-width': 0.002, 
+             'fill': 'transparent' }
+    
+    table = get_approximation_report(g, sorted(set(args.report_steps)), args.k, args.b or 0, 
+                                     {'scale': args.svg_scale, 'style': style, 'precision': args.svg_precision})
+    
+    print '{0:>6} {1:>9} {2:>12} {3:>12} {4:>9} {5:>10} {6:>10}'.format('steps', 'vertices', 'flank error', 'offset error', 'time (s)', 'SVG bytes', 'DXF bytes')
+    
+    for row in table:
+        print '{0:>6} {1:>9} {2:>12.3e} {3:>12.3e} {4:>9.4f} {5:>10} {6:>10}'.format(*row)
+    
+    steps = get_cheapest_steps(table, args.report)
+    
+    if steps == None:
+        print 'No number of steps is within {0} of the involute.'.format(args.report)
+    else:
+        print 'The cheapest number of steps within {0} of the involute is -r {1}.'.format(args.report, steps)
+
+def run_with_args(input_args, gears = None):
+    """
+    Generate a gear from command line arguments.
+    
+    :param input_args: The command line arguments (see ``python gear.py -h``).
+    :param gears: A dictionary in which the gears are kept between calls, keyed by 
+        their parameters, so that a gear whose parameters have not changed is 
+        reused with its cached profile (e.g. when only the kerf or bore changes).
+    
+    :returns: The gear.
+    """
+    
     parser = argparse.ArgumentParser(description='Generate involute gears.')
     parser.add_argument('-n', type=_positive_int, required=True, help='The number of teeth.')
     parser.add_argument('-p', type=_positive_int, required=True, help='The pitch.')
@@ -286,20 +1676,85 @@ def run_with_args(input_args):
     parser.add_argument('-k', type=float, default=0, help='The amount of kerf.')
     parser.add_argument('--addendum', type=_positive_float, default=Gear.DEFAULT_ADDENDUM, help='The addendum factor.')
     parser.add_argument('--dedendum', type=_positive_float, default=Gear.DEFAULT_DEDENDUM, help='The dedendum factor.')
+    parser.add_argument('--shift', type=float, default=0, help='The profile shift coefficient.')
+    parser.add_argument('--hob', action='store_true', help='Generate the teeth with a rack cutter (hob), including the root fillets.')
+    parser.add_argument('--tip_radius', type=_positive_float, default=None, help='The radius of the tips of the cutter teeth (with the --hob flag).')
     parser.add_argument('-r', type=_positive_int, default=Gear.DEFAULT_APPROXIMATION_STEPS, help='The number of steps to use to approximate the involute.')
-    parser.add_argument('-s', type=str, help='The SVG file to output.')
+    parser.add_argument('-s', type=str, help='The SVG file to output (compressed if it ends with .svgz or .gz).')
     parser.add_argument('--svg_scale', type=_positive_float, default=1, help='The amount by which to scale the SVG output.')
-    parser.add_argument('-d', type=str, help='The DXF file to output.')
+    parser.add_argument('--svg_precision', type=_positive_int, default=svg_utils.DEFAULT_PRECISION, help='The number of decimal places to use for SVG coordinates.')
+    parser.add_argument('-d', type=str, help='The DXF file to output (compressed if it ends with .gz).')
+    parser.add_argument('--stl', type=str, help='The STL file to output.')
+    parser.add_argument('--face_width', type=_positive_float, default=None, help='The face width of the gear (required for STL output).')
+    parser.add_argument('--helix_angle', type=float, default=0, help='The helix angle, in degrees (for STL output).')
+    parser.add_argument('--layers', type=_positive_int, default=None, help='The number of layers into which the helix is divided (for STL output).')
+    parser.add_argument('--validate', action='store_true', help='Check the gear for intersections and gaps before writing any output.')
+    parser.add_argument('--lod', type=_lod_spec, action='append', default=[], help='The level of detail for an output format, in the form FORMAT=LEVEL (e.g. svg=0 for a quick preview).')
+    parser.add_argument('--processes', action='store_true', help='Write the output files concurrently using a pool of processes (by default, they are written one after another).')
+    parser.add_argument('--compare', type=str, action='append', default=[], help='An existing SVG or DXF file to compare with the gear (SVG files are read using the --svg_scale flag).')
+    parser.add_argument('--tolerance', type=_positive_float, default=None, help='The largest deviation ignored when comparing files (defaults to the rounding of the SVG output for SVG files).')
+    parser.add_argument('--report', type=_positive_float, default=None, metavar='TOLERANCE', help='Instead of writing any output, compare the deviation from the involute, the number of vertices, the generation time and the size of the output for several numbers of steps, and recommend the cheapest number of steps whose deviation is at most TOLERANCE.')
+    parser.add_argument('--report_steps', type=_positive_int, nargs='+', default=DEFAULT_REPORT_STEPS, help='The numbers of steps to compare (with the --report flag).')
     args = parser.parse_args(input_args)
     
     # Make sure at least one output file was specified
-    if args.s == None and args.d == None:
-        raise Exception('No output file specified (use the -s or -d flags).')
+    if args.s == None and args.d == None and args.stl == None and len(args.compare) == 0 and args.report == None:
+        raise Exception('No output file specified (use the -s, -d or --stl flags).')
+    
+    if args.stl != None and args.face_width == None:
+        raise Exception('A face width must be specified for STL output (use the --face_width flag).')
+    
+    key = (args.hob, args.p, args.n, args.a, args.addendum, args.dedendum, args.shift, args.tip_radius)
+    
+    if gears != None and gears.has_key(key):
+        g = gears[key]
+    elif args.hob:
+        g = HobbedGear(args.p, args.n, args.a, args.addendum, args.dedendum, args.shift, args.tip_radius)
+    else:
+        g = Gear(args.p, args.n, args.a, args.addendum, args.dedendum, args.shift)
+    
+    if gears != None:
+        gears[key] = g
     
-    g = Gear(args.p, args.n, args.a, args.addendum, args.dedendum)
+    # Compare the numbers of steps instead of writing any output
+    if args.report != None:
+        _print_approximation_report(g, args)
+        return g
+    
+    # The level of detail for each output format (full detail by default)
+    lods = dict(args.lod)
     
     geom = g.get_geometry(args.r, args.k, args.b)
     
+    # Make sure the profile can be cut
+    if args.validate:
+        problems = geom.validate()
+        
+        if len(problems) > 0:
+            kind, point, items, size = problems[0]
+            raise Exception('The gear geometry is invalid: found {0} problem(s), the first is a {1} at ({2}, {3}).'.format(len(problems), kind, point[0], point[1]))
+    
+    # Make sure the existing files match the gear
+    for file_name in args.compare:
+        options = {}
+        tolerance = args.tolerance
+        
+        if importers.get_importer_ext(file_name) in ('.svg', '.svgz', '.svg.gz'):
+            # Read the file in the same frame as the SVG output
+            options = {'scale': args.svg_scale,
+                       'offset': geom.get_bounds_and_margin(scale=args.svg_scale)[1]}
+            
+            if tolerance == None:
+                tolerance = 10.0 ** -args.svg_precision / args.svg_scale
+        
+        differences = geom.diff(importers.read_geometry(file_name, **options), tolerance)
+        
+        if len(differences) > 0:
+            kind, expected_index, actual_index, deviation = differences[0]
+            raise Exception('{0} does not match the gear: found {1} difference(s), the first is a {2} item.'.format(file_name, len(differences), kind))
+    
+    exports = []
+    
     # Generate an SVG
     if args.s != None:
         # Draw using a black line
@@ -307,11 +1762,32 @@ def run_with_args(input_args):
              'stroke-width': 0.002, 
              'fill': 'transparent' }
         
-        geom.write_svg(args.s, args.svg_scale, style=style)
+        exports.append((args.s, {'scale': args.svg_scale, 
+                                 'style': style, 
+                                 'precision': args.svg_precision}, '.svg'))
     
     # Generate a DXF
     if args.d != None:
-        geom.write_dxf(args.d)
+        exports.append((args.d, {}, '.dxf'))
+    
+    # Generate an STL
+    if args.stl != None:
+        exports.append((args.stl, {'height': args.face_width, 
+                                   'twist': g.get_helix_twist(args.face_width, args.helix_angle), 
+                                   'layers': args.layers}, '.stl'))
+        
+    # Write the files, with one group of exports per level of detail
+    for lod in set(lods.get(export[2]) for export in exports):
+        lod_exports = [export for export in exports if lods.get(export[2]) == lod]
+        
+        if lod == None:
+            lod_geom = geom
+        else:
+            lod_geom = g.get_geometry(args.r, args.k, args.b, lod)
+            
+        lod_geom.export_many(lod_exports, processes=args.processes)
+    
+    return g
 
 if __name__ == '__main__':
     run_with_args(sys.argv)
\ No newline at end of file
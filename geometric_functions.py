@@ -21,10 +21,14 @@ def get_rotated_points(points, angle, center = (0, 0)):
     
     points_out = []
     
+    # Compute the rotation once rather than converting every point to polar form
+    c = math.cos(angle)
+    s = math.sin(angle)
+    
     for p in points:
-        a = math.atan2(p[1] - center[1], p[0] - center[0])
-        r = math.sqrt(math.pow(p[0] - center[0], 2) + math.pow(p[1] - center[1], 2))
-        points_out.append((r*math.cos(a+angle), r*math.sin(a+angle)))
+        x = p[0] - center[0]
+        y = p[1] - center[1]
+        points_out.append((x*c - y*s, x*s + y*c))
     
     return points_out
 
@@ -96,6 +100,102 @@ def offset_line(points, offset):
     
     return points_out
 
+def offset_line_without_reversals(points, offset):
+    """
+    Offset a polyline (see ``offset_line``), dropping the points of any segment
+    whose offset runs backwards (e.g. a segment which is shorter than the 
+    offset, next to a corner which is offset towards its inside).
+    
+    :param points: The points which comprise the polyline.
+    :param offset: The amount by which to offset the polyline.
+    
+    :return: A list of points.
+    """
+    
+    points = list(points)
+    
+    while True:
+        points_out = offset_line(points, offset)
+        
+        if len(points) < 3:
+            return points_out
+        
+        for i in range(len(points) - 1):
+            dot = ((points_out[i+1][0] - points_out[i][0]) * (points[i+1][0] - points[i][0]) + 
+                   (points_out[i+1][1] - points_out[i][1]) * (points[i+1][1] - points[i][1]))
+            
+            if dot <= 0:
+                break
+        else:
+            return points_out
+        
+        # Keep the ends of the polyline
+        if i + 1 < len(points) - 1:
+            del points[i+1]
+        else:
+            del points[i]
+
+def get_segment_intersection(p1, p2, p3, p4):
+    """
+    Get the point at which two line segments cross.
+    
+    :param p1: The first point of the first segment.
+    :param p2: The second point of the first segment.
+    :param p3: The first point of the second segment.
+    :param p4: The second point of the second segment.
+    
+    :return: The point, or None if the segments do not cross (or only touch at their ends).
+    """
+    
+    ax = p2[0] - p1[0]
+    ay = p2[1] - p1[1]
+    bx = p4[0] - p3[0]
+    by = p4[1] - p3[1]
+    
+    d = ax * by - ay * bx
+    
+    if d == 0:
+        return None
+    
+    cx = p3[0] - p1[0]
+    cy = p3[1] - p1[1]
+    
+    t = (cx * by - cy * bx) / d
+    u = (cx * ay - cy * ax) / d
+    
+    if t <= 0 or t >= 1 or u <= 0 or u >= 1:
+        return None
+    
+    return (p1[0] + t * ax, p1[1] + t * ay)
+
+def remove_loops(points):
+    """
+    Remove the loops from a polyline which crosses itself (e.g. the swallowtail
+    left by offsetting a sharp corner towards its inside), by joining each pair
+    of crossing segments at the point at which they cross.
+    
+    :param points: The points which comprise the polyline.
+    
+    :return: A list of points.
+    """
+    
+    points_out = list(points)
+    
+    i = 0
+    while i < len(points_out) - 3:
+        # Join the segment to the last segment which it crosses, so that
+        # nested loops are removed at once
+        for j in range(len(points_out) - 2, i + 1, -1):
+            p = get_segment_intersection(points_out[i], points_out[i+1], points_out[j], points_out[j+1])
+            
+            if p != None:
+                points_out[i+1:j+1] = [p]
+                break
+        
+        i += 1
+    
+    return points_out
+
 def extend_or_trim_start_of_line(points, r):
     """
     Either extend or trim a polyline so that its first point is a distance r from the origin. 
@@ -159,8 +259,15 @@ def extend_or_trim_start_of_line(points, r):
 
                 return points_out
     else:
-        # An additional point must be added to the list
-        raise Exception('Points must be added to the line, but this functionality is not implemented.')
+        # An additional point must be added to the list, by extending the
+        # first segment back towards the circle
+        angle = math.atan2(points[0][1] - points[1][1], points[0][0] - points[1][0])
+        l = get_distance_to_circle(points[0], angle, r, True)
+        
+        points_out = list(points)
+        points_out.insert(0, (points[0][0] + l * math.cos(angle), points[0][1] + l * math.sin(angle)))
+        
+        return points_out
 
 def extend_or_trim_end_of_line(points, r):
     """
@@ -208,7 +315,74 @@ def extend_or_trim_end_of_line(points, r):
 
         return points_out
     else:
-        raise Exception('The line must be trimmed, but this functionality is not implemented.')
+        # Points must be removed from the list. Find the last point which is
+        # inside the circle, and trim the segment which follows it.
+        for i in range(len(points) - 2, -1, -1):
+            if math.sqrt(math.pow(points[i][0], 2) + math.pow(points[i][1], 2)) <= r:
+                angle = math.atan2(points[i+1][1] - points[i][1], points[i+1][0] - points[i][0])
+                l = get_distance_to_circle(points[i], angle, r)
+                
+                points_out = list(points[:i+1])
+                points_out.append((points[i][0] + l * math.cos(angle), points[i][1] + l * math.sin(angle)))
+                
+                return points_out
+            
+        raise Exception('The line does not intersect the circle.')
+    
+def trim_end_of_line_at_angle(points, angle):
+    """
+    Trim a polyline at the first point at which it crosses the ray from the origin at the specified angle. 
+    
+    The angles of the points are assumed to increase along the polyline. If
+    the polyline does not cross the ray, it is returned unchanged.
+    
+    :param points: The points which comprise the polyline.
+    :param angle: The angle of the ray.
+    """
+    
+    c = math.cos(angle)
+    s = math.sin(angle)
+    
+    # The distance of each point from the line through the ray (positive before the ray)
+    sides = [p[0] * s - p[1] * c for p in points]
+    
+    for i in range(len(points) - 1):
+        if sides[i] > 0 and sides[i+1] <= 0 and points[i+1][0] * c + points[i+1][1] * s > 0:
+            t = sides[i] / (sides[i] - sides[i+1])
+            
+            points_out = list(points[:i+1])
+            points_out.append((points[i][0] + t * (points[i+1][0] - points[i][0]), 
+                               points[i][1] + t * (points[i+1][1] - points[i][1])))
+            
+            return points_out
+    
+    return list(points)
+
+def get_distance_to_circle(p, angle, r, nearest = False):
+    """
+    Get the distance from a point, in the specified direction, to a circle centered at the origin.
+    
+    :param p: The point. 
+    :param angle: The direction, in radians.
+    :param r: The radius of the circle.
+    :param nearest: True to get the distance to the nearer of the two intersections, rather than the farther.
+    
+    :raises: An Exception if the line does not intersect the circle.
+    :return: The distance (negative if the intersection is behind the point).
+    """
+    
+    b = p[0] * math.cos(angle) + p[1] * math.sin(angle)
+    c = math.pow(p[0], 2) + math.pow(p[1], 2) - math.pow(r, 2)
+    
+    discriminant = b * b - c
+    
+    if discriminant < 0:
+        raise Exception('The line does not intersect the circle.')
+    
+    if nearest:
+        return -b - math.sqrt(discriminant)
+    
+    return -b + math.sqrt(discriminant)
     
 def get_angle_between_points(p1, p2, center = (0, 0)):
     """
@@ -222,4 +396,53 @@ def get_angle_between_points(p1, p2, center = (0, 0)):
     
     a1 = math.atan2(p1[1] - center[1], p1[0] - center[0])
     a2 = math.atan2(p2[1] - center[1], p2[0] - center[0])
-    return a2 - a1
\ No newline at end of file
+    return a2 - a1
+
+def get_circle_through_points(p1, p2, p3):
+    """
+    Get the circle which passes through three points.
+    
+    :param p1: The first point.
+    :param p2: The second point.
+    :param p3: The third point.
+    
+    :return: The circle in the form ``((x, y), r)``, or None if the points are collinear.
+    """
+    
+    ax = p2[0] - p1[0]
+    ay = p2[1] - p1[1]
+    bx = p3[0] - p1[0]
+    by = p3[1] - p1[1]
+    
+    d = 2 * (ax * by - ay * bx)
+    
+    if abs(d) <= 1e-12 * (ax * ax + ay * ay + bx * bx + by * by):
+        return None
+    
+    a2 = ax * ax + ay * ay
+    b2 = bx * bx + by * by
+    
+    x = (by * a2 - ay * b2) / d
+    y = (ax * b2 - bx * a2) / d
+    
+    return ((p1[0] + x, p1[1] + y), math.sqrt(x * x + y * y))
+
+def get_distance_to_line(p, p1, p2):
+    """
+    Get the distance from a point to the line through two other points.
+    
+    :param p: The point.
+    :param p1: The first point on the line.
+    :param p2: The second point on the line.
+    
+    :return: The distance.
+    """
+    
+    dx = p2[0] - p1[0]
+    dy = p2[1] - p1[1]
+    length = math.sqrt(dx * dx + dy * dy)
+    
+    if length == 0:
+        return math.sqrt(math.pow(p[0] - p1[0], 2) + math.pow(p[1] - p1[1], 2))
+    
+    return abs(dx * (p[1] - p1[1]) - dy * (p[0] - p1[0])) / length
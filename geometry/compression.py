@@ -0,0 +1,57 @@
+"""
+Contains functions for opening files which may be compressed.
+
+Files whose names end with one of ``COMPRESSED_EXTENSIONS`` (e.g. ``.svgz``
+or ``.dxf.gz``) are compressed with gzip as they are written, so output is
+never held in memory in order to compress it. The modification time in the
+gzip header is set to 0, so the same geometry always produces the same file.
+
+"""
+
+import gzip
+
+# The extensions of files which are compressed with gzip
+COMPRESSED_EXTENSIONS = ('.svgz', '.gz')
+
+# The default gzip compression level
+DEFAULT_COMPRESSION_LEVEL = 6
+
+def is_compressed(file_name):
+    """
+    Determine whether a file is compressed, based on its extension.
+
+    """
+
+    return file_name.lower().endswith(COMPRESSED_EXTENSIONS)
+
+def open_output(file_name, compression_level=DEFAULT_COMPRESSION_LEVEL):
+    """
+    Open a file for writing, compressing it if its extension requires it.
+
+    :param file_name: The name of the file to write.
+    :param compression_level: The gzip compression level (1-9).
+
+    :returns: A file object.
+
+    """
+
+    if is_compressed(file_name):
+        return gzip.GzipFile(file_name, 'wb', compression_level, mtime=0)
+
+    return open(file_name, 'wb')
+
+def open_input(file_name, mode='rb'):
+    """
+    Open a file for reading, decompressing it if its extension requires it.
+
+    :param file_name: The name of the file to read.
+    :param mode: The mode in which to open an uncompressed file.
+
+    :returns: A file object.
+
+    """
+
+    if is_compressed(file_name):
+        return gzip.GzipFile(file_name, 'rb')
+
+    return open(file_name, mode)
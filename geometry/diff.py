@@ -0,0 +1,280 @@
+"""
+Contains functions for comparing two geometries, e.g. a regenerated gear and
+a file which was written earlier (see geometry.importers).
+
+Items are compared by shape rather than by type or parameters, so an item
+matches another if every point of each lies within the tolerance of the
+other (e.g. a Rect matches a closed Polyline through its corners). The
+deviation between two items is estimated by sampling the boundary of each
+and measuring the exact distance from each sample to the edges of the other.
+
+Items are matched using a grid index of the centers of their bounds, so
+each item is only compared with the nearby items of the other geometry:
+
+1. Each expected item is matched to the actual item which deviates least
+   from it, among those within the tolerance.
+2. Each remaining expected item is paired with the remaining actual item
+   which deviates least from it within a search radius, and the deviation
+   is reported.
+3. Any expected or actual items which are still unmatched are reported as
+   missing or extra.
+
+Each difference is reported as a tuple in the form
+``(kind, expected_index, actual_index, deviation)``, where ``kind`` is one of
+``DEVIATION``, ``MISSING`` or ``EXTRA``, the indices refer to the items of
+the expected and actual geometries (None for a missing or extra item) and
+``deviation`` is the largest distance between the items (None for a
+missing or extra item).
+
+"""
+
+import math
+
+import numpy
+
+import mass_properties
+
+DEVIATION = 'deviation'
+MISSING = 'missing'
+EXTRA = 'extra'
+
+# The maximum angle between the samples of an arc
+DEFAULT_ARC_RESOLUTION = math.pi / 180
+
+def get_samples(edges, arc_resolution=DEFAULT_ARC_RESOLUTION):
+    """
+    Get points along the boundary of an item.
+
+    :param edges: A list of edges (see geometry.mass_properties).
+    :param arc_resolution: The maximum angle between the samples of an arc.
+
+    :returns: An (n, 2) array of points.
+
+    """
+
+    parts = []
+
+    for edge in edges:
+        if edge[0] == 'polyline':
+            parts.append(numpy.asarray(edge[1], dtype=float).reshape(-1, 2))
+        else:
+            cx, cy, r, t0, t1 = edge[1:]
+            steps = max(1, int(math.ceil(abs(t1 - t0) / arc_resolution)))
+            t = numpy.linspace(t0, t1, steps + 1)
+            parts.append(numpy.column_stack((cx + r * numpy.cos(t), cy + r * numpy.sin(t))))
+
+    if len(parts) == 0:
+        return numpy.zeros((0, 2))
+
+    return numpy.concatenate(parts)
+
+def get_distances(points, edges):
+    """
+    Get the distance from each of a set of points to the nearest of a list of edges.
+
+    :param points: An (n, 2) array of points.
+    :param edges: A list of edges (see geometry.mass_properties).
+
+    :returns: An array of n distances.
+
+    """
+
+    distances = numpy.full(len(points), numpy.inf)
+
+    px = points[:, 0]
+    py = points[:, 1]
+
+    for edge in edges:
+        if edge[0] == 'polyline':
+            vertices = numpy.asarray(edge[1], dtype=float).reshape(-1, 2)
+
+            if len(vertices) == 1:
+                d = numpy.hypot(px - vertices[0, 0], py - vertices[0, 1])
+            else:
+                ax = vertices[:-1, 0]
+                ay = vertices[:-1, 1]
+                dx = vertices[1:, 0] - ax
+                dy = vertices[1:, 1] - ay
+
+                lengths2 = dx * dx + dy * dy
+                lengths2[lengths2 == 0] = 1
+
+                # The position of the nearest point along each segment
+                t = ((px[:, None] - ax) * dx + (py[:, None] - ay) * dy) / lengths2
+                t = numpy.clip(t, 0, 1)
+
+                d = numpy.hypot(px[:, None] - ax - t * dx, py[:, None] - ay - t * dy).min(axis=1)
+        else:
+            cx, cy, r, t0, t1 = edge[1:]
+            span = abs(t1 - t0)
+
+            # The angle swept from the start of the arc to each point
+            direction = 1 if t1 >= t0 else -1
+            u = ((numpy.arctan2(py - cy, px - cx) - t0) * direction) % (2 * math.pi)
+
+            to_circle = numpy.abs(numpy.hypot(px - cx, py - cy) - r)
+            to_ends = numpy.minimum(numpy.hypot(px - cx - r * math.cos(t0), py - cy - r * math.sin(t0)),
+                                    numpy.hypot(px - cx - r * math.cos(t1), py - cy - r * math.sin(t1)))
+
+            d = numpy.where((u <= span) | (span >= 2 * math.pi), to_circle, to_ends)
+
+        distances = numpy.minimum(distances, d)
+
+    return distances
+
+def get_deviation(edges_a, edges_b, samples_a=None, samples_b=None, arc_resolution=DEFAULT_ARC_RESOLUTION):
+    """
+    Estimate the largest distance between two items.
+
+    :param edges_a: The edges of the first item.
+    :param edges_b: The edges of the second item.
+    :param samples_a: Points along the first item (calculated if None).
+    :param samples_b: Points along the second item (calculated if None).
+    :param arc_resolution: The maximum angle between the samples of an arc.
+
+    :returns: The deviation.
+
+    """
+
+    if samples_a is None:
+        samples_a = get_samples(edges_a, arc_resolution)
+
+    if samples_b is None:
+        samples_b = get_samples(edges_b, arc_resolution)
+
+    if len(samples_a) == 0 or len(samples_b) == 0:
+        return numpy.inf
+
+    return max(get_distances(samples_a, edges_b).max(), get_distances(samples_b, edges_a).max())
+
+def _get_centers_and_radii(geom):
+    """
+    Get the centers of the bounds of the items, and half of the diagonal of each.
+
+    """
+
+    bounds = numpy.array([item.get_bounds() for item in geom.items], dtype=float).reshape(-1, 2, 2)
+
+    centers = (bounds[:, 0] + bounds[:, 1]) / 2
+    radii = numpy.hypot(*(bounds[:, 1] - bounds[:, 0]).T) / 2
+
+    return centers, radii
+
+def diff(expected, actual, tolerance=None, search_radius=None, arc_resolution=DEFAULT_ARC_RESOLUTION):
+    """
+    Compare two geometries.
+
+    :param expected: The expected geometry.primitives.Geometry object.
+    :param actual: The actual geometry.primitives.Geometry object.
+    :param tolerance: The largest deviation which is ignored (defaults to a small fraction of the size of the expected geometry).
+    :param search_radius: The largest distance between the centers of the bounds of two items which are paired when they deviate by more than the tolerance (defaults to half of the diagonal of the bounds of the expected item).
+    :param arc_resolution: The maximum angle between the samples of an arc.
+
+    :returns: A list of differences, each in the form ``(kind, expected_index, actual_index, deviation)``.
+
+    """
+
+    if len(expected.items) == 0 or len(actual.items) == 0:
+        return ([(MISSING, i, None, None) for i in range(len(expected.items))] +
+                [(EXTRA, None, j, None) for j in range(len(actual.items))])
+
+    edges = ([item.get_boundary() for item in expected.items],
+             [item.get_boundary() for item in actual.items])
+
+    if tolerance == None:
+        tolerance = mass_properties.get_default_tolerance([e for e in edges[0] if len(e) > 0])
+
+    samples = ([None] * len(expected.items), [None] * len(actual.items))
+
+    def get_item_samples(k, i):
+        if samples[k][i] is None:
+            samples[k][i] = get_samples(edges[k][i], arc_resolution)
+        return samples[k][i]
+
+    expected_centers, expected_radii = _get_centers_and_radii(expected)
+    actual_centers, actual_radii = _get_centers_and_radii(actual)
+
+    if search_radius == None:
+        search_radii = numpy.maximum(expected_radii, tolerance)
+    else:
+        search_radii = numpy.full(len(expected.items), max(search_radius, tolerance))
+
+    # Index the actual items on a grid, whose cells are the size of a
+    # typical search radius
+    cell_size = max(float(numpy.median(search_radii)), tolerance)
+
+    grid = {}
+    cells = numpy.floor(actual_centers / cell_size).astype(int)
+
+    for j in range(len(actual.items)):
+        grid.setdefault((cells[j, 0], cells[j, 1]), []).append(j)
+
+    used = numpy.zeros(len(actual.items), dtype=bool)
+
+    def find_match(i, radius, limit):
+        """
+        Find the unmatched actual item which deviates least from an expected item.
+
+        """
+
+        center = expected_centers[i]
+        cx, cy = numpy.floor(center / cell_size).astype(int)
+        reach = int(math.ceil(radius / cell_size))
+
+        best = None
+        best_deviation = None
+
+        for x in range(cx - reach, cx + reach + 1):
+            for y in range(cy - reach, cy + reach + 1):
+                for j in grid.get((x, y), ()):
+                    if used[j]:
+                        continue
+
+                    if numpy.hypot(*(actual_centers[j] - center)) > radius:
+                        continue
+
+                    # Two items cannot be within the tolerance of each other
+                    # if the sizes of their bounds differ by more than that
+                    if limit != None and abs(actual_radii[j] - expected_radii[i]) > limit * math.sqrt(2):
+                        continue
+
+                    deviation = get_deviation(edges[0][i], edges[1][j],
+                                              get_item_samples(0, i), get_item_samples(1, j))
+
+                    if limit != None and deviation > limit:
+                        continue
+
+                    if best == None or deviation < best_deviation:
+                        best = j
+                        best_deviation = deviation
+
+        return best, best_deviation
+
+    differences = []
+    unmatched = []
+
+    # Match the items which are within the tolerance
+    for i in range(len(expected.items)):
+        j, deviation = find_match(i, tolerance * math.sqrt(2), tolerance)
+
+        if j == None:
+            unmatched.append(i)
+        else:
+            used[j] = True
+
+    # Pair the remaining items and report the deviation between them
+    for i in unmatched:
+        j, deviation = find_match(i, search_radii[i], None)
+
+        if j == None:
+            differences.append((MISSING, i, None, None))
+        else:
+            used[j] = True
+
+            if deviation > tolerance:
+                differences.append((DEVIATION, i, j, float(deviation)))
+
+    for j in numpy.nonzero(~used)[0]:
+        differences.append((EXTRA, None, int(j), None))
+
+    return differences
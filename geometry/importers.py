@@ -0,0 +1,655 @@
+"""
+Contains functions for reading geometry back from the SVG and DXF files
+written by geometry.primitives.
+
+The following entities are supported:
+
+* SVG ``path`` elements made up of M, L, H, V, A and Z commands (in either
+  absolute or relative form), ``circle`` elements and ``rect`` elements.
+  ``use`` elements (e.g. those written by assembly.Assembly) are replaced
+  by the items of the element to which they refer, translated and rotated
+  by their ``transform``; the contents of ``defs`` are only read as they
+  are used.
+* DXF ``POLYLINE``, ``ARC`` and ``CIRCLE`` entities, and ``INSERT``
+  entities, which are replaced by the entities of their block.
+
+Other elements and entities are ignored. Both formats are read as a stream,
+one element or entity at a time, so large files are not held in memory and
+items can be processed as they are read. Compressed files (e.g. ``.svgz``
+or ``.dxf.gz``, see geometry.compression) are decompressed as they are read.
+
+"""
+
+from lxml import etree
+import math
+import re
+
+import compression
+import primitives
+
+# The number of arguments taken by each supported SVG path command
+_PATH_ARGUMENT_COUNTS = {'M': 2, 'L': 2, 'H': 1, 'V': 1, 'A': 7, 'Z': 0}
+
+_NUMBER = re.compile(r'[-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?')
+_SEPARATORS = ' \t\r\n,'
+
+# The relative difference allowed between the radii of an SVG arc
+_RADIUS_TOLERANCE = 1e-9
+
+def _skip_separators(d, pos):
+    while pos < len(d) and d[pos] in _SEPARATORS:
+        pos += 1
+
+    return pos
+
+def parse_path_data(d):
+    """
+    Parse the value of the ``d`` attribute of an SVG ``path`` element.
+
+    Repeated commands whose letter has been omitted are returned separately
+    (coordinates following a moveto are returned as lineto commands).
+
+    :param d: The path data.
+    :raises: An Exception if the path data is invalid or contains an unsupported command.
+    :returns: A generator of tuples in the form ``(command, arguments)``, e.g. ``('l', [1.0, 2.0])``.
+
+    """
+
+    pos = 0
+    command = None
+
+    while True:
+        pos = _skip_separators(d, pos)
+
+        if pos >= len(d):
+            break
+
+        if d[pos].isalpha():
+            command = d[pos]
+            pos += 1
+
+            if not _PATH_ARGUMENT_COUNTS.has_key(command.upper()):
+                raise Exception('Unsupported path command: {0}'.format(command))
+
+            if command.upper() == 'Z':
+                yield (command, [])
+                continue
+        elif command == None or command.upper() == 'Z':
+            raise Exception('Invalid path data: {0}'.format(d))
+
+        args = []
+
+        for i in range(_PATH_ARGUMENT_COUNTS[command.upper()]):
+            pos = _skip_separators(d, pos)
+
+            # The arc flags are single digits, which need not be separated
+            if command.upper() == 'A' and i in (3, 4):
+                if pos >= len(d) or d[pos] not in '01':
+                    raise Exception('Invalid path data: {0}'.format(d))
+
+                args.append(float(d[pos]))
+                pos += 1
+            else:
+                m = _NUMBER.match(d, pos)
+
+                if m == None:
+                    raise Exception('Invalid path data: {0}'.format(d))
+
+                args.append(float(m.group()))
+                pos = m.end()
+
+        yield (command, args)
+
+        if command == 'M':
+            command = 'L'
+        elif command == 'm':
+            command = 'l'
+
+def get_arc_center(start, radius, large_arc, sweep, end):
+    """
+    Get the center of a circular SVG arc from its end points.
+
+    If the radius is too small for the arc to reach the end point, it is
+    scaled up (as specified by SVG).
+
+    :param start: The start point of the arc.
+    :param radius: The radius of the arc.
+    :param large_arc: True if the arc spans more than 180 degrees.
+    :param sweep: True if the arc is drawn in the positive-angle direction.
+    :param end: The end point of the arc.
+
+    :returns: A tuple in the form ``((cx, cy), radius)``.
+
+    """
+
+    hx = (start[0] - end[0]) / 2.0
+    hy = (start[1] - end[1]) / 2.0
+
+    d2 = hx * hx + hy * hy
+    r2 = max(radius * radius, d2)
+
+    coef = math.sqrt((r2 - d2) / d2)
+    if bool(large_arc) == bool(sweep):
+        coef = -coef
+
+    cx = coef * hy + (start[0] + end[0]) / 2.0
+    cy = -coef * hx + (start[1] + end[1]) / 2.0
+
+    return ((cx, cy), math.sqrt(r2))
+
+def _get_arc(start, radius, large_arc, sweep, end):
+    """
+    Get the Arc object which represents a circular SVG arc.
+
+    """
+
+    center, radius = get_arc_center(start, radius, large_arc, sweep, end)
+
+    # Arc angles are measured counterclockwise, with the y-axis pointing down
+    start_angle = math.atan2(center[1] - start[1], start[0] - center[0])
+    end_angle = math.atan2(center[1] - end[1], end[0] - center[0])
+
+    # Arcs are always drawn in the direction of increasing angle, which is
+    # the negative-angle direction of an SVG
+    if sweep:
+        start_angle, end_angle = end_angle, start_angle
+
+    if end_angle < start_angle:
+        end_angle += 2 * math.pi
+
+    return primitives.Arc(center, radius, start_angle, end_angle)
+
+def get_path_items(d, scale=1, offset=(0, 0)):
+    """
+    Get the items which make up an SVG path.
+
+    Each run of straight lines becomes a Polyline and each arc becomes an Arc.
+
+    :param d: The path data.
+    :param scale: The factor by which the geometry was scaled when it was written.
+    :param offset: The amount by which the geometry was offset when it was written.
+
+    :raises: An Exception if the path contains an elliptical arc or an unsupported command.
+    :returns: A list of geometry.primitives objects.
+
+    """
+
+    items = []
+    points = []
+
+    x, y = 0, 0
+    start = (0, 0)
+
+    def to_geometry(p):
+        return ((p[0] - offset[0]) / float(scale), (p[1] - offset[1]) / float(scale))
+
+    def add_polyline():
+        if len(points) > 1:
+            items.append(primitives.Polyline([to_geometry(p) for p in points]))
+
+    for command, args in parse_path_data(d):
+        upper = command.upper()
+
+        # Convert relative coordinates to absolute coordinates
+        if command != upper:
+            if upper in ('M', 'L'):
+                args = [args[0] + x, args[1] + y]
+            elif upper == 'H':
+                args = [args[0] + x]
+            elif upper == 'V':
+                args = [args[0] + y]
+            elif upper == 'A':
+                args = args[:5] + [args[5] + x, args[6] + y]
+
+        if upper == 'M':
+            add_polyline()
+            x, y = args
+            start = (x, y)
+            points = [start]
+            continue
+
+        if upper == 'H':
+            end = (args[0], y)
+        elif upper == 'V':
+            end = (x, args[0])
+        elif upper == 'Z':
+            end = start
+        else:
+            end = (args[-2], args[-1])
+
+        if upper == 'A' and args[0] != 0 and args[1] != 0:
+            rx, ry = abs(args[0]), abs(args[1])
+
+            if abs(rx - ry) > _RADIUS_TOLERANCE * max(rx, ry):
+                raise Exception('Elliptical arcs are not supported: {0}'.format(d))
+
+            add_polyline()
+
+            if end != (x, y):
+                arc = _get_arc((x, y), (rx + ry) / 2, args[3], args[4], end)
+
+                items.append(primitives.Arc(to_geometry(arc.center),
+                                            arc.radius / float(scale),
+                                            arc.start_angle,
+                                            arc.end_angle))
+
+            points = [end]
+        else:
+            if len(points) == 0:
+                points = [(x, y)]
+
+            points.append(end)
+
+        x, y = end
+
+    add_polyline()
+
+    return items
+
+def _get_float(element, name):
+    return float(element.attrib.get(name, 0))
+
+def iter_svg_items(file_name, scale=1, offset=(0, 0)):
+    """
+    Read the items of an SVG file, one element at a time.
+
+    The scale and offset are those used to write the file (see
+    Geometry.get_bounds_and_margin), so that the items are returned in
+    the coordinates of the original geometry.
+
+    :param file_name: The name of the SVG file to read.
+    :param scale: The factor by which the geometry was scaled when it was written.
+    :param offset: The amount by which the geometry was offset when it was written.
+
+    :returns: A generator of geometry.primitives objects.
+
+    """
+
+    scale = float(scale)
+
+    f = compression.open_input(file_name)
+
+    try:
+        for item in _iter_svg_elements(f, scale, offset):
+            yield item
+    finally:
+        f.close()
+
+_TRANSFORM = re.compile(r'\s*,?\s*([a-zA-Z]+)\s*\(([^)]*)\)')
+
+def parse_transform(transform):
+    """
+    Parse the value of the ``transform`` attribute of an SVG element.
+
+    Only translations and rotations are supported, since they are the only
+    transforms which preserve the shapes of the items.
+
+    :param transform: The transform.
+    :raises: An Exception if the transform is invalid or is not a translation or rotation.
+    :returns: A list of tuples in the form ``(angle, (x, y))``, one for each
+        transform in the order in which they are written, each of which
+        rotates a point by the angle (in radians) about the origin, then 
+        translates it (see geometry.primitives.Polyline.get_transformed).
+
+    """
+
+    transforms = []
+    pos = 0
+
+    while _skip_separators(transform, pos) < len(transform):
+        m = _TRANSFORM.match(transform, pos)
+
+        if m == None:
+            raise Exception('Invalid transform: {0}'.format(transform))
+
+        name = m.group(1)
+        args = [float(v) for v in _NUMBER.findall(m.group(2))]
+
+        if name == 'translate' and len(args) in (1, 2):
+            transforms.append((0, (args[0], args[1] if len(args) > 1 else 0)))
+        elif name == 'rotate' and len(args) in (1, 3):
+            angle = args[0] * math.pi / 180
+
+            if len(args) == 1:
+                transforms.append((angle, (0, 0)))
+            else:
+                # Rotate about (cx, cy)
+                cx, cy = args[1:]
+                c = math.cos(angle)
+                s = math.sin(angle)
+                transforms.append((angle, (cx - cx * c + cy * s, cy - cx * s - cy * c)))
+        else:
+            raise Exception('Unsupported transform: {0}'.format(transform))
+
+        pos = m.end()
+
+    return transforms
+
+def _get_used_items(element, templates, scale, offset):
+    """
+    Get the items of the element which is referred to by an SVG ``use`` element, transformed into place.
+
+    :param templates: The items of the elements which have been read, keyed by id (without the offset).
+
+    """
+
+    href = element.attrib.get('{http://www.w3.org/1999/xlink}href', element.attrib.get('href', ''))
+
+    if not href.startswith('#') or not templates.has_key(href[1:]):
+        raise Exception('The use element refers to {0}, which is not defined before it.'.format(href))
+
+    # The x and y attributes translate the element before the transform
+    transforms = [(0, (_get_float(element, 'x'), _get_float(element, 'y')))]
+    transforms.extend(reversed(parse_transform(element.attrib.get('transform', ''))))
+
+    items = templates[href[1:]]
+
+    for angle, (x, y) in transforms:
+        items = [item.get_transformed(angle, (x / scale, y / scale)) for item in items]
+
+    if offset != (0, 0):
+        items = [item.get_transformed(0, (-offset[0] / scale, -offset[1] / scale)) for item in items]
+
+    return items
+
+def _iter_svg_elements(f, scale, offset):
+    # The items of the elements with ids which have been read, and those
+    # of the elements with ids which are being read (innermost last). The
+    # items within them are read without the offset, which is applied when
+    # they are used.
+    templates = {}
+    open_templates = []
+
+    # The depth of the defs elements, whose contents are not drawn
+    defs = 0
+
+    for event, element in etree.iterparse(f, events=('start', 'end')):
+        if not isinstance(element.tag, basestring):
+            continue
+
+        tag = etree.QName(element).localname
+        element_id = element.attrib.get('id')
+
+        if event == 'start':
+            if tag == 'defs':
+                defs += 1
+            elif element_id != None:
+                open_templates.append((element_id, []))
+
+            continue
+
+        if tag == 'defs':
+            defs -= 1
+            continue
+
+        element_offset = offset if defs == 0 and len(open_templates) == 0 else (0, 0)
+
+        if tag == 'path':
+            items = get_path_items(element.attrib.get('d', ''), scale, element_offset)
+        elif tag == 'circle':
+            items = [primitives.Circle(((_get_float(element, 'cx') - element_offset[0]) / scale,
+                                        (_get_float(element, 'cy') - element_offset[1]) / scale),
+                                       _get_float(element, 'r') / scale)]
+        elif tag == 'rect':
+            items = [primitives.Rect(((_get_float(element, 'x') - element_offset[0]) / scale,
+                                      (_get_float(element, 'y') - element_offset[1]) / scale),
+                                     (_get_float(element, 'width') / scale,
+                                      _get_float(element, 'height') / scale))]
+        elif tag == 'use':
+            items = _get_used_items(element, templates, scale, element_offset)
+        else:
+            items = []
+
+        if tag != 'use' and element.attrib.has_key('transform'):
+            raise Exception('Transforms are only supported on use elements.')
+
+        if element_id != None and tag != 'defs':
+            # The element is complete; its items are added to the template
+            # which contains it (if any) below
+            element_id, template_items = open_templates.pop()
+            template_items.extend(items)
+            templates[element_id] = template_items
+            items = template_items
+
+        if len(open_templates) > 0:
+            open_templates[-1][1].extend(items)
+        elif defs == 0 and element_id == None:
+            for item in items:
+                yield item
+        elif defs == 0:
+            # An element with an id outside of defs is drawn as well as used
+            for item in items:
+                yield item.get_transformed(0, (-offset[0] / scale, -offset[1] / scale)) if offset != (0, 0) else item
+
+        if tag in ('path', 'circle', 'rect', 'use'):
+            # Discard the elements which have been read
+            element.clear()
+            while element.getprevious() is not None:
+                del element.getparent()[0]
+
+def read_svg(file_name, scale=1, offset=(0, 0)):
+    """
+    Read the items of an SVG file into a geometry.
+
+    See iter_svg_items for details.
+
+    :returns: A geometry.primitives.Geometry object.
+
+    """
+
+    return primitives.Geometry(iter_svg_items(file_name, scale, offset))
+
+def _iter_dxf_entities(f):
+    """
+    Read the entities in the BLOCKS and ENTITIES sections of a DXF file.
+
+    :param f: The DXF file.
+
+    :returns: A generator of tuples in the form ``(section, type, groups)``, where ``groups`` is a list of ``(code, value)`` tuples.
+
+    """
+
+    section = None
+    entity = None
+
+    while True:
+        code = f.readline()
+        value = f.readline()
+
+        if not value:
+            break
+
+        code = int(code)
+        value = value.strip()
+
+        if code == 0:
+            if entity != None:
+                yield entity
+                entity = None
+
+            if value == 'ENDSEC':
+                section = None
+            elif value == 'EOF':
+                break
+            elif section in ('BLOCKS', 'ENTITIES'):
+                entity = (section, value, [])
+        elif code == 2 and section == None:
+            section = value
+        elif entity != None:
+            entity[2].append((code, value))
+
+    if entity != None:
+        yield entity
+
+def _get_groups(groups, codes):
+    """
+    Get the values of the specified group codes, as floats (0 if a group is missing).
+
+    """
+
+    values = dict(groups)
+
+    return [float(values.get(code, 0)) for code in codes]
+
+def _get_inserted_items(groups, blocks):
+    """
+    Get the items of the block which is referred to by a DXF ``INSERT`` entity, transformed into place.
+
+    :param blocks: The items of the blocks which have been read, keyed by name.
+
+    """
+
+    name = dict(groups).get(2)
+
+    if not blocks.has_key(name):
+        raise Exception('The insert refers to the block {0}, which is not defined before it.'.format(name))
+
+    x, y, rotation = _get_groups(groups, (10, 20, 50))
+    values = dict(groups)
+
+    if float(values.get(41, 1)) != 1 or float(values.get(42, 1)) != 1:
+        raise Exception('Scaled inserts are not supported: {0}'.format(name))
+
+    # The y-axis is inverted, so the rotation (counterclockwise) is negated
+    return [item.get_transformed(-rotation * math.pi / 180, (x, -y)) for item in blocks[name]]
+
+def iter_dxf_items(file_name):
+    """
+    Read the items of a DXF file, one entity at a time.
+
+    The y-axis is inverted, as it is when the file is written. The entities
+    of each block are kept, and are read in place of each insert of the block.
+
+    :param file_name: The name of the DXF file to read.
+
+    :raises: An Exception if a polyline contains arcs (bulges), or an insert is scaled.
+    :returns: A generator of geometry.primitives objects.
+
+    """
+
+    f = compression.open_input(file_name, 'rU')
+
+    try:
+        # The points and flags of the polyline being read
+        points = None
+        flags = 0
+
+        # The items of each block which has been read, keyed by name, and
+        # the name and base point of the block being read
+        blocks = {}
+        block = None
+        base = (0, 0)
+
+        for section, entity_type, groups in _iter_dxf_entities(f):
+            items = []
+
+            if entity_type == 'BLOCK':
+                block = dict(groups).get(2)
+                x, y = _get_groups(groups, (10, 20))
+                base = (-x, y)
+                blocks[block] = []
+                continue
+            elif entity_type == 'ENDBLK':
+                block = None
+                continue
+            elif entity_type == 'POLYLINE':
+                points = []
+                flags = int(_get_groups(groups, (70,))[0])
+            elif entity_type == 'VERTEX' and points != None:
+                x, y, bulge = _get_groups(groups, (10, 20, 42))
+
+                if bulge != 0:
+                    raise Exception('Polylines which contain arcs are not supported: {0}'.format(file_name))
+
+                points.append((x, -y))
+            elif entity_type == 'SEQEND' and points != None:
+                # Closed polylines do not repeat their first point
+                if flags & 1 and len(points) > 0:
+                    points.append(points[0])
+
+                if len(points) > 1:
+                    items.append(primitives.Polyline(points))
+
+                points = None
+            elif entity_type == 'ARC':
+                x, y, r, start_angle, end_angle = _get_groups(groups, (10, 20, 40, 50, 51))
+
+                start_angle = start_angle * math.pi / 180
+                end_angle = end_angle * math.pi / 180
+
+                if end_angle < start_angle:
+                    end_angle += 2 * math.pi
+
+                items.append(primitives.Arc((x, -y), r, start_angle, end_angle))
+            elif entity_type == 'CIRCLE':
+                x, y, r = _get_groups(groups, (10, 20, 40))
+
+                items.append(primitives.Circle((x, -y), r))
+            elif entity_type == 'INSERT':
+                items = _get_inserted_items(groups, blocks)
+
+            if section == 'BLOCKS':
+                if block != None:
+                    # The items of a block are relative to its base point
+                    blocks[block].extend(item.get_transformed(0, base) if base != (0, 0) else item for item in items)
+            else:
+                for item in items:
+                    yield item
+    finally:
+        f.close()
+
+def read_dxf(file_name):
+    """
+    Read the items of a DXF file into a geometry.
+
+    See iter_dxf_items for details.
+
+    :returns: A geometry.primitives.Geometry object.
+
+    """
+
+    return primitives.Geometry(iter_dxf_items(file_name))
+
+# The function used to read each file format, keyed by file extension
+IMPORTERS = {'.svg': read_svg,
+             '.svgz': read_svg,
+             '.svg.gz': read_svg,
+             '.dxf': read_dxf,
+             '.dxf.gz': read_dxf}
+
+def get_importer_ext(file_name, ext=None):
+    """
+    Get the extension which identifies the format of a file to read.
+
+    :param file_name: The name of the file to read.
+    :param ext: The extension which identifies the format, or None to use the extension of ``file_name``.
+
+    :raises: An Exception if the format of the file is not supported.
+    :returns: The (lower case) extension, e.g. ``'.svg'``.
+
+    """
+
+    if ext == None:
+        ext = primitives.get_ext(file_name, IMPORTERS.keys())
+
+    ext = ext.lower()
+
+    if not IMPORTERS.has_key(ext):
+        raise Exception('Unsupported input format: {0}'.format(file_name))
+
+    return ext
+
+def read_geometry(file_name, ext=None, **options):
+    """
+    Read a geometry from a file, choosing the format from its extension.
+
+    :param file_name: The name of the file to read.
+    :param ext: The extension which identifies the format, or None to use the extension of ``file_name``.
+    :param options: Keyword arguments for the corresponding ``read_*`` function.
+
+    :raises: An Exception if the format of the file is not supported.
+    :returns: A geometry.primitives.Geometry object.
+
+    """
+
+    return IMPORTERS[get_importer_ext(file_name, ext)](file_name, **options)
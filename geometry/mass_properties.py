@@ -0,0 +1,770 @@
+"""
+Contains functions for calculating the mass properties (area, centroid and
+second moments of area) of the regions enclosed by geometry.
+
+The items of a geometry are joined end-to-end into closed contours. Each
+contour is integrated exactly using Green's theorem: every boundary edge
+contributes the integral over the "cone" between the origin and the edge,
+which for a line segment is a triangle and for an arc is evaluated in closed
+form. Contours which are enclosed by an odd number of other contours (such as
+a bore) are subtracted.
+
+The boundary of an item is obtained from its ``get_boundary`` method, which
+returns a list of edges in one of the following forms:
+
+    ('polyline', points)
+    ('arc', cx, cy, r, t0, t1)
+
+where ``points`` is a list of ``(x, y)`` tuples and an arc is the set of
+points ``(cx + r*cos(t), cy + r*sin(t))`` for ``t`` from ``t0`` to ``t1``.
+
+"""
+
+import itertools
+import math
+
+import numpy
+
+# The default tolerance used to join edges, as a fraction of the size of the geometry
+DEFAULT_RELATIVE_TOLERANCE = 1e-6
+
+# The number of points at which each arc is sampled when testing whether
+# one contour is inside another
+_ARC_SAMPLES = 8
+
+def get_edge_start(edge):
+    """
+    Get the start point of an edge.
+
+    """
+
+    if edge[0] == 'polyline':
+        return edge[1][0]
+
+    return (edge[1] + edge[3] * math.cos(edge[4]), edge[2] + edge[3] * math.sin(edge[4]))
+
+def get_edge_end(edge):
+    """
+    Get the end point of an edge.
+
+    """
+
+    if edge[0] == 'polyline':
+        return edge[1][-1]
+
+    return (edge[1] + edge[3] * math.cos(edge[5]), edge[2] + edge[3] * math.sin(edge[5]))
+
+def get_reversed_edges(edges):
+    """
+    Get a chain of edges traversed in the opposite direction.
+
+    """
+
+    edges_out = []
+
+    for edge in reversed(edges):
+        if edge[0] == 'polyline':
+            edges_out.append(('polyline', edge[1][::-1]))
+        else:
+            edges_out.append(('arc', edge[1], edge[2], edge[3], edge[5], edge[4]))
+
+    return edges_out
+
+def get_default_tolerance(pieces):
+    """
+    Get a tolerance proportional to the extent of the end points of the pieces.
+
+    """
+
+    points = []
+
+    for piece in pieces:
+        points.append(get_edge_start(piece[0]))
+        points.append(get_edge_end(piece[-1]))
+
+        # Closed pieces (e.g. circles) only contribute a single point, so
+        # include their centers as well
+        if piece[0][0] == 'arc':
+            points.append((piece[0][1], piece[0][2]))
+
+    points = numpy.array(points)
+    size = numpy.hypot(*(points.max(axis=0) - points.min(axis=0)))
+
+    return max(size, 1) * DEFAULT_RELATIVE_TOLERANCE
+
+def _is_near(p1, p2, tolerance):
+    return abs(p1[0] - p2[0]) <= tolerance and abs(p1[1] - p2[1]) <= tolerance
+
+def get_contours(geom, tolerance=None):
+    """
+    Join the items of a geometry into closed contours.
+
+    Items are joined where the end point of one is within ``tolerance`` of
+    the start or end point of another; items are reversed where necessary
+    so that each contour is traversed in a single direction.
+
+    :param geom: The geometry.primitives.Geometry object.
+    :param tolerance: The maximum distance between joined end points (defaults to a small fraction of the size of the geometry).
+
+    :raises: An Exception if the items do not form closed contours.
+    :returns: A list of contours, each of which is a list of edges.
+
+    """
+
+    pieces = [item.get_boundary() for item in geom.items]
+    pieces = [p for p in pieces if len(p) > 0]
+
+    if len(pieces) == 0:
+        return []
+
+    if tolerance == None:
+        tolerance = get_default_tolerance(pieces)
+
+    # Index the end points of the pieces on a grid whose cells are the size
+    # of the tolerance, so that the piece which joins a given point can be
+    # found without searching every piece.
+    grid = {}
+
+    def get_cell(p):
+        return (int(math.floor(p[0] / tolerance)), int(math.floor(p[1] / tolerance)))
+
+    for i in range(len(pieces)):
+        for p in (get_edge_start(pieces[i][0]), get_edge_end(pieces[i][-1])):
+            grid.setdefault(get_cell(p), []).append(i)
+
+    used = [False] * len(pieces)
+
+    def find_piece(p):
+        cell = get_cell(p)
+
+        for dx in (-1, 0, 1):
+            for dy in (-1, 0, 1):
+                for i in grid.get((cell[0] + dx, cell[1] + dy), []):
+                    if used[i]:
+                        continue
+
+                    if _is_near(get_edge_start(pieces[i][0]), p, tolerance):
+                        return pieces[i], i
+
+                    if _is_near(get_edge_end(pieces[i][-1]), p, tolerance):
+                        return get_reversed_edges(pieces[i]), i
+
+        return None, None
+
+    contours = []
+
+    for i in range(len(pieces)):
+        if used[i]:
+            continue
+
+        used[i] = True
+        contour = list(pieces[i])
+        start = get_edge_start(contour[0])
+
+        while not _is_near(get_edge_end(contour[-1]), start, tolerance):
+            end = get_edge_end(contour[-1])
+            piece, j = find_piece(end)
+
+            if piece == None:
+                raise Exception('The geometry does not form a closed contour; there is a gap at ({0}, {1}).'.format(end[0], end[1]))
+
+            used[j] = True
+            contour.extend(piece)
+
+        contours.append(contour)
+
+    return contours
+
+def _get_contour_polygon(contour):
+    """
+    Approximate a contour by a polygon (used for containment tests).
+
+    """
+
+    points = []
+
+    for edge in contour:
+        if edge[0] == 'polyline':
+            points.extend(edge[1][:-1])
+        else:
+            for i in range(_ARC_SAMPLES):
+                t = edge[4] + (edge[5] - edge[4]) * i / float(_ARC_SAMPLES)
+                points.append((edge[1] + edge[3] * math.cos(t), edge[2] + edge[3] * math.sin(t)))
+
+    return numpy.array(points)
+
+def _is_point_in_polygon(p, polygon):
+    x0 = polygon[:, 0]
+    y0 = polygon[:, 1]
+    x1 = numpy.roll(x0, -1)
+    y1 = numpy.roll(y0, -1)
+
+    crosses = (y0 > p[1]) != (y1 > p[1])
+
+    # Horizontal (e.g. zero-length) edges never cross, so their intersections
+    # (which are not numbers) are ignored
+    with numpy.errstate(divide='ignore', invalid='ignore'):
+        x = x0 + (p[1] - y0) * (x1 - x0) / (y1 - y0)
+        right = x > p[0]
+
+    return numpy.count_nonzero(crosses & right) % 2 == 1
+
+def get_contour_depths(contours):
+    """
+    Get the number of contours which enclose each contour.
+
+    :param contours: A list of closed contours.
+
+    :returns: A list with the nesting depth of each contour (0 for an outer contour, 1 for a hole, etc.).
+
+    """
+
+    if len(contours) <= 1:
+        return [0] * len(contours)
+
+    polygons = [_get_contour_polygon(c) for c in contours]
+    mins = [p.min(axis=0) for p in polygons]
+    maxs = [p.max(axis=0) for p in polygons]
+
+    depths = []
+
+    for i in range(len(contours)):
+        depth = 0
+        p = polygons[i][0]
+
+        for j in range(len(contours)):
+            if i == j:
+                continue
+
+            # Reject contours whose bounds do not enclose the bounds of this contour
+            if (mins[j] > mins[i]).any() or (maxs[j] < maxs[i]).any():
+                continue
+
+            if _is_point_in_polygon(p, polygons[j]):
+                depth += 1
+
+        depths.append(depth)
+
+    return depths
+
+def _multiply(a, b):
+    """
+    Multiply two polynomials in ``cos(t)`` and ``sin(t)``.
+
+    Each polynomial is a dict which maps ``(m, n)`` to the coefficient of
+    ``cos(t)**m * sin(t)**n``.
+
+    """
+
+    out = {}
+
+    for ka, va in a.items():
+        for kb, vb in b.items():
+            k = (ka[0] + kb[0], ka[1] + kb[1])
+            out[k] = out.get(k, 0) + va * vb
+
+    return out
+
+def _integrate_trig(m, n, t, c, s):
+    """
+    Evaluate the antiderivative of ``cos(t)**m * sin(t)**n`` (for m + n <= 3).
+
+    """
+
+    if (m, n) == (0, 0):
+        return t
+    elif (m, n) == (1, 0):
+        return s
+    elif (m, n) == (0, 1):
+        return -c
+    elif (m, n) == (2, 0):
+        return t / 2 + s * c / 2
+    elif (m, n) == (0, 2):
+        return t / 2 - s * c / 2
+    elif (m, n) == (1, 1):
+        return s * s / 2
+    elif (m, n) == (3, 0):
+        return s - s * s * s / 3
+    elif (m, n) == (0, 3):
+        return c * c * c / 3 - c
+    elif (m, n) == (2, 1):
+        return -c * c * c / 3
+    elif (m, n) == (1, 2):
+        return s * s * s / 3
+
+    raise Exception('Unsupported term: cos^{0} sin^{1}'.format(m, n))
+
+def _integrate_polynomial(poly, t0, t1):
+    c0, s0 = numpy.cos(t0), numpy.sin(t0)
+    c1, s1 = numpy.cos(t1), numpy.sin(t1)
+
+    total = 0
+
+    for (m, n), coeff in poly.items():
+        total = total + coeff * (_integrate_trig(m, n, t1, c1, s1) - _integrate_trig(m, n, t0, c0, s0))
+
+    return total
+
+def get_segment_integrals(x0, y0, x1, y1):
+    """
+    Get the cone integrals of arrays of line segments.
+
+    :returns: A tuple of arrays in the form ``(A, Sx, Sy, Ixx, Iyy, Ixy)``,
+        which contain the integrals of 1, x, y, y^2, x^2 and xy over the
+        triangle between the origin and each segment.
+
+    """
+
+    a = x0 * y1 - x1 * y0
+
+    return (a / 2,
+            (x0 + x1) * a / 6,
+            (y0 + y1) * a / 6,
+            (y0 * y0 + y0 * y1 + y1 * y1) * a / 12,
+            (x0 * x0 + x0 * x1 + x1 * x1) * a / 12,
+            (x0 * y1 + 2 * x0 * y0 + 2 * x1 * y1 + x1 * y0) * a / 24)
+
+def get_arc_integrals(cx, cy, r, t0, t1):
+    """
+    Get the cone integrals of an array of arcs.
+
+    For a function ``f`` which is homogeneous of degree ``k``, the integral
+    of ``f`` over the cone between the origin and a curve is the integral
+    along the curve of ``f * (x dy - y dx) / (k + 2)``. Along an arc, each of
+    these integrands is a polynomial in ``cos(t)`` and ``sin(t)``, which is
+    integrated exactly.
+
+    :returns: A tuple of arrays in the form ``(A, Sx, Sy, Ixx, Iyy, Ixy)``.
+
+    """
+
+    x = {(0, 0): cx, (1, 0): r}
+    y = {(0, 0): cy, (0, 1): r}
+
+    # x dy - y dx, divided by dt
+    w = {(0, 0): r * r, (1, 0): r * cx, (0, 1): r * cy}
+
+    xw = _multiply(x, w)
+    yw = _multiply(y, w)
+
+    return (_integrate_polynomial(w, t0, t1) / 2,
+            _integrate_polynomial(xw, t0, t1) / 3,
+            _integrate_polynomial(yw, t0, t1) / 3,
+            _integrate_polynomial(_multiply(y, yw), t0, t1) / 4,
+            _integrate_polynomial(_multiply(x, xw), t0, t1) / 4,
+            _integrate_polynomial(_multiply(x, yw), t0, t1) / 4)
+
+def _get_ranges(starts, counts):
+    """
+    Get the concatenation of ``arange(start, start + count)`` for each start and count.
+
+    """
+
+    ends = numpy.cumsum(counts)
+    total = ends[-1] if len(ends) > 0 else 0
+
+    return numpy.repeat(starts - ends + counts, counts) + numpy.arange(total)
+
+def _get_piece_arrays(pieces):
+    """
+    Gather the edges of a list of pieces (each a list of edges, e.g. the boundary of an item) into arrays.
+
+    :returns: A tuple in the form ``(points, lengths, polyline_pieces, arcs, arc_pieces, starts, ends, centers)``,
+        where ``points`` is an array of the vertices of every polyline, ``lengths``
+        is the number of vertices of each polyline, ``arcs`` is an (n, 5) array
+        of ``(cx, cy, r, t0, t1)``, ``starts`` and ``ends`` are the end points
+        of each piece and ``centers`` is the center of the first edge of each
+        piece which starts with an arc (or NaN).
+
+    """
+
+    points = []
+    lengths = []
+    polyline_pieces = []
+    arcs = []
+    arc_pieces = []
+
+    # The first and last edge of each piece; arcs are numbered from -1 downwards
+    first_edges = []
+    last_edges = []
+
+    for p in range(len(pieces)):
+        for edge in pieces[p]:
+            if edge[0] == 'polyline':
+                index = len(lengths)
+                points.extend(edge[1])
+                lengths.append(len(edge[1]))
+                polyline_pieces.append(p)
+            else:
+                index = -1 - len(arcs)
+                arcs.append(edge[1:])
+                arc_pieces.append(p)
+
+            if len(first_edges) == p:
+                first_edges.append(index)
+
+        last_edges.append(index)
+
+    points = numpy.fromiter(itertools.chain.from_iterable(points), float, 2 * len(points)).reshape(-1, 2)
+    lengths = numpy.array(lengths, dtype=int)
+    arcs = numpy.array(arcs, dtype=float).reshape(-1, 5)
+
+    # The end points of the polylines, followed by those of the arcs
+    offsets = numpy.cumsum(lengths) - lengths
+    edge_starts = numpy.concatenate((points[offsets],
+                                     numpy.column_stack((arcs[:, 0] + arcs[:, 2] * numpy.cos(arcs[:, 3]),
+                                                         arcs[:, 1] + arcs[:, 2] * numpy.sin(arcs[:, 3])))))
+    edge_ends = numpy.concatenate((points[offsets + lengths - 1],
+                                   numpy.column_stack((arcs[:, 0] + arcs[:, 2] * numpy.cos(arcs[:, 4]),
+                                                       arcs[:, 1] + arcs[:, 2] * numpy.sin(arcs[:, 4])))))
+
+    first_edges = numpy.array(first_edges, dtype=int)
+    last_edges = numpy.array(last_edges, dtype=int)
+
+    centers = numpy.empty((len(pieces), 2))
+    centers.fill(numpy.nan)
+    centers[first_edges < 0] = arcs[-1 - first_edges[first_edges < 0], :2]
+
+    first_edges = numpy.where(first_edges < 0, len(lengths) - 1 - first_edges, first_edges)
+    last_edges = numpy.where(last_edges < 0, len(lengths) - 1 - last_edges, last_edges)
+
+    return (points, lengths, numpy.array(polyline_pieces, dtype=int), arcs, numpy.array(arc_pieces, dtype=int),
+            edge_starts[first_edges], edge_ends[last_edges], centers)
+
+def _get_default_tolerances(starts, ends, centers, piece_geometries, num_geometries):
+    """
+    Get the default tolerance of each geometry of a batch (see ``get_default_tolerance``).
+
+    """
+
+    tolerances = numpy.repeat(DEFAULT_RELATIVE_TOLERANCE, num_geometries)
+
+    if len(starts) == 0:
+        return tolerances
+
+    has_center = ~numpy.isnan(centers[:, 0])
+    points = numpy.concatenate((starts, ends, centers[has_center]))
+    owners = numpy.concatenate((piece_geometries, piece_geometries, piece_geometries[has_center]))
+
+    order = numpy.argsort(owners, kind='mergesort')
+    points = points[order]
+    owners = owners[order]
+
+    groups = numpy.nonzero(numpy.concatenate(([True], owners[1:] != owners[:-1])))[0]
+    size = numpy.hypot(*(numpy.maximum.reduceat(points, groups) - numpy.minimum.reduceat(points, groups)).T)
+    tolerances[owners[groups]] = numpy.maximum(size, 1) * DEFAULT_RELATIVE_TOLERANCE
+
+    return tolerances
+
+def _join_pieces(starts, ends, piece_geometries, tolerances):
+    """
+    Join the pieces of a batch of geometries into closed contours (as
+    ``get_contours`` does for a single geometry), using arrays.
+
+    The end points are sorted by x, and each is matched with the end points
+    which follow it within the tolerance. Where every end point of a geometry
+    is matched with exactly one other, its contours are found by following
+    the joins from piece to piece (in both directions, since any piece may be
+    reversed), doubling the number of joins which are followed at each pass.
+
+    :param starts: An (n, 2) array of the start point of each piece.
+    :param ends: An (n, 2) array of the end point of each piece.
+    :param piece_geometries: The index of the geometry of each piece (in increasing order).
+    :param tolerances: The tolerance of each geometry.
+
+    :returns: A tuple in the form ``(labels, backwards, joined)``, where the
+        pieces of each contour share a label, ``backwards`` is True for the
+        pieces which are reversed in their contour and ``joined`` is False
+        for the geometries whose end points are not matched in pairs (which
+        may have gaps, or contours which touch).
+
+    """
+
+    n = 2 * len(starts)
+
+    # End point 2i is the start of piece i, and 2i + 1 is its end
+    points = numpy.empty((n, 2))
+    points[0::2] = starts
+    points[1::2] = ends
+    geometries = numpy.repeat(piece_geometries, 2)
+
+    order = numpy.lexsort((points[:, 0], geometries))
+    x = points[order, 0]
+    y = points[order, 1]
+    g = geometries[order]
+    tolerance = tolerances[g]
+
+    first = [numpy.zeros(0, dtype=int)]
+    second = [numpy.zeros(0, dtype=int)]
+    d = 1
+
+    # Compare each end point with the end point d places after it, until no
+    # end point is within the tolerance in x of the one d places after it
+    while d < n:
+        near = (g[d:] == g[:-d]) & (x[d:] - x[:-d] <= tolerance[:-d])
+
+        if not near.any():
+            break
+
+        k = numpy.nonzero(near & (numpy.abs(y[d:] - y[:-d]) <= tolerance[:-d]))[0]
+        first.append(order[k])
+        second.append(order[k + d])
+        d += 1
+
+    first = numpy.concatenate(first)
+    second = numpy.concatenate(second)
+
+    joined = numpy.ones(len(tolerances), dtype=bool)
+    joined[geometries[numpy.bincount(numpy.concatenate((first, second)), minlength=n) != 1]] = False
+
+    partner = numpy.arange(n)
+    partner[first] = second
+    partner[second] = first
+
+    # A piece is followed forwards (state 2i) from its start to its end point,
+    # or backwards (state 2i + 1) from its end to its start point. The piece
+    # which follows it is entered at the partner of the end point at which it
+    # is left, and is followed forwards if that is its start point, so the
+    # state which follows state s is the partner of end point s ^ 1.
+    following = partner[numpy.arange(n) ^ 1]
+
+    unjoined = ~joined[geometries]
+    following[unjoined] = numpy.nonzero(unjoined)[0]
+
+    # Label each state with the lowest state in its cycle; a contour is
+    # traversed by two cycles (one in each direction)
+    labels = numpy.arange(n)
+    longest = 2 * numpy.bincount(piece_geometries).max() if n > 0 else 0
+    steps = 1
+
+    while steps < longest:
+        labels = numpy.minimum(labels, labels[following])
+        following = following[following]
+        steps *= 2
+
+    return numpy.minimum(labels[0::2], labels[1::2]), labels[1::2] < labels[0::2], joined
+
+def _get_segments(points, lengths):
+    """
+    Get the segments of polylines whose vertices are joined into a single array.
+
+    :returns: A tuple in the form ``(segments, polylines)``, where ``segments``
+        is an (n, 4) array of ``(x0, y0, x1, y1)`` and ``polylines`` is the
+        index of the polyline of each segment.
+
+    """
+
+    # The segment between the last vertex of one polyline and the first
+    # vertex of the next is excluded.
+    valid = numpy.ones(max(len(points) - 1, 0), dtype=bool)
+    valid[numpy.cumsum(lengths)[:-1] - 1] = False
+
+    segments = numpy.column_stack((points[:-1], points[1:]))[valid]
+    polylines = numpy.repeat(numpy.arange(len(lengths)), lengths)[:-1][valid]
+
+    return segments, polylines
+
+def _get_arc_chords(arcs):
+    """
+    Approximate each of an array of arcs by chords (used for containment tests).
+
+    :returns: An (n * _ARC_SAMPLES, 4) array of ``(x0, y0, x1, y1)``.
+
+    """
+
+    t = arcs[:, 3:4] + (arcs[:, 4:5] - arcs[:, 3:4]) * numpy.arange(_ARC_SAMPLES + 1) / float(_ARC_SAMPLES)
+    x = arcs[:, 0:1] + arcs[:, 2:3] * numpy.cos(t)
+    y = arcs[:, 1:2] + arcs[:, 2:3] * numpy.sin(t)
+
+    return numpy.column_stack((x[:, :-1].ravel(), y[:, :-1].ravel(), x[:, 1:].ravel(), y[:, 1:].ravel()))
+
+def _get_depths(segments, segment_contours, points, contour_geometries):
+    """
+    Get the number of contours which enclose each contour of a batch of
+    geometries (as ``get_contour_depths`` does for a single geometry), using arrays.
+
+    :param segments: An (n, 4) array of ``(x0, y0, x1, y1)``, which approximates the contours.
+    :param segment_contours: The index of the contour of each segment.
+    :param points: An (m, 2) array of a point on each contour.
+    :param contour_geometries: The index of the geometry of each contour (in increasing order).
+
+    :returns: An array of the depth of each contour.
+
+    """
+
+    num_contours = len(points)
+
+    if num_contours == 0:
+        return numpy.zeros(0, dtype=int)
+
+    order = numpy.argsort(segment_contours, kind='mergesort')
+    segments = segments[order]
+    counts = numpy.bincount(segment_contours, minlength=num_contours)
+    offsets = numpy.cumsum(counts) - counts
+
+    x = segments[:, 0::2]
+    y = segments[:, 1::2]
+    mins = numpy.column_stack((numpy.minimum.reduceat(x.min(axis=1), offsets), numpy.minimum.reduceat(y.min(axis=1), offsets)))
+    maxs = numpy.column_stack((numpy.maximum.reduceat(x.max(axis=1), offsets), numpy.maximum.reduceat(y.max(axis=1), offsets)))
+
+    # Every pair of contours of the same geometry
+    per_geometry = numpy.bincount(contour_geometries)
+    group_counts = per_geometry[contour_geometries]
+    group_starts = (numpy.cumsum(per_geometry) - per_geometry)[contour_geometries]
+
+    i = numpy.repeat(numpy.arange(num_contours), group_counts)
+    j = _get_ranges(group_starts, group_counts)
+
+    # Reject contours whose bounds do not enclose the bounds of the other contour
+    keep = (i != j) & (mins[j] <= mins[i]).all(axis=1) & (maxs[j] >= maxs[i]).all(axis=1)
+    i = i[keep]
+    j = j[keep]
+
+    # Cast a ray in the x direction from the point of contour i across the segments of contour j
+    pairs = numpy.repeat(numpy.arange(len(i)), counts[j])
+    x0, y0, x1, y1 = segments[_get_ranges(offsets[j], counts[j])].T
+    px, py = points[i[pairs]].T
+
+    crosses = (y0 > py) != (y1 > py)
+
+    # Horizontal (e.g. zero-length) segments never cross, so their intersections
+    # (which are not numbers) are ignored
+    with numpy.errstate(divide='ignore', invalid='ignore'):
+        right = x0 + (py - y0) * (x1 - x0) / (y1 - y0) > px
+
+    inside = numpy.bincount(pairs, crosses & right, len(i)) % 2 == 1
+
+    return numpy.bincount(i[inside], minlength=num_contours)
+
+def get_mass_properties(geometries, tolerance=None):
+    """
+    Calculate the mass properties of a batch of geometries in a single call.
+
+    The boundaries of the items are gathered one item at a time, but the
+    items of every geometry are then joined into contours (see ``_join_pieces``),
+    and the contours are integrated, together as arrays. The items of a
+    geometry whose end points are not matched in pairs (e.g. where two
+    contours touch at a point) are joined by ``get_contours`` instead.
+
+    :param geometries: A list of geometry.primitives.Geometry objects.
+    :param tolerance: The maximum distance between joined end points (see ``get_contours``).
+
+    :raises: An Exception if the items of a geometry do not form closed contours.
+    :returns: A tuple in the form ``(area, centroid, second_moments)``, where
+        ``area`` is an array of length n, ``centroid`` is an (n, 2) array of
+        ``(x, y)`` and ``second_moments`` is an (n, 3) array of
+        ``(Ixx, Iyy, Ixy)`` taken about the centroid.
+
+    """
+
+    pieces = []
+    piece_geometries = []
+
+    for g in range(len(geometries)):
+        for item in geometries[g].items:
+            boundary = item.get_boundary()
+
+            if len(boundary) > 0:
+                pieces.append(boundary)
+                piece_geometries.append(g)
+
+    piece_geometries = numpy.array(piece_geometries, dtype=int)
+    points, lengths, polyline_pieces, arcs, arc_pieces, starts, ends, centers = _get_piece_arrays(pieces)
+
+    if tolerance == None:
+        tolerances = _get_default_tolerances(starts, ends, centers, piece_geometries, len(geometries))
+    else:
+        tolerances = numpy.repeat(float(tolerance), len(geometries))
+
+    labels, backwards, joined = _join_pieces(starts, ends, piece_geometries, tolerances)
+
+    # Number the contours of the geometries whose pieces were joined; the
+    # pieces of the other geometries are given a contour of -1
+    in_joined = joined[piece_geometries]
+    first_pieces, contours = numpy.unique(labels[in_joined], return_index=True, return_inverse=True)[1:]
+
+    piece_contours = numpy.repeat(-1, len(pieces))
+    piece_contours[in_joined] = contours
+    piece_signs = numpy.where(backwards, -1.0, 1.0)
+
+    # The segments and arcs of the contours, with the direction in which
+    # each is traversed
+    segments, segment_polylines = _get_segments(points, lengths)
+    segment_pieces = polyline_pieces[segment_polylines]
+    keep = piece_contours[segment_pieces] >= 0
+    segments = segments[keep]
+    segment_pieces = segment_pieces[keep]
+    segment_contours = piece_contours[segment_pieces]
+    segment_signs = piece_signs[segment_pieces]
+
+    keep = piece_contours[arc_pieces] >= 0
+    arcs = arcs[keep]
+    arc_pieces = arc_pieces[keep]
+    arc_contours = piece_contours[arc_pieces]
+    arc_signs = piece_signs[arc_pieces]
+
+    first_pieces = numpy.nonzero(in_joined)[0][first_pieces]
+    contour_geometries = piece_geometries[first_pieces]
+    contour_depths = _get_depths(numpy.concatenate((segments, _get_arc_chords(arcs))),
+                                 numpy.concatenate((segment_contours, numpy.repeat(arc_contours, _ARC_SAMPLES))),
+                                 starts[first_pieces], contour_geometries)
+
+    # Join the items of the other geometries one geometry at a time; each
+    # contour is then a single piece, which is traversed forwards
+    for g in numpy.nonzero(~joined)[0]:
+        contours = get_contours(geometries[g], tolerance)
+        c_points, c_lengths, c_polyline_contours, c_arcs, c_arc_contours = _get_piece_arrays(contours)[:5]
+        c_segments, c_segment_polylines = _get_segments(c_points, c_lengths)
+
+        first = len(contour_geometries)
+        contour_geometries = numpy.concatenate((contour_geometries, numpy.repeat(g, len(contours))))
+        contour_depths = numpy.concatenate((contour_depths, get_contour_depths(contours)))
+
+        segments = numpy.concatenate((segments, c_segments))
+        segment_contours = numpy.concatenate((segment_contours, first + c_polyline_contours[c_segment_polylines]))
+        segment_signs = numpy.concatenate((segment_signs, numpy.ones(len(c_segments))))
+
+        arcs = numpy.concatenate((arcs, c_arcs))
+        arc_contours = numpy.concatenate((arc_contours, first + c_arc_contours))
+        arc_signs = numpy.concatenate((arc_signs, numpy.ones(len(c_arcs))))
+
+    num_contours = len(contour_geometries)
+
+    # The integrals of each contour
+    totals = numpy.zeros((6, num_contours))
+
+    if len(segments) > 0:
+        integrals = get_segment_integrals(segments[:, 0], segments[:, 1], segments[:, 2], segments[:, 3])
+
+        for k in range(6):
+            totals[k] += numpy.bincount(segment_contours, integrals[k] * segment_signs, num_contours)
+
+    if len(arcs) > 0:
+        integrals = get_arc_integrals(arcs[:, 0], arcs[:, 1], arcs[:, 2], arcs[:, 3], arcs[:, 4])
+
+        for k in range(6):
+            totals[k] += numpy.bincount(arc_contours, integrals[k] * arc_signs, num_contours)
+
+    # Make every contour positive, then subtract the holes
+    sign = numpy.where(totals[0] < 0, -1.0, 1.0)
+    sign *= numpy.where(numpy.array(contour_depths, dtype=int) % 2 == 1, -1.0, 1.0)
+    totals *= sign
+
+    # The integrals of each geometry
+    g_totals = numpy.zeros((6, len(geometries)))
+
+    for k in range(6):
+        g_totals[k] = numpy.bincount(contour_geometries, totals[k], len(geometries))
+
+    area, sx, sy, ixx, iyy, ixy = g_totals
+
+    with numpy.errstate(divide='ignore', invalid='ignore'):
+        cx = sx / area
+        cy = sy / area
+
+    # Move the second moments to the centroid (parallel axis theorem)
+    second_moments = numpy.column_stack((ixx - area * cy * cy,
+                                         iyy - area * cx * cx,
+                                         ixy - area * cx * cy))
+
+    return area, numpy.column_stack((cx, cy)), second_moments
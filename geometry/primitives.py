@@ -1,13 +1,127 @@
 from lxml import etree
 import math
+import multiprocessing
+import os
 
 from dxfwrite import DXFEngine as dxf
 
+import compression
+import diff
+import mass_properties
+import stl
 import svg_utils
+import validation
 
-class Geometry:
-    def __init__(self, items = []):
-        self.items = items
+# The Geometry method used to write each file format, keyed by file extension.
+# Compressed formats are written by the same methods (see geometry.compression).
+EXPORTERS = {'.svg': 'write_svg',
+             '.svgz': 'write_svg',
+             '.svg.gz': 'write_svg',
+             '.dxf': 'write_dxf',
+             '.dxf.gz': 'write_dxf',
+             '.stl': 'write_stl'}
+
+def get_ext(file_name, extensions):
+    """
+    Get the longest of a set of extensions with which a file name ends.
+    
+    Unlike ``os.path.splitext``, this finds compound extensions such as ``.dxf.gz``.
+    
+    :param file_name: The name of the file.
+    :param extensions: The extensions to look for.
+    
+    :returns: The (lower case) extension, or the extension found by ``os.path.splitext`` if none of the extensions match.
+    
+    """
+    
+    lower = file_name.lower()
+    matches = [ext for ext in extensions if lower.endswith(ext)]
+    
+    if len(matches) == 0:
+        return os.path.splitext(lower)[1]
+    
+    return max(matches, key=len)
+
+def get_exporter_name(file_name, ext=None):
+    """
+    Get the name of the Geometry method which writes the specified file.
+    
+    :param file_name: The name of the file to write. 
+    :param ext: The extension which identifies the format, or None to use the extension of ``file_name``.
+    :raises: An Exception if the format of the file is not supported.
+    :returns: The name of the Geometry method. 
+    
+    """
+    
+    if ext == None:
+        ext = get_ext(file_name, EXPORTERS.keys())
+    
+    ext = ext.lower()
+    
+    if not EXPORTERS.has_key(ext):
+        raise Exception('Unsupported output format: {0}'.format(file_name))
+    
+    return EXPORTERS[ext]
+
+def _export(job):
+    """
+    Write a geometry to a file. 
+    
+    This is a module-level function so that it can be used with a process pool.
+    
+    :param job: A tuple in the form ``(geometry, method_name, file_name, options)``.
+    
+    """
+    
+    geom, method_name, file_name, options = job
+    getattr(geom, method_name)(file_name, **options)
+
+class _Immutable(object):
+    """
+    A base class for objects whose attributes cannot be changed once they have been initialized.
+    
+    Immutable objects can be shared between threads (or cached) without locks or defensive copies.
+    
+    """
+    
+    def _set(self, **attributes):
+        """
+        Set attributes during initialization.
+        
+        """
+        
+        for name, value in attributes.items():
+            object.__setattr__(self, name, value)
+    
+    def __setattr__(self, name, value):
+        raise AttributeError('{0} objects are immutable'.format(type(self).__name__))
+    
+    def __delattr__(self, name):
+        raise AttributeError('{0} objects are immutable'.format(type(self).__name__))
+
+class Geometry(_Immutable):
+    """
+    An immutable collection of items. 
+    
+    Use a GeometryBuilder to assemble the items of a geometry incrementally.
+    
+    """
+    
+    def __init__(self, items = ()):
+        self._set(items=tuple(items))
+        
+    def iter_items(self):
+        """
+        Iterate over the items. 
+        
+        The exporters use this method, so that geometry whose items are
+        generated as they are needed (see InstancedGeometry) is streamed.
+        
+        :returns: An iterator of items.
+        
+        """
+        
+        return iter(self.items)
     
     def get_bounds(self):
         """
@@ -17,14 +131,15 @@ class Geometry:
         
         """
         
-        if len(self.items) == 0:
-            return None
+        bounds = None
         
-        bounds = self.items[0].get_bounds()
-        
-        for i in range(1, len(self.items)):
-            b = self.items[i].get_bounds()
-            bounds = ((min(bounds[0][0], b[0][0]), min(bounds[0][1], b[0][1])), (max(bounds[1][0], b[1][0]), max(bounds[1][1], b[1][1])))
+        for item in self.iter_items():
+            b = item.get_bounds()
+            
+            if bounds == None:
+                bounds = b
+            else:
+                bounds = ((min(bounds[0][0], b[0][0]), min(bounds[0][1], b[0][1])), (max(bounds[1][0], b[1][0]), max(bounds[1][1], b[1][1])))
             
         return bounds
             
@@ -58,6 +173,8 @@ class Geometry:
         """
         Create a DXF.
         
+        The file is compressed as it is written if its name ends with ``.gz``.
+        
         :param file_name: The name of the DXF file to write.
         :param layer: The name of the layer to which to add the geometry.
         
@@ -65,34 +182,339 @@ class Geometry:
         
         drawing = dxf.drawing(file_name)
         
-        self.append_to_dxf(drawing)
-    
-        drawing.save()
+        # The entities are generated as the drawing is written, one item at a time
+        drawing.add(_DXFStream(self.iter_items()))
+        
+        f = compression.open_output(file_name)
+        
+        try:
+            drawing.save_to_fileobj(f)
+        finally:
+            f.close()
         
     def append_to_dxf(self, drawing):  
-        for g in self.items:
+        for g in self.iter_items():
             g.append_to_dxf(drawing)
     
-    def write_svg(self, file_name, scale=1, margin_factor=0.2, style={}):
-        tree = svg_utils.get_svg_tree()
-        root = tree.getroot()
+    def write_stl(self, file_name, height, twist=0, layers=None, arc_resolution=stl.DEFAULT_ARC_RESOLUTION):
+        """
+        Extrude the geometry and write it as a binary STL file.
+        
+        See geometry.stl.write_stl for details.
+        
+        :param file_name: The name of the STL file to write.
+        :param height: The height of the extrusion.
+        :param twist: The angle, in radians, by which the top of the extrusion is rotated relative to the bottom.
+        :param layers: The number of layers into which the twist is divided.
+        :param arc_resolution: The maximum angle spanned by a segment of an arc.
+        
+        """
+        
+        stl.write_stl(self, file_name, height, twist, layers, arc_resolution)
+        
+    def write_svg(self, file_name, scale=1, margin_factor=0.2, style={}, precision=svg_utils.DEFAULT_PRECISION):
+        """
+        Create an SVG.
+        
+        The elements are written to the file one item at a time, rather than
+        building the whole document first. The file is compressed as it is 
+        written if its name ends with ``.svgz`` or ``.gz``.
+        
+        :param file_name: The name of the SVG file to write.
+        :param scale: The amount by which to scale the geometry.
+        :param margin_factor: The size of the margin, as a fraction of the dimensions of the geometry.
+        :param style: The style attributes of the elements (which are written once, on a group containing them).
+        :param precision: The number of decimal places to use for coordinates.
+        
+        """
+        
+        root = svg_utils.get_svg_tree().getroot()
         
         size, offset = self.get_bounds_and_margin(margin_factor, scale)
         
         root.attrib['width'] = str(size[0])
         root.attrib['height'] = str(size[1])
         
-        self.append_to_svg(root, scale=scale, offset=offset, style=style)
+        # The style is written once, on a group whose elements inherit it
+        group = svg_utils.append_style_group(root, style, scale)
+        
+        f = compression.open_output(file_name)
+        
+        try:
+            with etree.xmlfile(f, encoding='ASCII') as xf:
+                xf.write_declaration()
+                
+                with xf.element(root.tag, root.attrib):
+                    xf.write('\n  ')
+                    
+                    with xf.element(group.tag, group.attrib):
+                        # Each item is added to an empty element, written, then discarded
+                        parent = etree.Element(root.tag)
+                        
+                        for g in self.iter_items():
+                            g.append_to_svg(parent, offset, scale, {}, precision)
+                            
+                            for n in parent:
+                                xf.write('\n    ')
+                                xf.write(n)
+                                
+                            del parent[:]
+                            
+                        xf.write('\n  ')
+                        
+                    xf.write('\n')
+                
+            f.write('\n')
+        finally:
+            f.close()
+
+    def append_to_svg(self, root, scale=1, offset=(0,0), style={}, precision=svg_utils.DEFAULT_PRECISION):
+        # The elements inherit the style from a group (see svg_utils.append_style_group)
+        group = svg_utils.append_style_group(root, style, scale)
+        
+        for g in self.iter_items():
+            g.append_to_svg(group, offset, scale, {}, precision)
+            
+    def export_many(self, exports, processes=False, pool_size=None):
+        """
+        Write the geometry to several files.
+        
+        The format of each file is determined by its extension (see 
+        ``EXPORTERS``). By default, the files are written one after another.
+        The exporters are pure Python, so writing them from several threads
+        gives no speedup (the interpreter runs only one thread at a time);
+        with ``processes``, each file is instead written by a separate process
+        from a copy of the geometry, so the total time approaches that of the
+        slowest exporter rather than the sum of all of them.
+        
+        :param exports: A list of tuples in the form ``(file_name, options)`` or ``(file_name, options, ext)``, where ``options`` is a dict of keyword arguments for the corresponding ``write_*`` method and ``ext`` overrides the extension of ``file_name``.
+        :param processes: True to write the files using a pool of processes. This
+            is only done if there is more than one file and more than one CPU.
+        :param pool_size: The number of processes (defaults to one per export, up to the number of CPUs).
+        
+        """
+        
+        # Resolve the formats before writing any of the files
+        jobs = []
+        for export in exports:
+            file_name, options = export[0], export[1]
+            ext = export[2] if len(export) > 2 else None
+            jobs.append((self, get_exporter_name(file_name, ext), file_name, options))
+        
+        cpus = multiprocessing.cpu_count() if processes else 1
+        
+        if len(jobs) <= 1 or cpus <= 1:
+            for job in jobs:
+                _export(job)
+            return
+        
+        if pool_size == None:
+            pool_size = min(len(jobs), cpus)
+        
+        pool = multiprocessing.Pool(pool_size)
+        
+        try:
+            pool.map(_export, jobs)
+        finally:
+            pool.close()
+            pool.join()
+            
+    def validate(self, tolerance=None):
+        """
+        Check the geometry for intersections, overlaps and gaps.
+        
+        See geometry.validation.validate for details.
+        
+        :param tolerance: The distance below which problems are ignored.
+        
+        :returns: A list of problems, each in the form ``(kind, (x, y), items, size)``.
+        
+        """
+        
+        return validation.validate(self, tolerance)
     
-        svg_utils.write_svg(tree, file_name)
+    def diff(self, other, tolerance=None):
+        """
+        Compare the geometry with another (e.g. one read by geometry.importers).
+        
+        See geometry.diff.diff for details.
+        
+        :param other: The geometry to compare with this one.
+        :param tolerance: The largest deviation which is ignored.
+        
+        :returns: A list of differences, each in the form ``(kind, expected_index, actual_index, deviation)``.
+        
+        """
+        
+        return diff.diff(self, other, tolerance)
+            
+    def get_area(self):
+        """
+        Get the area enclosed by the geometry (holes are subtracted).
+        
+        :returns: The area.
+        
+        """
+        
+        return self.get_mass_properties()[0]
     
-    def append_to_svg(self, root, scale=1, offset=(0,0), style={}):
-        for g in self.items:
-            g.append_to_svg(root, offset, scale, style)
+    def get_centroid(self):
+        """
+        Get the centroid of the area enclosed by the geometry.
+        
+        :returns: The centroid, in the form ``(x, y)``.
+        
+        """
+        
+        return self.get_mass_properties()[1]
     
-class Polyline():
+    def get_second_moments(self):
+        """
+        Get the second moments of the area enclosed by the geometry, about its centroid.
+        
+        The polar moment is ``Ixx + Iyy``.
+        
+        :returns: The second moments, in the form ``(Ixx, Iyy, Ixy)``.
+        
+        """
+        
+        return self.get_mass_properties()[2]
+    
+    def get_mass_properties(self, tolerance=None):
+        """
+        Get the area, centroid and second moments of the area enclosed by the geometry.
+        
+        See geometry.mass_properties.get_mass_properties to evaluate many geometries in one call.
+        
+        :param tolerance: The maximum distance between the end points of items which are joined into a contour.
+        
+        :returns: The mass properties, in the form ``(area, (x, y), (Ixx, Iyy, Ixy))``.
+        
+        """
+        
+        area, centroid, second_moments = mass_properties.get_mass_properties([self], tolerance)
+        
+        return (float(area[0]), 
+                tuple(float(v) for v in centroid[0]), 
+                tuple(float(v) for v in second_moments[0]))
+    
+class InstancedGeometry(Geometry):
+    """
+    An immutable geometry made up of copies of a template, each of which is 
+    rotated (about the origin) and translated by a multiple of a fixed amount,
+    followed by other items.
+    
+    For example, the teeth of a rack are copies of a single tooth, each of 
+    which is translated by the circular pitch. The copies are generated as 
+    they are iterated over, so they are streamed to the exporters rather 
+    than held in memory. Accessing ``items`` creates every copy.
+    
+    """
+    
+    def __init__(self, template, count, angle = 0, offset = (0, 0), items = ()):
+        """
+        :param template: The items to copy.
+        :param count: The number of copies.
+        :param angle: The angle by which each copy is rotated relative to the previous copy.
+        :param offset: The amount by which each copy is translated relative to the previous copy, in the form ``(x, y)``.
+        :param items: The items which follow the copies.
+        
+        """
+        
+        self._set(template=tuple(template),
+                  count=count,
+                  angle=angle,
+                  offset=tuple(offset),
+                  other_items=tuple(items))
+        
+    @property
+    def items(self):
+        return tuple(self.iter_items())
+        
+    def iter_items(self):
+        for i in xrange(self.count):
+            angle = i * self.angle
+            offset = (i * self.offset[0], i * self.offset[1])
+            
+            for item in self.template:
+                yield item.get_transformed(angle, offset)
+                
+        for item in self.other_items:
+            yield item
+    
+class _DXFStream:
+    """
+    A DXF object which generates the entities of a sequence of items as the drawing is written.
+    
+    """
+    
+    def __init__(self, items):
+        self.items = items
+        self.entities = []
+        
+    def add(self, entity):
+        self.entities.append(entity)
+        
+    def __dxftags__(self):
+        for item in self.items:
+            del self.entities[:]
+            item.append_to_dxf(self)
+            
+            for entity in self.entities:
+                yield entity
+    
+def _transform_point(p, c, s, offset):
+    """
+    Rotate a point about the origin (given the cosine and sine of the angle), then translate it.
+    
+    """
+    
+    return (p[0]*c - p[1]*s + offset[0], p[0]*s + p[1]*c + offset[1])
+
+class GeometryBuilder:
+    """
+    Assembles the items of a geometry, then produces an immutable Geometry.
+    
+    A builder is not itself thread-safe; each thread should use its own.
+    
+    """
+    
+    def __init__(self, items = ()):
+        self.items = list(items)
+        
+    def add(self, item):
+        """
+        Add an item to the geometry.
+        
+        :param item: The item to add.
+        
+        """
+        
+        self.items.append(item)
+        
+    def extend(self, items):
+        """
+        Add several items to the geometry.
+        
+        :param items: The items to add.
+        
+        """
+        
+        self.items.extend(items)
+        
+    def build(self):
+        """
+        Get an immutable snapshot of the items added so far.
+        
+        :returns: A Geometry object.
+        
+        """
+        
+        return Geometry(self.items)
+    
+class Polyline(_Immutable):
     def __init__(self, points):
-        self.points = points
+        self._set(points=tuple(tuple(p) for p in points))
 
     def get_bounds(self):
         
@@ -115,26 +537,48 @@ class Polyline():
             
         return ((min_x, min_y), (max_x, max_y))
 
-    def append_to_svg(self, _n, offset=(0, 0), scale_factor = 1, style = {}):
+    def append_to_svg(self, _n, offset=(0, 0), scale_factor = 1, style = {}, precision = svg_utils.DEFAULT_PRECISION):
         n = etree.SubElement(_n, 'path')
-        
-        d="M{0} {1}".format(self.points[0][0] * scale_factor + offset[0],
-                            self.points[0][1] * scale_factor + offset[1])
-        
+
+        d = svg_utils.PathData(precision)
+
+        d.move_to(self.points[0][0] * scale_factor + offset[0],
+                  self.points[0][1] * scale_factor + offset[1])
+
         for i in range(1, len(self.points)):
-            d += ' L {0} {1}'.format(self.points[i][0] * scale_factor + offset[0],
-                                     self.points[i][1] * scale_factor + offset[1])
+            d.line_to(self.points[i][0] * scale_factor + offset[0],
+                      self.points[i][1] * scale_factor + offset[1])
 
-        n.attrib['d'] = d
-        
-        if style.has_key('stroke'):
-            n.attrib['stroke'] = style['stroke']
+        n.attrib['d'] = str(d)
         
-        if style.has_key('stroke-width'):
-            n.attrib['stroke-width'] = str(style['stroke-width'] * scale_factor)
+        for name, value in svg_utils.get_style_attributes(style, scale_factor):
+            n.attrib[name] = value
             
-        if style.has_key('fill'):
-            n.attrib['fill'] = style['fill']
+    def get_boundary(self):
+        """
+        Get the edges which make up the polyline (see geometry.mass_properties).
+        
+        """
+        
+        return [('polyline', self.points)]
+    
+    def get_transformed(self, angle = 0, offset = (0, 0)):
+        """
+        Get a copy of the polyline, rotated about the origin then translated.
+        
+        Points are rotated in the same way as by geometric_functions.get_rotated_points.
+        
+        :param angle: The angle of rotation, in radians.
+        :param offset: The translation, in the form ``(x, y)``.
+        
+        :returns: A Polyline object.
+        
+        """
+        
+        c = math.cos(angle)
+        s = math.sin(angle)
+        
+        return Polyline([_transform_point(p, c, s, offset) for p in self.points])
             
     def append_to_dxf(self, drawing):
         adj_points = []
@@ -145,12 +589,12 @@ class Polyline():
 
 
 
-class Arc():
+class Arc(_Immutable):
     def __init__(self, center, radius, start_angle, end_angle):
-        self.center = center
-        self.radius = radius
-        self.start_angle = start_angle
-        self.end_angle = end_angle
+        self._set(center=tuple(center),
+                  radius=radius,
+                  start_angle=start_angle,
+                  end_angle=end_angle)
 
     def get_start_point(self):
         start_x = self.center[0] + self.radius * math.cos(self.start_angle)
@@ -191,70 +635,95 @@ class Arc():
             
         return ((min_x, min_y), (max_x, max_y))
 
-    def append_to_svg(self, _n, offset=(0, 0), scale_factor = 1, style = {}):
+    def append_to_svg(self, _n, offset=(0, 0), scale_factor = 1, style = {}, precision = svg_utils.DEFAULT_PRECISION):
         n = etree.SubElement(_n, 'path')
         
         start_x, start_y = self.get_start_point()
         end_x, end_y = self.get_end_point()
         
-        if self.end_angle - self.start_angle >  math.pi:
-            flag = '1'
-        else:
-            flag = '0'
+        d = svg_utils.PathData(precision)
         
-        d = "M{0} {1} A {2} {2}, 0, {5}, 0, {3} {4}".format(start_x * scale_factor + offset[0],
-                                                          start_y * scale_factor + offset[1],
-                                                          self.radius * scale_factor,
-                                                          end_x * scale_factor + offset[0],
-                                                          end_y * scale_factor + offset[1],
-                                                          flag)
+        d.move_to(start_x * scale_factor + offset[0],
+                  start_y * scale_factor + offset[1])
         
-        n.attrib['d'] = d
+        d.arc_to(self.radius * scale_factor,
+                 self.radius * scale_factor,
+                 0,
+                 self.end_angle - self.start_angle > math.pi,
+                 False,
+                 end_x * scale_factor + offset[0],
+                 end_y * scale_factor + offset[1])
         
-        if style.has_key('stroke'):
-            n.attrib['stroke'] = style['stroke']
+        n.attrib['d'] = str(d)
         
-        if style.has_key('stroke-width'):
-            n.attrib['stroke-width'] = str(style['stroke-width'] * scale_factor)
-            
-        if style.has_key('fill'):
-            n.attrib['fill'] = style['fill']
+        for name, value in svg_utils.get_style_attributes(style, scale_factor):
+            n.attrib[name] = value
+        
+    def get_boundary(self):
+        """
+        Get the edges which make up the arc (see geometry.mass_properties).
+        
+        """
+        
+        # Angles are measured clockwise, since the y-axis points down
+        return [('arc', self.center[0], self.center[1], self.radius, -self.start_angle, -self.end_angle)]
+    
+    def get_transformed(self, angle = 0, offset = (0, 0)):
+        """
+        Get a copy of the arc, rotated about the origin then translated (see Polyline.get_transformed).
+        
+        """
+        
+        # Angles are measured clockwise, so rotating the arc reduces them
+        center = _transform_point(self.center, math.cos(angle), math.sin(angle), offset)
+        
+        return Arc(center, self.radius, self.start_angle - angle, self.end_angle - angle)
         
     def append_to_dxf(self, drawing):
         drawing.add(dxf.arc(self.radius, (self.center[0], -self.center[1]), self.start_angle * 180 / math.pi, self.end_angle * 180 / math.pi))
         
 
-class Circle():
+class Circle(_Immutable):
     def __init__(self, center, radius):
-        self.center = center
-        self.radius = radius
+        self._set(center=tuple(center),
+                  radius=radius)
         
     def get_bounds(self):
         return (((self.center[0] - self.radius), (self.center[1] - self.radius)),
                 ((self.center[0] + self.radius), (self.center[1] + self.radius)))
         
-    def append_to_svg(self, _n, offset = (0, 0), scale_factor = 1, style = {}):
+    def append_to_svg(self, _n, offset = (0, 0), scale_factor = 1, style = {}, precision = svg_utils.DEFAULT_PRECISION):
         n = etree.SubElement(_n, 'circle')
-        n.attrib['cx'] = str(self.center[0] * scale_factor + offset[0])
-        n.attrib['cy'] = str(self.center[1] * scale_factor + offset[1])
-        n.attrib['r'] = str(self.radius * scale_factor)
+        n.attrib['cx'] = svg_utils.format_number(self.center[0] * scale_factor + offset[0], precision)
+        n.attrib['cy'] = svg_utils.format_number(self.center[1] * scale_factor + offset[1], precision)
+        n.attrib['r'] = svg_utils.format_number(self.radius * scale_factor, precision)
         
-        if style.has_key('stroke'):
-            n.attrib['stroke'] = style['stroke']
+        for name, value in svg_utils.get_style_attributes(style, scale_factor):
+            n.attrib[name] = value
         
-        if style.has_key('stroke-width'):
-            n.attrib['stroke-width'] = str(style['stroke-width'] * scale_factor)
-            
-        if style.has_key('fill'):
-            n.attrib['fill'] = style['fill']
+    def get_boundary(self):
+        """
+        Get the edges which make up the circle (see geometry.mass_properties).
+        
+        """
+        
+        return [('arc', self.center[0], self.center[1], self.radius, 0, 2 * math.pi)]
+    
+    def get_transformed(self, angle = 0, offset = (0, 0)):
+        """
+        Get a copy of the circle, rotated about the origin then translated (see Polyline.get_transformed).
+        
+        """
+        
+        return Circle(_transform_point(self.center, math.cos(angle), math.sin(angle), offset), self.radius)
         
     def append_to_dxf(self, drawing):
         drawing.add(dxf.circle(self.radius, (self.center[0], -self.center[1])))
         
-class Rect():
+class Rect(_Immutable):
     def __init__(self, origin, dimensions):
-        self.origin = origin
-        self.dimensions = dimensions
+        self._set(origin=tuple(origin),
+                  dimensions=tuple(dimensions))
         
     def get_bounds(self):
         x1 = self.origin[0]
@@ -265,19 +734,37 @@ class Rect():
         
         return((min(x1, x2), min(y1, y2)), (max(x1, x2), max(y1, y2)))
         
-    def append_to_svg(self, _n, offset = (0, 0), scale_factor = 1, style = {}):
+    def append_to_svg(self, _n, offset = (0, 0), scale_factor = 1, style = {}, precision = svg_utils.DEFAULT_PRECISION):
         n = etree.SubElement(_n, 'rect')
-        n.attrib['x'] = str(self.origin[0] * scale_factor + offset[0])
-        n.attrib['y'] = str(self.origin[1] * scale_factor + offset[1])
-        n.attrib['width'] = str(self.dimensions[0] * scale_factor)
-        n.attrib['height'] = str(self.dimensions[1] * scale_factor)
+        n.attrib['x'] = svg_utils.format_number(self.origin[0] * scale_factor + offset[0], precision)
+        n.attrib['y'] = svg_utils.format_number(self.origin[1] * scale_factor + offset[1], precision)
+        n.attrib['width'] = svg_utils.format_number(self.dimensions[0] * scale_factor, precision)
+        n.attrib['height'] = svg_utils.format_number(self.dimensions[1] * scale_factor, precision)
         
-        if style.has_key('stroke'):
-            n.attrib['stroke'] = style['stroke']
-        
-        if style.has_key('stroke-width'):
-            n.attrib['stroke-width'] = str(style['stroke-width'] * scale_factor)
+        for name, value in svg_utils.get_style_attributes(style, scale_factor):
+            n.attrib[name] = value
             
-        if style.has_key('fill'):
-            n.attrib['fill'] = style['fill']
-            
\ No newline at end of file
+    def get_boundary(self):
+        """
+        Get the edges which make up the rectangle (see geometry.mass_properties).
+        
+        """
+        
+        x1, y1 = self.origin
+        x2 = x1 + self.dimensions[0]
+        y2 = y1 + self.dimensions[1]
+        
+        return [('polyline', [(x1, y1), (x2, y1), (x2, y2), (x1, y2), (x1, y1)])]
+    
+    def get_transformed(self, angle = 0, offset = (0, 0)):
+        """
+        Get a copy of the rectangle, rotated about the origin then translated (see Polyline.get_transformed).
+        
+        :returns: A Rect object, or a closed Polyline object if the rectangle is rotated.
+        
+        """
+        
+        if angle == 0:
+            return Rect((self.origin[0] + offset[0], self.origin[1] + offset[1]), self.dimensions)
+        
+        return Polyline(self.get_boundary()[0][1]).get_transformed(angle, offset)
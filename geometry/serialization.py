@@ -0,0 +1,117 @@
+"""
+Contains functions for storing geometry in a compact binary form (e.g. in a
+database, see catalog.py).
+
+The data consists of a header, a code for each item, the number of points
+in each polyline and the coordinates and other values of all of the items,
+stored as little-endian doubles and compressed with zlib:
+
+    'P' (Polyline): x and y of each point
+    'A' (Arc): cx, cy, radius, start angle, end angle
+    'C' (Circle): cx, cy, radius
+    'R' (Rect): x, y, width, height
+
+"""
+
+import struct
+import zlib
+
+import numpy
+
+import primitives
+
+_HEADER = struct.Struct('<III')
+
+# The number of values stored for each type of item (other than polylines)
+_VALUE_COUNTS = {'A': 5, 'C': 3, 'R': 4}
+
+def dumps(geom, level=6):
+    """
+    Serialize a geometry.
+
+    :param geom: The geometry.primitives.Geometry object.
+    :param level: The zlib compression level.
+
+    :raises: An Exception if the geometry contains an item which cannot be serialized.
+    :returns: The serialized geometry (a string).
+
+    """
+
+    codes = []
+    counts = []
+    values = []
+
+    for item in geom.items:
+        if isinstance(item, primitives.Polyline):
+            codes.append('P')
+            counts.append(len(item.points))
+            for p in item.points:
+                values.extend(p)
+        elif isinstance(item, primitives.Arc):
+            codes.append('A')
+            values.extend(item.center)
+            values.extend((item.radius, item.start_angle, item.end_angle))
+        elif isinstance(item, primitives.Circle):
+            codes.append('C')
+            values.extend(item.center)
+            values.append(item.radius)
+        elif isinstance(item, primitives.Rect):
+            codes.append('R')
+            values.extend(item.origin)
+            values.extend(item.dimensions)
+        else:
+            raise Exception('Cannot serialize {0} objects'.format(type(item).__name__))
+
+    data = (_HEADER.pack(len(codes), len(counts), len(values)) +
+            ''.join(codes) +
+            numpy.asarray(counts, dtype='<u4').tostring() +
+            numpy.asarray(values, dtype='<f8').tostring())
+
+    return zlib.compress(data, level)
+
+def loads(data):
+    """
+    Deserialize a geometry.
+
+    :param data: The serialized geometry (see ``dumps``).
+
+    :returns: A geometry.primitives.Geometry object.
+
+    """
+
+    data = zlib.decompress(data)
+
+    num_items, num_counts, num_values = _HEADER.unpack_from(data)
+    pos = _HEADER.size
+
+    codes = data[pos:pos + num_items]
+    pos += num_items
+
+    counts = numpy.frombuffer(data, dtype='<u4', count=num_counts, offset=pos).tolist()
+    pos += 4 * num_counts
+
+    values = numpy.frombuffer(data, dtype='<f8', count=num_values, offset=pos).tolist()
+
+    items = []
+    i = 0
+    j = 0
+
+    for code in codes:
+        if code == 'P':
+            n = 2 * counts[j]
+            j += 1
+            items.append(primitives.Polyline(zip(values[i:i + n:2], values[i + 1:i + n:2])))
+            i += n
+            continue
+
+        v = values[i:i + _VALUE_COUNTS[code]]
+        i += len(v)
+
+        if code == 'A':
+            items.append(primitives.Arc(v[0:2], v[2], v[3], v[4]))
+        elif code == 'C':
+            items.append(primitives.Circle(v[0:2], v[2]))
+        else:
+            items.append(primitives.Rect(v[0:2], v[2:4]))
+
+    return primitives.Geometry(items)
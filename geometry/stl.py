@@ -0,0 +1,352 @@
+"""
+Contains functions for extruding geometry into a solid and writing it as a
+binary STL file.
+
+The profile may be twisted as it is extruded (e.g. to produce a helical
+gear); the extrusion is divided into layers, each of which is rotated about
+the origin (the center of a gear) by an equal share of the total twist.
+
+The caps are triangulated by ear clipping, so the profile may be any
+outline which does not cross itself, with at most one hole (such as a gear
+and its bore). Triangles are generated as NumPy arrays and written to the
+file a group of layers at a time, so the whole mesh is never held in memory.
+
+"""
+
+import math
+import struct
+
+import numpy
+
+import mass_properties
+
+# The maximum angle spanned by a single segment when approximating an arc
+DEFAULT_ARC_RESOLUTION = math.pi / 90
+
+# The maximum amount of twist in a single layer
+DEFAULT_LAYER_TWIST = math.pi / 180
+
+# The approximate number of triangles to generate before writing them to the file
+_TRIANGLES_PER_CHUNK = 100000
+
+# The layout of a single triangle within a binary STL file
+STL_TRIANGLE = numpy.dtype([('normal', '<f4', (3,)),
+                            ('vertices', '<f4', (3, 3)),
+                            ('attributes', '<u2')])
+
+def get_contour_ring(contour, arc_resolution=DEFAULT_ARC_RESOLUTION):
+    """
+    Approximate a closed contour by a ring of points.
+
+    :param contour: A list of edges (see geometry.mass_properties).
+    :param arc_resolution: The maximum angle spanned by a segment of an arc.
+
+    :returns: An (n, 2) array of points; the first point is not repeated at the end.
+
+    """
+
+    parts = []
+
+    for edge in contour:
+        if edge[0] == 'polyline':
+            parts.append(numpy.asarray(edge[1], dtype=float)[:-1])
+        else:
+            cx, cy, r, t0, t1 = edge[1:]
+            steps = max(1, int(math.ceil(abs(t1 - t0) / arc_resolution)))
+            t = numpy.linspace(t0, t1, steps + 1)[:-1]
+            parts.append(numpy.column_stack((cx + r * numpy.cos(t), cy + r * numpy.sin(t))))
+
+    return numpy.concatenate(parts)
+
+def get_ring_area(ring):
+    """
+    Get the signed area of a ring of points (positive if counterclockwise).
+
+    """
+
+    x = ring[:, 0]
+    y = ring[:, 1]
+
+    return (numpy.dot(x, numpy.roll(y, -1)) - numpy.dot(numpy.roll(x, -1), y)) / 2
+
+def _get_crossings(a, b, starts, ends):
+    """
+    Check whether a segment crosses any of a set of segments (touching at an end does not count).
+
+    """
+
+    d = b - a
+    e = ends - starts
+
+    d1 = d[0] * (starts[:, 1] - a[1]) - d[1] * (starts[:, 0] - a[0])
+    d2 = d[0] * (ends[:, 1] - a[1]) - d[1] * (ends[:, 0] - a[0])
+    d3 = e[:, 0] * (a[1] - starts[:, 1]) - e[:, 1] * (a[0] - starts[:, 0])
+    d4 = e[:, 0] * (b[1] - starts[:, 1]) - e[:, 1] * (b[0] - starts[:, 0])
+
+    return ((d1 * d2 < 0) & (d3 * d4 < 0)).any()
+
+def _get_bridge(outer, hole):
+    """
+    Find a pair of vertices, one on the outer ring and one on the hole, which can be joined by a segment inside the region.
+
+    The vertex of the hole furthest in the x direction is joined to the
+    nearest vertex of the outer ring which it can see (the segment between
+    them crosses no edge of either ring).
+
+    :returns: A tuple in the form ``(i, j)``, the indices of the vertices of the outer ring and the hole.
+
+    """
+
+    j = int(numpy.argmax(hole[:, 0]))
+    h = hole[j]
+
+    starts = numpy.concatenate((outer, hole))
+    ends = numpy.concatenate((numpy.roll(outer, -1, axis=0), numpy.roll(hole, -1, axis=0)))
+
+    distances = numpy.hypot(outer[:, 0] - h[0], outer[:, 1] - h[1])
+
+    for i in numpy.argsort(distances, kind='mergesort'):
+        if not _get_crossings(h, outer[i], starts, ends):
+            return int(i), j
+
+    raise Exception('The hole cannot be joined to the outline, so it cannot be extruded.')
+
+def get_cap_triangles(outer, hole=None):
+    """
+    Triangulate the region between a counterclockwise outer ring and an optional hole.
+
+    The outline may take any shape, as long as it does not cross itself.
+    A hole is first joined to the outer ring by a bridge (a pair of
+    coincident edges) between two vertices which can see each other,
+    making a single ring; the ring is then triangulated by ear clipping.
+    At each step, a convex vertex whose triangle with its neighbours
+    contains no other (reflex) vertex is removed.
+
+    :param outer: An (n, 2) array of points, ordered counterclockwise.
+    :param hole: An (m, 2) array of points (in either order), or None.
+
+    :returns: A tuple in the form ``(points, triangles)``, where ``triangles`` is a (k, 3) array of indices into ``points``, ordered counterclockwise.
+
+    """
+
+    n = len(outer)
+
+    if hole is None:
+        points = numpy.asarray(outer, dtype=float)
+        ring = numpy.arange(n)
+    else:
+        # The hole is traversed clockwise, so that the region stays on the left
+        if get_ring_area(hole) > 0:
+            hole = hole[::-1]
+
+        m = len(hole)
+        i, j = _get_bridge(outer, hole)
+
+        points = numpy.vstack((outer, hole))
+        ring = numpy.concatenate((numpy.arange(i + 1), n + numpy.roll(numpy.arange(m), -j), [n + j, i], numpy.arange(i + 1, n)))
+
+    count = len(ring)
+    vertices = points[ring]
+    xs = vertices[:, 0].tolist()
+    ys = vertices[:, 1].tolist()
+
+    prev_vertex = [(k - 1) % count for k in range(count)]
+    next_vertex = [(k + 1) % count for k in range(count)]
+
+    def get_cross(a, b, c):
+        return (xs[b] - xs[a]) * (ys[c] - ys[b]) - (ys[b] - ys[a]) * (xs[c] - xs[b])
+
+    # Only reflex vertices can lie inside the triangle of an ear. Clipping
+    # an ear can make its neighbours convex, but never reflex. The reflex
+    # vertices are sorted by x, so that only those within the extent of a
+    # triangle are tested.
+    reflex = numpy.array([get_cross(prev_vertex[k], k, next_vertex[k]) <= 0 for k in range(count)])
+    candidates = numpy.nonzero(reflex)[0]
+    candidates = candidates[numpy.argsort(vertices[candidates, 0], kind='mergesort')]
+    candidate_xs = vertices[candidates, 0]
+
+    def is_ear(k, strict):
+        a = prev_vertex[k]
+        c = next_vertex[k]
+        cross = get_cross(a, k, c)
+
+        if cross < 0 or (strict and cross == 0):
+            return False
+
+        ax, ay, bx, by, cx, cy = xs[a], ys[a], xs[k], ys[k], xs[c], ys[c]
+
+        lo = numpy.searchsorted(candidate_xs, min(ax, bx, cx), 'left')
+        hi = numpy.searchsorted(candidate_xs, max(ax, bx, cx), 'right')
+
+        if lo == hi:
+            return True
+
+        others = candidates[lo:hi]
+        others = others[reflex[others]]
+        x = vertices[others, 0]
+        y = vertices[others, 1]
+
+        inside = (((bx - ax) * (y - ay) - (by - ay) * (x - ax) >= 0) &
+                  ((cx - bx) * (y - by) - (cy - by) * (x - bx) >= 0) &
+                  ((ax - cx) * (y - cy) - (ay - cy) * (x - cx) >= 0))
+
+        # The vertices of the triangle (and their copies at a bridge) do not count
+        for px, py in ((ax, ay), (bx, by), (cx, cy)):
+            inside &= (x != px) | (y != py)
+
+        return not inside.any()
+
+    triangles = []
+
+    k = 0
+    stop = k
+    strict = True
+
+    while count > 3:
+        if is_ear(k, strict):
+            a = prev_vertex[k]
+            c = next_vertex[k]
+            triangles.append((ring[a], ring[k], ring[c]))
+
+            next_vertex[a] = c
+            prev_vertex[c] = a
+            reflex[k] = False
+            count -= 1
+
+            for v in (a, c):
+                if reflex[v] and get_cross(prev_vertex[v], v, next_vertex[v]) > 0:
+                    reflex[v] = False
+
+            # Continue from the vertex after the ear
+            k = c
+            stop = k
+            strict = True
+            continue
+
+        k = next_vertex[k]
+
+        if k == stop:
+            if not strict:
+                raise Exception('The outline crosses itself, so it cannot be extruded.')
+
+            # Every remaining vertex is reflex or blocked; allow vertices
+            # whose neighbours are collinear with them (e.g. the middle of a
+            # straight edge) to be removed as degenerate ears
+            strict = False
+
+    triangles.append((ring[prev_vertex[k]], ring[k], ring[next_vertex[k]]))
+
+    return points, numpy.array(triangles)
+
+def _get_normals(v0, v1, v2):
+    normals = numpy.cross(v1 - v0, v2 - v0)
+    lengths = numpy.sqrt(numpy.sum(normals * normals, axis=-1))
+    lengths[lengths == 0] = 1
+
+    return normals / lengths[..., None]
+
+def _write_triangles(f, v0, v1, v2):
+    data = numpy.zeros(len(v0), dtype=STL_TRIANGLE)
+    data['normal'] = _get_normals(v0, v1, v2)
+    data['vertices'][:, 0] = v0
+    data['vertices'][:, 1] = v1
+    data['vertices'][:, 2] = v2
+
+    f.write(data.tobytes())
+
+def _rotate(points, angle):
+    c = math.cos(angle)
+    s = math.sin(angle)
+
+    return numpy.column_stack((points[:, 0] * c - points[:, 1] * s, points[:, 0] * s + points[:, 1] * c))
+
+def write_stl(geom, file_name, height, twist=0, layers=None, arc_resolution=DEFAULT_ARC_RESOLUTION, tolerance=None):
+    """
+    Extrude a geometry and write it as a binary STL file.
+
+    The y-axis is inverted (as in the DXF output), so that the solid is
+    viewed the same way as the drawing.
+
+    :param geom: The geometry.primitives.Geometry object to extrude.
+    :param file_name: The name of the STL file to write.
+    :param height: The height of the extrusion (e.g. the face width of a gear).
+    :param twist: The angle, in radians, by which the top of the extrusion is rotated relative to the bottom.
+    :param layers: The number of layers (defaults to 1 without twist, or enough layers that each twists by at most ``DEFAULT_LAYER_TWIST``).
+    :param arc_resolution: The maximum angle spanned by a segment of an arc.
+    :param tolerance: The maximum distance between the end points of items which are joined into a contour.
+
+    """
+
+    contours = mass_properties.get_contours(geom, tolerance)
+    depths = mass_properties.get_contour_depths(contours)
+
+    outers = [c for c, d in zip(contours, depths) if d == 0]
+    holes = [c for c, d in zip(contours, depths) if d == 1]
+
+    if len(outers) != 1 or len(holes) > 1 or len(holes) + len(outers) != len(contours):
+        raise Exception('Only a single outline with at most one hole can be extruded.')
+
+    if layers == None:
+        layers = max(1, int(math.ceil(abs(twist) / DEFAULT_LAYER_TWIST)))
+
+    # Build the rings, with the outline counterclockwise and the hole clockwise
+    # so that the side walls face out of the solid
+    outer = get_contour_ring(outers[0], arc_resolution) * (1, -1)
+    if get_ring_area(outer) < 0:
+        outer = outer[::-1]
+
+    rings = [outer]
+
+    hole = None
+    if len(holes) > 0:
+        hole = get_contour_ring(holes[0], arc_resolution) * (1, -1)
+        if get_ring_area(hole) > 0:
+            hole = hole[::-1]
+        rings.append(hole)
+
+    cap_points, cap_triangles = get_cap_triangles(outer, hole)
+
+    # The points of every ring, and the index of the next point within the same ring
+    ring_points = numpy.concatenate(rings)
+    next_index = numpy.concatenate([numpy.roll(numpy.arange(len(r)), -1) + sum(len(q) for q in rings[:i])
+                                    for i, r in enumerate(rings)])
+
+    num_triangles = 2 * len(cap_triangles) + 2 * len(ring_points) * layers
+
+    f = open(file_name, 'wb')
+
+    try:
+        f.write(struct.pack('<80sI', 'Binary STL', num_triangles))
+
+        # The bottom cap (facing down) and top cap (facing up)
+        bottom = numpy.column_stack((cap_points, numpy.zeros(len(cap_points))))
+        top = numpy.column_stack((_rotate(cap_points, twist), numpy.full(len(cap_points), height)))
+
+        _write_triangles(f, bottom[cap_triangles[:, 0]], bottom[cap_triangles[:, 2]], bottom[cap_triangles[:, 1]])
+        _write_triangles(f, top[cap_triangles[:, 0]], top[cap_triangles[:, 1]], top[cap_triangles[:, 2]])
+
+        # The side walls, written a group of layers at a time
+        layers_per_chunk = max(1, _TRIANGLES_PER_CHUNK // (2 * len(ring_points)))
+
+        for start in range(0, layers, layers_per_chunk):
+            end = min(layers, start + layers_per_chunk)
+
+            # The points of each layer boundary within the chunk
+            levels = numpy.arange(start, end + 1)
+            angles = twist * levels / float(layers)
+            c = numpy.cos(angles)[:, None]
+            s = numpy.sin(angles)[:, None]
+
+            v = numpy.empty((len(levels), len(ring_points), 3))
+            v[:, :, 0] = ring_points[:, 0] * c - ring_points[:, 1] * s
+            v[:, :, 1] = ring_points[:, 0] * s + ring_points[:, 1] * c
+            v[:, :, 2] = (height * levels / float(layers))[:, None]
+
+            a = v[:-1].reshape(-1, 3)
+            b = v[:-1][:, next_index].reshape(-1, 3)
+            c = v[1:][:, next_index].reshape(-1, 3)
+            d = v[1:].reshape(-1, 3)
+
+            _write_triangles(f, numpy.concatenate((a, a)), numpy.concatenate((b, c)), numpy.concatenate((c, d)))
+    finally:
+        f.close()
@@ -1,19 +1,31 @@
 from lxml import etree
 import StringIO
+
+import compression
     
 SVG_TEMPLATE = '<?xml version="1.0" standalone="no"?><svg />'
+
+# The namespace of the attributes which refer to other elements (e.g. the ``href`` of a ``use`` element)
+XLINK_NAMESPACE = 'http://www.w3.org/1999/xlink'
+
+SVG_XLINK_TEMPLATE = '<?xml version="1.0" standalone="no"?><svg xmlns:xlink="{}" />'.format(XLINK_NAMESPACE)
+
+# The default number of decimal places used for coordinates in SVG output
+DEFAULT_PRECISION = 5
     
-def get_svg_tree(version='1.1', xmlns='http://www.w3.org/2000/svg'):
+def get_svg_tree(version='1.1', xmlns='http://www.w3.org/2000/svg', xlink=False):
     """
     Get a basic ElementTree object which represents an SVG. 
     
     :param version: The SVG version attribute. 
     :param xmlns: The SVG xmlns attribute.
+    :param xlink: True to declare the xlink namespace, so that attributes 
+        named ``'{%s}href' % XLINK_NAMESPACE`` are written as ``xlink:href``.
     
     :returns: An ElementTree object representing an SVG.
     """
     
-    f = StringIO.StringIO(SVG_TEMPLATE)
+    f = StringIO.StringIO(SVG_XLINK_TEMPLATE if xlink else SVG_TEMPLATE)
     tree = etree.parse(f)
     
     svg = tree.getroot()
@@ -34,10 +46,57 @@ def set_dimensions(root, size):
     root.attrib['width'] = str(size[0])
     root.attrib['height'] = str(size[1])
     
+def get_style_attributes(style, scale_factor=1):
+    """
+    Get the SVG presentation attributes of a style.
+    
+    :param style: The style, in the form ``{'stroke': ..., 'stroke-width': ..., 'fill': ...}`` (each key is optional).
+    :param scale_factor: The amount by which the geometry (and so the stroke width) is scaled.
+    
+    :returns: A list of attributes, each in the form ``(name, value)``.
+    """
+    
+    attributes = []
+    
+    if style.has_key('stroke'):
+        attributes.append(('stroke', style['stroke']))
+    
+    if style.has_key('stroke-width'):
+        attributes.append(('stroke-width', str(style['stroke-width'] * scale_factor)))
+        
+    if style.has_key('fill'):
+        attributes.append(('fill', style['fill']))
+        
+    return attributes
+
+def append_style_group(root, style, scale_factor=1):
+    """
+    Append a ``g`` element which carries the presentation attributes of a style.
+    
+    The elements within the group inherit its attributes, so a style which is
+    shared by many elements is written (and formatted) once, and the elements
+    are appended without a style.
+    
+    :param root: The element to which to append the group.
+    :param style: The style (see ``get_style_attributes``).
+    :param scale_factor: The amount by which the geometry is scaled.
+    
+    :returns: The ``g`` element.
+    """
+    
+    n = etree.SubElement(root, 'g')
+    
+    for name, value in get_style_attributes(style, scale_factor):
+        n.attrib[name] = value
+        
+    return n
+
 def write_svg(tree, file_name):    
     """
     Write an ElementTree SVG element to the specified file. 
     
+    The file is compressed if its name ends with ``.svgz`` or ``.gz``.
+    
     :param tree: The ElementTree object to write. 
     :param file_name: The name of the file to write. 
     
@@ -45,6 +104,204 @@ def write_svg(tree, file_name):
 
     xml_str = etree.tostring(tree, xml_declaration=True, pretty_print=True)
         
-    f = open(file_name, 'w')
+    f = compression.open_output(file_name)
     f.write(xml_str);
-    f.close()
\ No newline at end of file
+    f.close()
+
+def format_number(value, precision=DEFAULT_PRECISION):
+    """
+    Format a number as compactly as possible for use within an SVG.
+    
+    The value is rounded to ``precision`` decimal places; trailing zeros, a 
+    trailing decimal point and leading zeros are removed (``0.50`` becomes 
+    ``.5``, ``-0.0`` becomes ``0``).
+    
+    :param value: The number to format.
+    :param precision: The number of decimal places to keep.
+    
+    :returns: The formatted number.
+    
+    """
+    
+    s = '%.*f' % (precision, value)
+    
+    if '.' in s:
+        s = s.rstrip('0').rstrip('.')
+    
+    if s.startswith('0.'):
+        s = s[1:]
+    elif s.startswith('-0.'):
+        s = '-' + s[2:]
+    elif s == '-0':
+        s = '0'
+        
+    return s
+
+def _needs_separator(prev, token):
+    """
+    Determine whether a separator is required between two numeric tokens.
+    
+    A separator can be omitted when the second token starts with a minus sign,
+    or when it starts with a decimal point and the first token already contains
+    one.
+    
+    """
+    
+    if token[0] == '-':
+        return False
+    
+    if token[0] == '.' and '.' in prev:
+        return False
+    
+    return True
+
+class PathData:
+    """
+    Builds the value of the ``d`` attribute of an SVG ``path`` element.
+    
+    Each command is written using either its absolute or relative form,
+    whichever is shorter, and the command letter is omitted when it repeats
+    the previous command. Coordinates are rounded to ``precision`` decimal
+    places; relative offsets are computed from the rounded position so that
+    rounding errors do not accumulate along the path.
+    
+    The path is built as a list of string fragments, so the time taken to 
+    build it is linear in the number of commands.
+    
+    """
+    
+    def __init__(self, precision=DEFAULT_PRECISION):
+        self.precision = precision
+        
+        self._parts = []
+        self._command = None
+        self._last_token = None
+        
+        # The current (rounded) position
+        self._x = 0
+        self._y = 0
+        
+    def _format(self, value):
+        return format_number(value, self.precision)
+    
+    def _encode(self, command, tokens):
+        """
+        Get the list of fragments which represent a command and its arguments.
+        
+        """
+        
+        parts = []
+        
+        if command == self._command:
+            # The command letter may be omitted
+            if _needs_separator(self._last_token, tokens[0]):
+                parts.append(' ')
+        else:
+            parts.append(command)
+        
+        parts.append(tokens[0])
+        
+        for i in range(1, len(tokens)):
+            if _needs_separator(tokens[i-1], tokens[i]):
+                parts.append(' ')
+            parts.append(tokens[i])
+            
+        return parts
+    
+    def _append(self, command, abs_tokens, rel_tokens, x, y):
+        """
+        Append the shorter of the absolute and relative forms of a command.
+        
+        :param command: The (upper case) command letter.
+        :param abs_tokens: The formatted arguments of the absolute form.
+        :param rel_tokens: The formatted arguments of the relative form.
+        :param x: The rounded x-coordinate of the end point of the command.
+        :param y: The rounded y-coordinate of the end point of the command.
+        
+        """
+        
+        abs_parts = self._encode(command, abs_tokens)
+        
+        if rel_tokens is not None:
+            rel_parts = self._encode(command.lower(), rel_tokens)
+            
+            if len(''.join(rel_parts)) < len(''.join(abs_parts)):
+                command = command.lower()
+                abs_parts = rel_parts
+                abs_tokens = rel_tokens
+        
+        self._parts.extend(abs_parts)
+        self._last_token = abs_tokens[-1]
+        
+        # Subsequent coordinate pairs following a moveto are treated as 
+        # implicit lineto commands
+        if command == 'M':
+            command = 'L'
+        elif command == 'm':
+            command = 'l'
+        
+        self._command = command
+        self._x = x
+        self._y = y
+    
+    def move_to(self, x, y):
+        """
+        Move to the specified point without drawing.
+        
+        """
+        
+        x = round(x, self.precision)
+        y = round(y, self.precision)
+        
+        if self._command is None:
+            # The first command in a path is always absolute
+            rel_tokens = None
+        else:
+            rel_tokens = [self._format(x - self._x), self._format(y - self._y)]
+            
+        self._append('M', [self._format(x), self._format(y)], rel_tokens, x, y)
+        
+    def line_to(self, x, y):
+        """
+        Draw a straight line from the current point to the specified point.
+        
+        """
+        
+        x = round(x, self.precision)
+        y = round(y, self.precision)
+        
+        self._append('L',
+                     [self._format(x), self._format(y)],
+                     [self._format(x - self._x), self._format(y - self._y)],
+                     x, y)
+        
+    def arc_to(self, rx, ry, rotation, large_arc, sweep, x, y):
+        """
+        Draw an elliptical arc from the current point to the specified point.
+        
+        :param rx: The x-radius of the ellipse.
+        :param ry: The y-radius of the ellipse.
+        :param rotation: The rotation of the ellipse's x-axis, in degrees.
+        :param large_arc: True if the arc spans more than 180 degrees.
+        :param sweep: True if the arc is drawn in the positive-angle direction.
+        :param x: The x-coordinate of the end point.
+        :param y: The y-coordinate of the end point.
+        
+        """
+        
+        x = round(x, self.precision)
+        y = round(y, self.precision)
+        
+        prefix = [self._format(rx), 
+                  self._format(ry), 
+                  self._format(rotation), 
+                  '1' if large_arc else '0', 
+                  '1' if sweep else '0']
+        
+        self._append('A',
+                     prefix + [self._format(x), self._format(y)],
+                     prefix + [self._format(x - self._x), self._format(y - self._y)],
+                     x, y)
+        
+    def __str__(self):
+        return ''.join(self._parts)
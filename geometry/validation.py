@@ -0,0 +1,310 @@
+"""
+Contains functions for checking that geometry is valid before it is cut.
+
+The following problems are reported:
+
+* Intersections, where two edges cross each other.
+* Overlaps, where two edges run along each other.
+* Gaps, where the end of an item is not joined to any other item.
+
+Arcs are approximated by short chords. Intersections are found by sweeping
+a line across the segments in order of their minimum x-coordinate: each
+segment is only tested against the segments which are active (whose
+x-extents overlap it) and whose y-extents also overlap it, so well-formed
+geometry is checked in close to O(n log n) time rather than testing every
+pair of segments. The tests for each batch of candidate pairs are
+performed as NumPy array operations.
+
+Each problem is reported as a tuple in the form ``(kind, (x, y), items, size)``,
+where ``kind`` is one of ``INTERSECTION``, ``OVERLAP`` or ``GAP``, ``(x, y)``
+is the location of the problem, ``items`` is a tuple of the indices of the
+items involved and ``size`` is the length of an overlap or the width of a
+gap (0 for an intersection).
+
+"""
+
+import math
+
+import numpy
+
+import mass_properties
+
+INTERSECTION = 'intersection'
+OVERLAP = 'overlap'
+GAP = 'gap'
+
+# The maximum angle spanned by a chord when approximating an arc
+DEFAULT_ARC_RESOLUTION = math.pi / 180
+
+# The maximum number of candidate pairs to test at once
+_PAIRS_PER_CHUNK = 1000000
+
+def get_segments(geom, arc_resolution=DEFAULT_ARC_RESOLUTION):
+    """
+    Get the line segments which make up a geometry.
+
+    :param geom: The geometry.primitives.Geometry object.
+    :param arc_resolution: The maximum angle spanned by a chord of an arc.
+
+    :returns: A tuple in the form ``(segments, items)``, where ``segments``
+        is an (n, 4) array of ``(x0, y0, x1, y1)`` and ``items`` is an array
+        of the index of the item to which each segment belongs.
+
+    """
+
+    segments = []
+    items = []
+
+    for i in range(len(geom.items)):
+        for edge in geom.items[i].get_boundary():
+            if edge[0] == 'polyline':
+                points = numpy.asarray(edge[1], dtype=float)
+            else:
+                cx, cy, r, t0, t1 = edge[1:]
+                steps = max(1, int(math.ceil(abs(t1 - t0) / arc_resolution)))
+                t = numpy.linspace(t0, t1, steps + 1)
+                points = numpy.column_stack((cx + r * numpy.cos(t), cy + r * numpy.sin(t)))
+
+            if len(points) < 2:
+                continue
+
+            segments.append(numpy.hstack((points[:-1], points[1:])))
+            items.append(numpy.full(len(points) - 1, i, dtype=int))
+
+    if len(segments) == 0:
+        return numpy.zeros((0, 4)), numpy.zeros(0, dtype=int)
+
+    return numpy.concatenate(segments), numpy.concatenate(items)
+
+def _cross(ax, ay, bx, by):
+    return ax * by - ay * bx
+
+def _test_pairs(segments, i, j, tolerance):
+    """
+    Test pairs of segments for intersections and overlaps.
+
+    Contact which only occurs at an end point of both segments (i.e. where
+    consecutive segments are joined) is not reported.
+
+    :returns: A tuple in the form ``(kinds, points, sizes, i, j)`` for the pairs which intersect or overlap.
+
+    """
+
+    px, py = segments[i, 0], segments[i, 1]
+    rx, ry = segments[i, 2] - px, segments[i, 3] - py
+    qx, qy = segments[j, 0], segments[j, 1]
+    sx, sy = segments[j, 2] - qx, segments[j, 3] - qy
+
+    r_length = numpy.hypot(rx, ry)
+    s_length = numpy.hypot(sx, sy)
+
+    denom = _cross(rx, ry, sx, sy)
+    qpx, qpy = qx - px, qy - py
+
+    # Segments are parallel if the sine of the angle between them is negligible
+    parallel = numpy.abs(denom) <= 1e-12 * r_length * s_length
+
+    with numpy.errstate(divide='ignore', invalid='ignore'):
+        t = _cross(qpx, qpy, sx, sy) / denom
+        u = _cross(qpx, qpy, rx, ry) / denom
+
+        # The tolerance, as a fraction of the length of each segment
+        t_tol = tolerance / r_length
+        u_tol = tolerance / s_length
+
+        # Crossing segments, excluding contact at the ends of both segments
+        crosses = ~parallel & (t >= -t_tol) & (t <= 1 + t_tol) & (u >= -u_tol) & (u <= 1 + u_tol)
+        at_end_of_i = (t <= t_tol) | (t >= 1 - t_tol)
+        at_end_of_j = (u <= u_tol) | (u >= 1 - u_tol)
+        crosses &= ~(at_end_of_i & at_end_of_j)
+
+        # Collinear segments whose projections overlap by more than the tolerance
+        distance = numpy.abs(_cross(qpx, qpy, rx, ry)) / r_length
+        t0 = (qpx * rx + qpy * ry) / (r_length * r_length)
+        t1 = t0 + (sx * rx + sy * ry) / (r_length * r_length)
+        overlap_length = (numpy.minimum(numpy.maximum(t0, t1), 1) - numpy.maximum(numpy.minimum(t0, t1), 0)) * r_length
+        overlaps = parallel & (distance <= tolerance) & (overlap_length > tolerance)
+
+    found = crosses | overlaps
+
+    t = numpy.where(crosses, t, numpy.clip(numpy.maximum(numpy.minimum(t0, t1), 0), 0, 1))[found]
+    points = numpy.column_stack((px[found] + t * rx[found], py[found] + t * ry[found]))
+    kinds = numpy.where(crosses[found], INTERSECTION, OVERLAP)
+    sizes = numpy.where(crosses[found], 0, overlap_length[found])
+
+    return kinds, points, sizes, i[found], j[found]
+
+def find_intersections(segments, tolerance):
+    """
+    Find the pairs of segments which intersect or overlap.
+
+    :param segments: An (n, 4) array of ``(x0, y0, x1, y1)``.
+    :param tolerance: The distance below which contact at the ends of segments is ignored.
+
+    :returns: A list of tuples in the form ``(kind, (x, y), size, i, j)``, where ``i`` and ``j`` are the indices of the segments.
+
+    """
+
+    n = len(segments)
+
+    if n < 2:
+        return []
+
+    min_x = numpy.minimum(segments[:, 0], segments[:, 2])
+    max_x = numpy.maximum(segments[:, 0], segments[:, 2])
+    min_y = numpy.minimum(segments[:, 1], segments[:, 3])
+    max_y = numpy.maximum(segments[:, 1], segments[:, 3])
+
+    # Sweep from left to right. The segments which are active when segment
+    # k is reached are those which start before it ends.
+    order = numpy.argsort(min_x, kind='mergesort')
+    sorted_min_x = min_x[order]
+    active_end = numpy.searchsorted(sorted_min_x, max_x[order] + tolerance, side='right')
+    counts = numpy.maximum(active_end - numpy.arange(n) - 1, 0)
+
+    results = []
+    start = 0
+
+    while start < n:
+        # Take enough segments to fill a chunk of candidate pairs
+        totals = numpy.cumsum(counts[start:])
+        end = start + max(1, int(numpy.searchsorted(totals, _PAIRS_PER_CHUNK, side='right')))
+        end = min(end, n)
+
+        chunk_counts = counts[start:end]
+        total = int(numpy.sum(chunk_counts))
+
+        if total > 0:
+            a = numpy.repeat(numpy.arange(start, end), chunk_counts)
+            offsets = numpy.arange(total) - numpy.repeat(numpy.cumsum(chunk_counts) - chunk_counts, chunk_counts)
+            b = a + 1 + offsets
+
+            i = order[a]
+            j = order[b]
+
+            # Prune the pairs whose y-extents do not overlap
+            keep = (min_y[j] <= max_y[i] + tolerance) & (min_y[i] <= max_y[j] + tolerance)
+            i = i[keep]
+            j = j[keep]
+
+            kinds, points, sizes, i, j = _test_pairs(segments, i, j, tolerance)
+
+            for k in range(len(kinds)):
+                results.append((str(kinds[k]), (float(points[k, 0]), float(points[k, 1])), float(sizes[k]), int(i[k]), int(j[k])))
+
+        start = end
+
+    return results
+
+def find_gaps(geom, tolerance):
+    """
+    Find the ends of items which are not joined to any other item.
+
+    :param geom: The geometry.primitives.Geometry object.
+    :param tolerance: The maximum distance between joined end points.
+
+    :returns: A list of tuples in the form ``(GAP, (x, y), (i, j), distance)``,
+        where ``i`` is the index of the item with the unjoined end, ``j`` is
+        the index of the item with the nearest end point and ``distance`` is
+        the width of the gap (``j`` and ``distance`` are None if there are no
+        other items).
+
+    """
+
+    points = []
+    owners = []
+
+    for i in range(len(geom.items)):
+        edges = geom.items[i].get_boundary()
+
+        if len(edges) == 0:
+            continue
+
+        start = mass_properties.get_edge_start(edges[0])
+        end = mass_properties.get_edge_end(edges[-1])
+
+        # Closed items (such as circles) have no free ends
+        if math.hypot(start[0] - end[0], start[1] - end[1]) <= tolerance:
+            continue
+
+        points.extend((start, end))
+        owners.extend((i, i))
+
+    if len(points) == 0:
+        return []
+
+    points = numpy.array(points)
+    owners = numpy.array(owners)
+
+    # Find the end points which are joined to another end point by sorting
+    # them along x and comparing each with its neighbours within the tolerance
+    order = numpy.argsort(points[:, 0], kind='mergesort')
+    sorted_x = points[order, 0]
+    window_end = numpy.searchsorted(sorted_x, sorted_x + tolerance, side='right')
+
+    joined = numpy.zeros(len(points), dtype=bool)
+
+    for a in range(len(order)):
+        for b in range(a + 1, window_end[a]):
+            p, q = order[a], order[b]
+
+            if abs(points[p, 1] - points[q, 1]) <= tolerance:
+                joined[p] = True
+                joined[q] = True
+
+    gaps = []
+
+    for p in numpy.nonzero(~joined)[0]:
+        # The nearest end point of another item
+        distances = numpy.hypot(points[:, 0] - points[p, 0], points[:, 1] - points[p, 1])
+        distances[p] = numpy.inf
+        distances[(owners == owners[p]) & (numpy.arange(len(points)) != p)] = numpy.inf
+
+        q = int(numpy.argmin(distances))
+
+        if numpy.isinf(distances[q]):
+            gaps.append((GAP, (float(points[p, 0]), float(points[p, 1])), (int(owners[p]), None), None))
+        else:
+            gaps.append((GAP, (float(points[p, 0]), float(points[p, 1])), (int(owners[p]), int(owners[q])), float(distances[q])))
+
+    return gaps
+
+def validate(geom, tolerance=None, arc_resolution=DEFAULT_ARC_RESOLUTION):
+    """
+    Check a geometry for intersections, overlaps and gaps.
+
+    :param geom: The geometry.primitives.Geometry object.
+    :param tolerance: The distance below which problems are ignored (defaults to a small fraction of the size of the geometry).
+    :param arc_resolution: The maximum angle spanned by a chord of an arc.
+
+    :returns: A list of problems, each in the form ``(kind, (x, y), items, size)``.
+
+    """
+
+    pieces = [item.get_boundary() for item in geom.items]
+    pieces = [p for p in pieces if len(p) > 0]
+
+    if len(pieces) == 0:
+        return []
+
+    if tolerance == None:
+        tolerance = mass_properties.get_default_tolerance(pieces)
+
+    segments, segment_items = get_segments(geom, arc_resolution)
+
+    problems = []
+    reported = set()
+
+    for kind, point, size, i, j in find_intersections(segments, tolerance):
+        items = (int(segment_items[i]), int(segment_items[j]))
+
+        # Report each problem once for each pair of items
+        key = (kind, min(items), max(items))
+
+        if key not in reported:
+            reported.add(key)
+            problems.append((kind, point, items, size))
+
+    problems.extend(find_gaps(geom, tolerance))
+
+    return problems
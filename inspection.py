@@ -0,0 +1,295 @@
+"""
+Contains functionality for calculating the inspection dimensions of gears.
+
+``get_dimensions`` calculates the span measurement (base tangent length),
+chordal tooth thickness and measurement over pins of external gears from
+the same parameters as gear.Gear, including the kerf by which the profile
+is offset. Every parameter may be an array (the arrays are broadcast
+together), and the results are returned as a NumPy structured array with a
+row for each gear.
+
+``get_inspection_sheet`` calculates the dimensions of a list of gears and
+cross-checks them against the geometry which is generated for each gear:
+
+    sheet = inspection.get_inspection_sheet([gear.Gear(48, n, 20) for n in range(12, 61)], kerf=0.001)
+
+    for row in sheet:
+        print row['teeth'], row['span'], row['measured_span'], row['over_pins'], row['measured_over_pins']
+
+"""
+
+import math
+
+import numpy
+
+from geometry import diff, primitives
+import gear
+
+# The fields of the table returned by get_dimensions
+DIMENSION_FIELDS = [('pitch', float),
+                    ('teeth', float),
+                    ('pressure_angle', float),
+                    ('addendum_factor', float),
+                    ('profile_shift', float),
+                    ('kerf', float),
+                    ('span_teeth', float),
+                    ('span', float),
+                    ('chordal_thickness', float),
+                    ('chordal_addendum', float),
+                    ('pin_diameter', float),
+                    ('over_pins', float)]
+
+# The fields which get_inspection_sheet adds to the table
+MEASURED_FIELDS = [('measured_span', float),
+                   ('measured_chordal_thickness', float),
+                   ('measured_over_pins', float)]
+
+def get_dimensions(pitch, teeth, pressure_angle,
+                   addendum_factor = gear.Gear.DEFAULT_ADDENDUM,
+                   profile_shift = 0, kerf = 0, span_teeth = None, pin_diameter = None):
+    """
+    Calculate the inspection dimensions of external gears.
+
+    The table contains the parameters of each gear and the following values:
+
+    * ``span_teeth`` and ``span``: the number of teeth spanned by the span
+      measurement, and the distance between parallel anvils which touch the
+      outer flanks of those teeth. By default, the number of teeth is chosen
+      so that the anvils touch the flanks near the middle of the involute.
+    * ``chordal_thickness`` and ``chordal_addendum``: the length of the chord
+      across a tooth at the pitch circle, and the height of the tip of the
+      tooth above the chord (at which a gear tooth caliper is set).
+    * ``pin_diameter`` and ``over_pins``: the diameter of the pins placed in
+      opposite spaces (or, for odd numbers of teeth, in the spaces which are
+      nearest to opposite), and the distance over them. By default, the
+      diameter of the pins is that for which they touch the flanks at the
+      pitch circle.
+
+    The kerf offsets each involute along its normal, which turns it about
+    the center of the gear by ``kerf / base radius``, so the dimensions are
+    those of the geometry returned by gear.Gear.get_geometry with the kerf.
+
+    :param pitch: The pitch.
+    :param teeth: The number of teeth.
+    :param pressure_angle: The pressure angle, in degrees.
+    :param addendum_factor: The addendum factor.
+    :param profile_shift: The profile shift coefficient.
+    :param kerf: The amount by which the profile is offset.
+    :param span_teeth: The number of teeth spanned by the span measurement (calculated if None).
+    :param pin_diameter: The diameter of the pins (calculated if None).
+
+    :returns: A NumPy structured array with the fields in ``DIMENSION_FIELDS``,
+        with the shape of the broadcast parameters.
+
+    """
+
+    params = numpy.broadcast_arrays(*[numpy.asarray(v, dtype=float) for v in
+                                      (pitch, teeth, pressure_angle, addendum_factor, profile_shift, kerf,
+                                       numpy.nan if span_teeth is None else span_teeth,
+                                       numpy.nan if pin_diameter is None else pin_diameter)])
+
+    table = numpy.empty(params[0].shape, dtype=DIMENSION_FIELDS)
+
+    for name, values in zip(('pitch', 'teeth', 'pressure_angle', 'addendum_factor', 'profile_shift', 'kerf'), params):
+        table[name] = values
+
+    pitch, teeth, pressure_angle, addendum_factor, profile_shift, kerf, span_teeth, pin_diameter = params
+
+    alpha = pressure_angle * math.pi / 180
+
+    pitch_radius = teeth / pitch / 2
+    base_radius = pitch_radius * numpy.cos(alpha)
+    outside_radius = pitch_radius + (addendum_factor + profile_shift) / pitch
+
+    # Half of the angle subtended by a tooth at the pitch circle, before and
+    # after it is offset by the kerf (see gear.Gear._get_flank_rotation)
+    nominal_thickness = (math.pi / 2 + 2 * profile_shift * numpy.tan(alpha)) / teeth
+    thickness = nominal_thickness + kerf / base_radius
+
+    # The span measurement. The anvils touch the involutes where they are
+    # tangent to the base circle; by default, at the middle of the addendum.
+    if numpy.any(numpy.isnan(span_teeth)):
+        contact_angle = numpy.arccos(base_radius / (pitch_radius + profile_shift / pitch))
+        default_span = numpy.floor(teeth / math.pi * (numpy.tan(contact_angle) - gear.involute(alpha) -
+                                                      2 * profile_shift * numpy.tan(alpha) / teeth) + 1)
+        span_teeth = numpy.where(numpy.isnan(span_teeth), numpy.clip(default_span, 1, teeth - 1), span_teeth)
+
+    base_thickness = 2 * base_radius * (thickness + gear.involute(alpha))
+
+    table['span_teeth'] = span_teeth
+    table['span'] = (span_teeth - 1) * 2 * math.pi * base_radius / teeth + base_thickness
+
+    # The chordal thickness and addendum at the pitch circle
+    table['chordal_thickness'] = 2 * pitch_radius * numpy.sin(thickness)
+    table['chordal_addendum'] = outside_radius + kerf - pitch_radius * numpy.cos(thickness)
+
+    # The pins which touch the flanks at the pitch circle: the normal at the
+    # pitch point passes through the center of the pin and is tangent to the
+    # base circle
+    pin_diameter = numpy.where(numpy.isnan(pin_diameter),
+                               2 * base_radius * (numpy.tan(alpha + math.pi / teeth - thickness) - numpy.tan(alpha)),
+                               pin_diameter)
+
+    # The pressure angle at the centers of the pins, and their distance from the center
+    pin_angle = gear.inverse_involute(thickness + gear.involute(alpha) + pin_diameter / (2 * base_radius) - math.pi / teeth)
+    pin_radius = base_radius / numpy.cos(pin_angle)
+
+    table['pin_diameter'] = pin_diameter
+    table['over_pins'] = numpy.where(teeth % 2 == 0, 2 * pin_radius, 2 * pin_radius * numpy.cos(math.pi / (2 * teeth))) + pin_diameter
+
+    return table
+
+def measure(geom, row, form_diameter = None):
+    """
+    Measure the inspection dimensions of the geometry of a gear.
+
+    The span is the largest distance between the projections of the
+    involute parts of the flanks of the spanned teeth (outside the form
+    diameter, offset by the kerf) onto the tangent to the base circle
+    between them.
+    The chordal thickness is the chord between the points at which the
+    flanks of the first tooth cross the pitch circle. The measurement over
+    pins places the pins at their nominal centers, finds the nearest point of
+    the geometry to each, and moves each pin radially by the amount which
+    makes it touch the geometry.
+
+    :param geom: The geometry.primitives.Geometry object of the gear (with the kerf of the row).
+    :param row: A row of the table returned by ``get_dimensions``.
+    :param form_diameter: The diameter at which the involute part of the 
+        flanks starts, before the kerf (see gear.Gear.get_form_diameter), or
+        None for the base diameter.
+
+    :returns: A tuple in the form ``(span, chordal_thickness, over_pins)``.
+
+    """
+
+    teeth = int(row['teeth'])
+    pitch_radius = row['teeth'] / row['pitch'] / 2
+    base_radius = pitch_radius * math.cos(row['pressure_angle'] * math.pi / 180)
+
+    # The polylines of the geometry are the flanks of the teeth
+    flanks = [numpy.asarray(item.points, dtype=float) for item in geom.iter_items() if isinstance(item, primitives.Polyline)]
+
+    starts = numpy.concatenate([p[:-1] for p in flanks])
+    ends = numpy.concatenate([p[1:] for p in flanks])
+    vertices = numpy.concatenate(flanks)
+
+    # The first tooth is centered at pi / teeth, between the spaces at 0 and 2 pi / teeth
+    angles = numpy.arctan2(vertices[:, 1], vertices[:, 0]) % (2 * math.pi)
+
+    # The span
+    span_teeth = int(row['span_teeth'])
+    middle = span_teeth * math.pi / teeth
+    direction = numpy.array([-math.sin(middle), math.cos(middle)])
+
+    # The anvils touch the involutes, so the points inside the form diameter
+    # (which project beyond the anvils when the teeth are undercut, or on 
+    # the fillets of a hobbed gear) are ignored. The kerf rotates the 
+    # involute, so it moves the start of the involute along it by the kerf.
+    if form_diameter == None:
+        form_diameter = 2 * base_radius
+
+    form_roll = math.sqrt(max((form_diameter / 2 / base_radius) ** 2 - 1, 0)) + row['kerf'] / base_radius
+    form_radius = base_radius * math.sqrt(1 + max(form_roll, 0) ** 2)
+
+    outside = numpy.hypot(vertices[:, 0], vertices[:, 1]) >= form_radius
+
+    projections = vertices[(angles < 2 * middle) & outside].dot(direction)
+    span = projections.max() - projections.min()
+
+    # The chordal thickness
+    d = ends - starts
+    qa = (d * d).sum(axis=1)
+    qb = 2 * (starts * d).sum(axis=1)
+    qc = (starts * starts).sum(axis=1) - pitch_radius ** 2
+
+    disc = qb * qb - 4 * qa * qc
+    crossings = []
+
+    for sign in (-1, 1):
+        t = (-qb + sign * numpy.sqrt(numpy.maximum(disc, 0))) / (2 * qa)
+        valid = (disc >= 0) & (t >= 0) & (t <= 1)
+
+        p = starts[valid] + t[valid][:, None] * d[valid]
+        crossings.extend(numpy.arctan2(p[:, 1], p[:, 0]) % (2 * math.pi))
+
+    crossings = numpy.array(crossings)
+    crossings = crossings[crossings < 2 * math.pi / teeth]
+
+    chordal_thickness = 2 * pitch_radius * math.sin((crossings.max() - crossings.min()) / 2)
+
+    # The measurement over pins
+    pin_radius = row['pin_diameter'] / 2
+    opposite = teeth // 2
+    factor = 1 if teeth % 2 == 0 else math.cos(math.pi / (2 * teeth))
+
+    # The radius of the centers of the pins, and the angle between the
+    # radial line through a center and the normals to the flanks
+    center_radius = ((row['over_pins'] - row['pin_diameter']) / 2) / factor
+    sin_normal = math.sqrt(1 - (base_radius / center_radius) ** 2)
+
+    # The angle subtended by each flank
+    flank_angles = [numpy.arctan2(p[[0, -1], 1], p[[0, -1], 0]).mean() for p in flanks]
+
+    over_pins = row['over_pins']
+
+    for j in (0, opposite):
+        angle = 2 * math.pi * j / teeth
+        center = numpy.array([[center_radius * math.cos(angle), center_radius * math.sin(angle)]])
+
+        # Only the flanks of the space in which the pin sits (and those of 
+        # the neighboring spaces) are tested
+        edges = [('polyline', p) for p, a in zip(flanks, flank_angles)
+                 if abs((a - angle + math.pi) % (2 * math.pi) - math.pi) < 3 * math.pi / teeth]
+
+        distance = diff.get_distances(center, edges)[0]
+
+        # A pin which is too small for the space sinks towards the center
+        over_pins -= (distance - pin_radius) / sin_normal * factor
+
+    return span, chordal_thickness, over_pins
+
+def get_inspection_sheet(gears, kerf = 0, approximation_steps = gear.Gear.DEFAULT_APPROXIMATION_STEPS,
+                         span_teeth = None, pin_diameter = None, check = True):
+    """
+    Calculate the inspection dimensions of a list of gears, and measure them on the generated geometry.
+
+    :param gears: A list of gear.Gear objects (external gears).
+    :param kerf: The kerf (a number, or a list with a kerf for each gear).
+    :param approximation_steps: The number of steps used to approximate the involute.
+    :param span_teeth: The number of teeth spanned by the span measurement (see ``get_dimensions``).
+    :param pin_diameter: The diameter of the pins (see ``get_dimensions``).
+    :param check: True to measure the dimensions on the geometry of each gear.
+
+    :raises: An Exception if a gear is an internal gear.
+    :returns: A NumPy structured array with the fields in ``DIMENSION_FIELDS``
+        and ``MEASURED_FIELDS`` and a row for each gear (the measured fields
+        are not numbers if ``check`` is False).
+
+    """
+
+    for g in gears:
+        if isinstance(g, gear.InternalGear):
+            raise Exception('Inspection dimensions can only be calculated for external gears.')
+
+    dimensions = get_dimensions([g.pitch for g in gears],
+                                [g.teeth for g in gears],
+                                [g.pressure_angle for g in gears],
+                                [g.addendum_factor for g in gears],
+                                [g.profile_shift for g in gears],
+                                kerf, span_teeth, pin_diameter)
+
+    sheet = numpy.empty(len(gears), dtype=DIMENSION_FIELDS + MEASURED_FIELDS)
+
+    for name, dtype in DIMENSION_FIELDS:
+        sheet[name] = dimensions[name]
+
+    for name, dtype in MEASURED_FIELDS:
+        sheet[name] = numpy.nan
+
+    if check:
+        for i, g in enumerate(gears):
+            geom = g.get_geometry(approximation_steps, sheet['kerf'][i])
+            sheet['measured_span'][i], sheet['measured_chordal_thickness'][i], sheet['measured_over_pins'][i] = measure(geom, sheet[i], g.get_form_diameter())
+
+    return sheet
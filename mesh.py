@@ -0,0 +1,675 @@
+"""
+Contains functionality for analyzing pairs of meshing gears.
+
+``analyze_pairs`` screens pairs of external gears for contact ratio, tip
+interference and undercut without generating them. Every parameter may be
+an array (the arrays are broadcast together), and the results are returned
+as a NumPy structured array with a row for each pair, so large numbers of
+candidate pairs can be screened at once:
+
+    pairs = mesh.analyze_pairs(teeth_1=numpy.arange(12, 41)[:, None],
+                               teeth_2=numpy.arange(12, 121),
+                               pitch=48, pressure_angle=20)
+
+    good = pairs[(pairs['contact_ratio'] > 1.4) & ~pairs['undercut_1'] & ~pairs['interference_1']]
+    print good['teeth_1'], good['teeth_2']
+
+The dimensions of the gears are calculated in the same way as by
+gear.Gear (e.g. ``get_outside_diameter`` and ``get_root_diameter``).
+
+"""
+
+import math
+
+import numpy
+
+from geometry import diff, mass_properties
+import gear
+
+# The fields of the table returned by analyze_pairs
+PAIR_FIELDS = [('teeth_1', float),
+               ('teeth_2', float),
+               ('pitch', float),
+               ('pressure_angle', float),
+               ('addendum_factor', float),
+               ('dedendum_factor', float),
+               ('shift_1', float),
+               ('shift_2', float),
+               ('infeasible', bool),
+               ('center_distance', float),
+               ('operating_pressure_angle', float),
+               ('contact_ratio', float),
+               ('tip_clearance_1', float),
+               ('tip_clearance_2', float),
+               ('interference_1', bool),
+               ('interference_2', bool),
+               ('undercut_1', bool),
+               ('undercut_2', bool)]
+
+def analyze_pairs(teeth_1, teeth_2, pitch, pressure_angle,
+                  addendum_factor = gear.Gear.DEFAULT_ADDENDUM,
+                  dedendum_factor = gear.Gear.DEFAULT_DEDENDUM,
+                  shift_1 = 0, shift_2 = 0):
+    """
+    Analyze pairs of external gears, meshing without backlash.
+
+    The table contains the parameters of each pair and the following values:
+
+    * ``infeasible``: True if the gears cannot mesh without backlash at any
+      center distance (the sum of their profile shifts is too negative).
+      The remaining values of such a pair are NaN (or False), so that the
+      other pairs can still be analyzed.
+    * ``center_distance`` and ``operating_pressure_angle`` (in degrees), see
+      gear.get_center_distance.
+    * ``contact_ratio``: the average number of pairs of teeth in contact,
+      i.e. the length of the path of contact divided by the base pitch.
+      Where there is interference, this is the ratio which the involutes
+      would have if they were not cut short.
+    * ``tip_clearance_1``: the radial clearance between the tips of the
+      second gear and the root circle of the first gear (and vice versa for
+      ``tip_clearance_2``). A negative clearance means that the tips strike
+      the roots.
+    * ``interference_1``: True if the tips of the second gear contact the
+      first gear inside its base circle, where its flank is not an involute
+      (and vice versa for ``interference_2``).
+    * ``undercut_1``: True if the first gear has too few teeth for its
+      profile shift, so that the rack which generates it would cut away the
+      bottom of its flanks (and similarly for ``undercut_2``).
+
+    :param teeth_1: The number of teeth of the first gear.
+    :param teeth_2: The number of teeth of the second gear.
+    :param pitch: The pitch.
+    :param pressure_angle: The pressure angle, in degrees.
+    :param addendum_factor: The addendum factor of both gears.
+    :param dedendum_factor: The dedendum factor of both gears.
+    :param shift_1: The profile shift coefficient of the first gear.
+    :param shift_2: The profile shift coefficient of the second gear.
+
+    :returns: A NumPy structured array with the fields in ``PAIR_FIELDS``,
+        with the shape of the broadcast parameters.
+
+    """
+
+    params = numpy.broadcast_arrays(*[numpy.asarray(v, dtype=float) for v in
+                                      (teeth_1, teeth_2, pitch, pressure_angle,
+                                       addendum_factor, dedendum_factor, shift_1, shift_2)])
+
+    table = numpy.empty(params[0].shape, dtype=PAIR_FIELDS)
+
+    for (name, dtype), values in zip(PAIR_FIELDS, params):
+        table[name] = values
+
+    teeth_1, teeth_2, pitch, pressure_angle, addendum_factor, dedendum_factor, shift_1, shift_2 = params
+
+    alpha = pressure_angle * math.pi / 180
+
+    # The parameters are solved as arrays (even for a single pair), so that
+    # infeasible pairs are given NaN rather than raising an exception
+    shape = params[0].shape
+    flat = [v.reshape(-1) for v in (pitch, teeth_1, teeth_2, pressure_angle, shift_1, shift_2)]
+
+    operating_angle = gear.get_operating_pressure_angle(*flat[1:]).reshape(shape)
+    center_distance = gear.get_center_distance(*flat).reshape(shape)
+    infeasible = numpy.isnan(center_distance)
+
+    # The radii of each gear (see gear.Gear)
+    pitch_radius_1 = teeth_1 / pitch / 2
+    pitch_radius_2 = teeth_2 / pitch / 2
+
+    base_radius_1 = pitch_radius_1 * numpy.cos(alpha)
+    base_radius_2 = pitch_radius_2 * numpy.cos(alpha)
+
+    outside_radius_1 = pitch_radius_1 + (addendum_factor + shift_1) / pitch
+    outside_radius_2 = pitch_radius_2 + (addendum_factor + shift_2) / pitch
+
+    root_radius_1 = base_radius_1 - (dedendum_factor - shift_1) / pitch
+    root_radius_2 = base_radius_2 - (dedendum_factor - shift_2) / pitch
+
+    # The line of action is tangent to the base circles; the distance
+    # between the points of tangency
+    line_of_action = numpy.where(infeasible, numpy.inf, center_distance * numpy.sin(numpy.radians(operating_angle)))
+
+    # The distance from the point at which each base circle is tangent to
+    # the line of action to the point at which the outside circle crosses it
+    approach_1 = numpy.sqrt(outside_radius_1 ** 2 - base_radius_1 ** 2)
+    approach_2 = numpy.sqrt(outside_radius_2 ** 2 - base_radius_2 ** 2)
+
+    base_pitch = math.pi * numpy.cos(alpha) / pitch
+
+    table['infeasible'] = infeasible
+    table['center_distance'] = center_distance
+    table['operating_pressure_angle'] = operating_angle
+    table['contact_ratio'] = numpy.where(infeasible, numpy.nan, (approach_1 + approach_2 - line_of_action) / base_pitch)
+    table['tip_clearance_1'] = center_distance - outside_radius_2 - root_radius_1
+    table['tip_clearance_2'] = center_distance - outside_radius_1 - root_radius_2
+    table['interference_1'] = approach_2 > line_of_action
+    table['interference_2'] = approach_1 > line_of_action
+
+    # A gear is undercut when the addendum line of the generating rack is
+    # beyond the point at which the line of action is tangent to the base
+    # circle, i.e. when (addendum - shift) / pitch > pitch radius * sin^2(alpha)
+    sin_2 = numpy.sin(alpha) ** 2
+    table['undercut_1'] = (addendum_factor - shift_1) / pitch > pitch_radius_1 * sin_2
+    table['undercut_2'] = (addendum_factor - shift_2) / pitch > pitch_radius_2 * sin_2
+
+    return table
+
+# The fields of the table returned by MeshSimulation.run
+SIMULATION_FIELDS = [('angle', float),
+                     ('clearance', float),
+                     ('overlap', bool),
+                     ('drive_gap', float),
+                     ('coast_gap', float),
+                     ('backlash', float),
+                     ('contact_x', float),
+                     ('contact_y', float)]
+
+# The number of segments (of either gear, summed over the steps) which are
+# placed at once by MeshSimulation.run
+_BATCH_SEGMENTS = 1 << 18
+
+def _get_segments(geom, arc_resolution):
+    """
+    Approximate the contours of a geometry by line segments, with the material on the left of each segment.
+
+    :returns: A tuple in the form ``(starts, ends, outer)``, where ``starts``
+        and ``ends`` are (n, 2) arrays of the ends of the segments and
+        ``outer`` is True for the segments of outer contours (e.g. not of a bore).
+
+    """
+
+    contours = mass_properties.get_contours(geom)
+    depths = mass_properties.get_contour_depths(contours)
+
+    starts = []
+    ends = []
+    outer = []
+
+    for contour, depth in zip(contours, depths):
+        points = diff.get_samples(contour, arc_resolution)
+
+        if (points[-1] != points[0]).any():
+            points = numpy.concatenate((points, points[:1]))
+
+        # Outer contours are counterclockwise and holes are clockwise
+        area = (points[:-1, 0] * points[1:, 1] - points[1:, 0] * points[:-1, 1]).sum()
+
+        if (area < 0) == (depth % 2 == 0):
+            points = points[::-1]
+
+        # Where edges join, the samples are repeated (to within rounding)
+        lengths = numpy.hypot(*(points[1:] - points[:-1]).T)
+        points = numpy.concatenate((points[:1], points[1:][lengths > lengths.max() * mass_properties.DEFAULT_RELATIVE_TOLERANCE]))
+
+        starts.append(points[:-1])
+        ends.append(points[1:])
+        outer.append(numpy.repeat(depth == 0, len(points) - 1))
+
+    return numpy.concatenate(starts), numpy.concatenate(ends), numpy.concatenate(outer)
+
+def _get_tooth_angle(segments, teeth):
+    """
+    Find the angle of the center line of a tooth, assuming that the teeth are symmetric.
+
+    The segments of the outer contours beyond the middle of the teeth are
+    summed as vectors at ``teeth`` times their angles, so that every tooth
+    contributes in the same direction.
+
+    """
+
+    starts, ends, outer = segments
+
+    midpoints = (starts[outer] + ends[outer]) / 2
+    lengths = numpy.hypot(*(ends[outer] - starts[outer]).T)
+
+    radii = numpy.hypot(midpoints[:, 0], midpoints[:, 1])
+    tips = radii >= (radii.min() + radii.max()) / 2
+
+    angles = numpy.arctan2(midpoints[tips, 1], midpoints[tips, 0]) * teeth
+
+    return math.atan2((lengths[tips] * numpy.sin(angles)).sum(), (lengths[tips] * numpy.cos(angles)).sum()) / teeth
+
+def _transform(points, angles, offsets):
+    """
+    Rotate each of an (n, 2) array of points about the origin by its own angle, then translate it by its own offset.
+
+    """
+
+    c = numpy.cos(angles)
+    s = numpy.sin(angles)
+
+    return numpy.column_stack((points[:, 0] * c - points[:, 1] * s + offsets[:, 0],
+                               points[:, 0] * s + points[:, 1] * c + offsets[:, 1]))
+
+def _get_radial_extents(starts, ends):
+    """
+    Get the smallest and largest distances from the origin to each segment.
+
+    """
+
+    d = ends - starts
+    t = numpy.clip(-(starts * d).sum(axis=1) / (d * d).sum(axis=1), 0, 1)
+
+    return (numpy.hypot(starts[:, 0] + t * d[:, 0], starts[:, 1] + t * d[:, 1]),
+            numpy.maximum(numpy.hypot(starts[:, 0], starts[:, 1]), numpy.hypot(ends[:, 0], ends[:, 1])))
+
+def _get_pairs(keys, lows, highs):
+    """
+    Find the keys which are within each of a list of ranges.
+
+    :returns: A tuple of two arrays, the index of each key which is found and the index of the range which contains it.
+
+    """
+
+    order = numpy.argsort(keys)
+    sorted_keys = keys[order]
+
+    first = numpy.searchsorted(sorted_keys, lows, 'left')
+    counts = numpy.maximum(numpy.searchsorted(sorted_keys, highs, 'right') - first, 0)
+
+    ends = numpy.cumsum(counts)
+    total = ends[-1] if len(ends) > 0 else 0
+
+    return order[numpy.repeat(first - ends + counts, counts) + numpy.arange(total)], numpy.repeat(numpy.arange(len(lows)), counts)
+
+def _get_group_minima(groups, values, count):
+    """
+    Find the smallest value in each group.
+
+    :param groups: The group of each value, from 0 to ``count - 1``.
+
+    :returns: A tuple of two arrays with an element for each group, the
+        smallest value (inf for an empty group) and its index (-1 for an empty group).
+
+    """
+
+    minima = numpy.full(count, numpy.inf)
+    indices = numpy.full(count, -1, dtype=int)
+
+    if len(values) == 0:
+        return minima, indices
+
+    # The values are usually produced in the order of their groups already
+    if (groups[1:] >= groups[:-1]).all():
+        order = numpy.arange(len(groups))
+    else:
+        order = numpy.argsort(groups, kind='mergesort')
+
+    sorted_groups = groups[order]
+    sorted_values = values[order]
+
+    starts = numpy.flatnonzero(numpy.concatenate(([True], sorted_groups[1:] != sorted_groups[:-1])))
+    group_minima = numpy.minimum.reduceat(sorted_values, starts)
+
+    # The first value in each group which equals the smallest
+    counts = numpy.diff(numpy.append(starts, len(groups)))
+    found = numpy.flatnonzero(sorted_values == numpy.repeat(group_minima, counts))
+    found = found[numpy.concatenate(([True], sorted_groups[found[1:]] != sorted_groups[found[:-1]]))]
+
+    minima[sorted_groups[starts]] = group_minima
+    indices[sorted_groups[found]] = order[found]
+
+    return minima, indices
+
+def _get_arc_gaps(points, point_steps, starts, ends, segment_steps, direction, scale):
+    """
+    Find the signed angles through which points must turn about the origin to meet a set of segments.
+
+    Each point is only tested against the segments of the same step which
+    span its distance from the origin. A point outside the material meets it
+    after a positive (drive) or negative (coast) rotation. A point inside
+    the material has passed the crossing which is nearest along its circle,
+    so the gap on that side is negative (the rotation which separates them).
+
+    :param points: An (m, 2) array of points.
+    :param point_steps: The step of each point.
+    :param starts: An (n, 2) array of the starts of the segments (with the material on their left).
+    :param ends: An (n, 2) array of the ends of the segments.
+    :param segment_steps: The step of each segment.
+    :param direction: 1 if the angles are rotations of the points, or -1 if
+        they are rotations of the segments.
+    :param scale: A distance greater than twice the distance from the origin to any point or segment.
+
+    :returns: A tuple in the form ``(drive, coast, contacts)``, where
+        ``drive`` is the signed rotation to the nearest crossing on the
+        positive side of each point, ``coast`` is the signed magnitude of
+        the rotation to the nearest on the negative side (either may be inf
+        if no rotation brings them together), and ``contacts`` is an (m, 2)
+        array of the points at which the circles meet the segments on the
+        drive side.
+
+    """
+
+    drive = numpy.full(len(points), numpy.inf)
+    coast = numpy.full(len(points), numpy.inf)
+    contacts = numpy.zeros((len(points), 2))
+
+    radii = numpy.hypot(points[:, 0], points[:, 1])
+    lows, highs = _get_radial_extents(starts, ends)
+
+    i, j = _get_pairs(point_steps * scale + radii, segment_steps * scale + lows, segment_steps * scale + highs)
+
+    # The pairs are sorted by point, so that the crossings of each point are together
+    order = numpy.argsort(i, kind='mergesort')
+    i = i[order]
+    j = j[order]
+
+    # Solve |f + t d|^2 = r^2 for t; a circle which only touches a segment
+    # does not cross it
+    fx = starts[:, 0][j]
+    fy = starts[:, 1][j]
+    dx = ends[:, 0][j] - fx
+    dy = ends[:, 1][j] - fy
+
+    a = dx * dx + dy * dy
+    b = fx * dx + fy * dy
+    c = fx * fx + fy * fy - radii[i] ** 2
+
+    root = numpy.sqrt(numpy.maximum(b * b - a * c, 0))
+    crossed = root > 0
+
+    if not crossed.any():
+        return drive, coast, contacts
+
+    i, fx, fy, dx, dy, a, b, root = [v[crossed] for v in (i, fx, fy, dx, dy, a, b, root)]
+
+    # Both crossings of each circle (in columns), the near one along the segment first
+    t = numpy.column_stack(((-b - root) / a, (-b + root) / a))
+    x = (fx[:, None] + t * dx[:, None]).reshape(-1)
+    y = (fy[:, None] + t * dy[:, None]).reshape(-1)
+    valid = ((t >= 0) & (t <= 1)).reshape(-1)
+
+    # The rotation which takes each point to the crossing, in [-pi, pi]
+    i = numpy.repeat(i, 2)
+    px = points[:, 0][i]
+    py = points[:, 1][i]
+    gaps = direction * numpy.arctan2(px * y - py * x, px * x + py * y)
+
+    positive, ahead = _get_group_minima(i, numpy.where(valid & (gaps >= 0), gaps, numpy.inf), len(points))
+    negative, behind = _get_group_minima(i, numpy.where(valid & (gaps < 0), -gaps, numpy.inf), len(points))
+
+    # The far crossing (the second column) enters the material when the
+    # points turn forwards. A point is inside the material if the crossing
+    # ahead of it leaves the material (or the crossing behind it enters).
+    entering_ahead = (ahead % 2 == 1) == (direction > 0)
+    entering_behind = (behind % 2 == 1) == (direction > 0)
+
+    inside = numpy.where(numpy.isfinite(positive), ~entering_ahead, numpy.isfinite(negative) & entering_behind)
+    passed = inside & (negative < positive)
+
+    drive = numpy.where(inside, numpy.where(passed, -negative, numpy.inf), positive)
+    coast = numpy.where(inside, numpy.where(passed, numpy.inf, -positive), negative)
+
+    nearest = numpy.where(passed, behind, ahead)
+    contacts = numpy.column_stack((x[nearest], y[nearest]))
+
+    return drive, coast, contacts
+
+def _get_distances(points, point_steps, starts, ends, segment_steps, bounds, scale):
+    """
+    Find the smallest distance from the points to the segments at each step, where it is within the bound of the step.
+
+    :param bounds: The largest distance which is searched at each step (the
+        steps whose bound is -inf are not searched).
+
+    :returns: An array with the smallest distance at each step (inf if none is found).
+
+    """
+
+    lows, highs = _get_radial_extents(starts, ends)
+    reach = bounds[segment_steps]
+
+    # The distance from a point to a segment is at least the difference
+    # between their distances from the origin
+    i, j = _get_pairs(point_steps * scale + numpy.hypot(points[:, 0], points[:, 1]),
+                      segment_steps * scale + numpy.maximum(lows - reach, 0),
+                      segment_steps * scale + numpy.minimum(highs + reach, scale / 2))
+
+    d = ends - starts
+    dx = d[:, 0][j]
+    dy = d[:, 1][j]
+    ox = points[:, 0][i] - starts[:, 0][j]
+    oy = points[:, 1][i] - starts[:, 1][j]
+    t = numpy.clip((ox * dx + oy * dy) / (d * d).sum(axis=1)[j], 0, 1)
+
+    return _get_group_minima(segment_steps[j], numpy.hypot(ox - t * dx, oy - t * dy), len(bounds))[0]
+
+class MeshSimulation:
+    """
+    A kinematic simulation of a pair of gears meshing, e.g. to verify that the
+    profiles generated by gear.Gear.get_geometry (with a kerf) mesh with the
+    expected backlash.
+
+    The first gear is centered at the origin and the second at
+    ``(center_distance, 0)``. The first gear drives, turning through a
+    positive angle (from the x-axis towards the y-axis), and the second turns
+    the other way at the ratio of the numbers of teeth. At each step, the
+    second gear is in its nominal position, and the following are found:
+
+    * ``clearance``: the smallest distance between the profiles.
+    * ``overlap``: True if the profiles overlap (a vertex of one is inside
+      the other), in which case the clearance is 0.
+    * ``drive_gap``: the angle through which the second gear would have to
+      turn back (in the positive direction) to touch the driving flank of
+      the first gear, i.e. the angle by which it lags when it is driven. The
+      variation of this angle is the transmission error.
+    * ``coast_gap``: the angle through which the second gear would have to
+      turn forwards to touch the first gear.
+    * ``backlash``: the sum of the gaps, i.e. the angle through which the
+      second gear can turn while the first is held.
+    * ``contact_x`` and ``contact_y``: the point at which the driving flanks
+      touch.
+
+    Where the profiles overlap, the gap on the side of the overlap is
+    negative: it is the rotation of the second gear which separates them on
+    that side. If the teeth are too thick to fit at the center distance
+    (e.g. with a kerf), both gaps and the backlash are negative.
+
+    The angles are in radians, and the gaps and backlash are angles of the
+    second gear (multiply them by its pitch radius for distances along the
+    pitch circle).
+
+    The profiles are approximated by line segments (arcs are sampled at
+    ``arc_resolution``), and only the segments near the line of centers are
+    tested at each step. The steps of ``run`` are simulated in batches, in
+    which each point is only tested against the segments at about the same
+    distance from the center of the second gear.
+
+    """
+
+    def __init__(self, geom_1, teeth_1, geom_2, teeth_2, center_distance, phase = None,
+                 arc_resolution = diff.DEFAULT_ARC_RESOLUTION):
+        """
+        :param geom_1: The geometry.primitives.Geometry object of the first (driving) gear, centered at the origin.
+        :param teeth_1: The number of teeth of the first gear.
+        :param geom_2: The geometry of the second gear, centered at the origin.
+        :param teeth_2: The number of teeth of the second gear.
+        :param center_distance: The distance between the centers of the gears.
+        :param phase: The angle of the second gear when the first gear is at 0 (by default, the
+            angle at which a tooth of the first gear and a space of the second are symmetric
+            about the line of centers at the same time, so that symmetric teeth are centered in the spaces).
+        :param arc_resolution: The maximum angle between the samples of an arc.
+
+        :raises: An Exception if the items of a geometry do not form closed contours.
+        """
+
+        self.teeth_1 = teeth_1
+        self.teeth_2 = teeth_2
+        self.center_distance = float(center_distance)
+
+        self.segments_1 = _get_segments(geom_1, arc_resolution)
+        self.segments_2 = _get_segments(geom_2, arc_resolution)
+
+        self.outside_radius_1 = self._get_outside_radius(self.segments_1)
+        self.outside_radius_2 = self._get_outside_radius(self.segments_2)
+
+        if phase == None:
+            phase = self._get_symmetric_phase()
+
+        self.phase = phase
+
+    def _get_outside_radius(self, segments):
+        return numpy.hypot(segments[0][:, 0], segments[0][:, 1]).max()
+
+    def _get_symmetric_phase(self):
+        """
+        Get the phase at which a space of the second gear faces the first gear when a tooth of the first faces the second.
+
+        """
+
+        pitch_2 = 2 * math.pi / self.teeth_2
+
+        # When the first gear is turned so that a tooth is on the line of
+        # centers, the second gear is turned by the ratio of the teeth
+        phase = (math.pi - pitch_2 / 2 - _get_tooth_angle(self.segments_2, self.teeth_2) -
+                 _get_tooth_angle(self.segments_1, self.teeth_1) * self.teeth_1 / float(self.teeth_2))
+
+        return phase - pitch_2 * round(phase / pitch_2)
+
+    def _get_window(self, segments, turns, offsets, centers, reach):
+        """
+        Place the segments of a gear at each step, and select those within ``reach`` of the center of the other gear.
+
+        :param turns: The angle of the gear at each step.
+        :param offsets: An array of the center of the gear at each step.
+        :param centers: An array of the center of the other gear at each step.
+
+        :returns: A tuple in the form ``(starts, ends, steps)``, the placed segments and the step of each.
+        """
+
+        starts, ends = segments[:2]
+
+        midpoints = (starts + ends) / 2
+        half_lengths = numpy.hypot(*(ends - starts).T) / 2
+
+        c = numpy.cos(turns)[:, None]
+        s = numpy.sin(turns)[:, None]
+
+        x = midpoints[:, 0] * c - midpoints[:, 1] * s + (offsets[:, 0] - centers[:, 0])[:, None]
+        y = midpoints[:, 0] * s + midpoints[:, 1] * c + (offsets[:, 1] - centers[:, 1])[:, None]
+
+        steps, selected = numpy.nonzero(numpy.hypot(x, y) - half_lengths <= reach)
+
+        return (_transform(starts[selected], turns[steps], offsets[steps]),
+                _transform(ends[selected], turns[steps], offsets[steps]), steps)
+
+    def _get_steps(self, angles):
+        """
+        Simulate the gears at each of an array of angles of the first gear.
+
+        The steps are simulated in the frame of the second gear, in which it
+        is centered at the origin without being turned.
+
+        :returns: The rows of the table (see ``run``).
+        """
+
+        count = len(angles)
+        angles_2 = self.phase - angles * self.teeth_1 / float(self.teeth_2)
+
+        # The angle and the center of the first gear in the frame of the second
+        turns = angles - angles_2
+        centers = numpy.column_stack((-self.center_distance * numpy.cos(angles_2),
+                                      self.center_distance * numpy.sin(angles_2)))
+
+        origins = numpy.zeros((count, 2))
+
+        # Points of the second gear only meet the first gear inside its
+        # outside circle, and points of the first gear only meet the second
+        # inside its outside circle. The second gear turns by at most half of
+        # an angular pitch before it meets the first, so only the segments
+        # within that distance of the outside circles are tested.
+        travel = self.outside_radius_2 * math.pi / self.teeth_2
+
+        starts_1, ends_1, steps_1 = self._get_window(self.segments_1, turns, centers, origins, self.outside_radius_2)
+        starts_2, ends_2, steps_2 = self._get_window(self.segments_2, numpy.zeros(count), origins, centers,
+                                                     self.outside_radius_1 + travel)
+
+        # The steps are kept apart when the points and segments are sorted by
+        # their distance from the origin
+        scale = 2 * (self.center_distance + self.outside_radius_1 + self.outside_radius_2)
+
+        # Turn the points of the second gear towards the first, and the
+        # first gear's points (equivalently) the opposite way. The point of
+        # the second gear meets the first gear on its circle, and the point
+        # of the first gear is met where it is.
+        drive_2, coast_2, contacts_2 = _get_arc_gaps(starts_2, steps_2, starts_1, ends_1, steps_1, 1, scale)
+        drive_1, coast_1, contacts_1 = _get_arc_gaps(starts_1, steps_1, starts_2, ends_2, steps_2, -1, scale)
+
+        point_steps = numpy.concatenate((steps_2, steps_1))
+        drive_gaps = numpy.concatenate((drive_2, drive_1))
+        coast_gaps = numpy.concatenate((coast_2, coast_1))
+        contacts = numpy.concatenate((contacts_2, starts_1, [(numpy.nan, numpy.nan)]))
+
+        drive, nearest = _get_group_minima(point_steps, drive_gaps, count)
+        coast = _get_group_minima(point_steps, coast_gaps, count)[0]
+        overlap = (drive < 0) | (coast < 0)
+
+        # Without overlap, the distance which each point turns to meet the
+        # other gear bounds the clearance
+        radii = numpy.hypot(*numpy.concatenate((starts_2, starts_1)).T)
+        bounds = _get_group_minima(point_steps, radii * numpy.minimum(numpy.abs(drive_gaps), numpy.abs(coast_gaps)), count)[0]
+        bounds[overlap] = -numpy.inf
+
+        # Only the points and segments of the second gear within the bound
+        # of the outside circle of the first can be nearer than the bound
+        reach = self.outside_radius_1 + bounds[steps_2]
+        midpoints = (starts_2 + ends_2) / 2 - centers[steps_2]
+
+        near_points = numpy.hypot(*(starts_2 - centers[steps_2]).T) <= reach
+        near_segments = numpy.hypot(*midpoints.T) - numpy.hypot(*(ends_2 - starts_2).T) / 2 <= reach
+
+        clearance = numpy.minimum(_get_distances(starts_1, steps_1, starts_2[near_segments], ends_2[near_segments],
+                                                 steps_2[near_segments], bounds, scale),
+                                  _get_distances(starts_2[near_points], steps_2[near_points], starts_1, ends_1, steps_1,
+                                                 bounds, scale))
+        clearance[overlap] = 0
+
+        contacts = _transform(contacts[nearest], angles_2, origins + (self.center_distance, 0))
+        contacts[~numpy.isfinite(drive)] = numpy.nan
+
+        table = numpy.empty(count, dtype=SIMULATION_FIELDS)
+        table['angle'] = angles
+        table['clearance'] = clearance
+        table['overlap'] = overlap
+        table['drive_gap'] = drive
+        table['coast_gap'] = coast
+        table['backlash'] = drive + coast
+        table['contact_x'] = contacts[:, 0]
+        table['contact_y'] = contacts[:, 1]
+
+        return table
+
+    def get_step(self, angle):
+        """
+        Simulate the gears with the first gear at a given angle.
+
+        :param angle: The angle of the first gear, in radians.
+
+        :returns: A row of the table (see ``run``).
+        """
+
+        return self._get_steps(numpy.array([angle], dtype=float))[0]
+
+    def run(self, steps = 360, revolutions = 1):
+        """
+        Simulate the gears as the first gear turns.
+
+        The steps are simulated together, in batches of about
+        ``_BATCH_SEGMENTS`` segments.
+
+        :param steps: The number of steps per revolution of the first gear.
+        :param revolutions: The number of revolutions of the first gear.
+
+        :returns: A NumPy structured array with the fields in ``SIMULATION_FIELDS`` and a row for each step.
+        """
+
+        count = int(steps * revolutions)
+        angles = numpy.arange(count) * 2 * math.pi / steps
+
+        table = numpy.empty(count, dtype=SIMULATION_FIELDS)
+        batch = max(1, _BATCH_SEGMENTS // max(len(self.segments_1[0]), len(self.segments_2[0])))
+
+        for i in range(0, count, batch):
+            table[i:i + batch] = self._get_steps(angles[i:i + batch])
+
+        return table
@@ -17,10 +17,10 @@ def generate_circles():
     MARGIN = 25
     
     # A collection of circle geometry
-    geom = primitives.Geometry([])
+    geom_builder = primitives.GeometryBuilder()
     
     # A collection of the boundary geometry of each circle
-    bounds_geom = primitives.Geometry([])
+    bounds_geom_builder = primitives.GeometryBuilder()
     
     width = 2 * MARGIN + 2 * RADII[-1]
     x = MARGIN + RADII[-1]
@@ -30,16 +30,19 @@ def generate_circles():
         y += r
         
         c = primitives.Circle((x,y), r)
-        geom.items.append(c)
+        geom_builder.add(c)
         
         bounds = c.get_bounds()
-        bounds_geom.items.append(primitives.Rect(bounds[0], (bounds[1][0]-bounds[0][0], bounds[1][1]-bounds[0][1])))
+        bounds_geom_builder.add(primitives.Rect(bounds[0], (bounds[1][0]-bounds[0][0], bounds[1][1]-bounds[0][1])))
         
         y += r
         y += MARGIN
     
     height = y
     
+    geom = geom_builder.build()
+    bounds_geom = bounds_geom_builder.build()
+    
     tree = svg_utils.get_svg_tree()
     root = tree.getroot()
     
@@ -72,8 +75,8 @@ def generate_polygons():
     RADIUS = 100
     POLYGON_MARGIN = 25
     
-    geom = primitives.Geometry([])
-    bounds_geom = primitives.Geometry([])
+    geom_builder = primitives.GeometryBuilder()
+    bounds_geom_builder = primitives.GeometryBuilder()
     
     sides = range(MIN_NUM_SIDES, MAX_NUM_SIDES+1)
     
@@ -92,16 +95,19 @@ def generate_polygons():
             points.append((_x,_y))
         points.append((points[0][0], points[0][1]))
         line = primitives.Polyline(points)
-        geom.items.append(line)
+        geom_builder.add(line)
         
         bounds = line.get_bounds()
-        bounds_geom.items.append(primitives.Rect(bounds[0], (bounds[1][0]-bounds[0][0], bounds[1][1]-bounds[0][1])))
+        bounds_geom_builder.add(primitives.Rect(bounds[0], (bounds[1][0]-bounds[0][0], bounds[1][1]-bounds[0][1])))
         
     rows = int(math.ceil(len(sides)/float(COLS)))
         
     width = 2*POLYGON_MARGIN + RADIUS + (2*RADIUS + POLYGON_MARGIN)*COLS
     height = 2*POLYGON_MARGIN + RADIUS + (2*RADIUS + POLYGON_MARGIN)*rows
     
+    geom = geom_builder.build()
+    bounds_geom = bounds_geom_builder.build()
+    
     tree = svg_utils.get_svg_tree()
     root = tree.getroot()
     
@@ -136,9 +142,9 @@ def generate_arcs():
     start_angles = range(0, 360, 45)
     sweep_angles = range(45, 360, 45)
     
-    geom = primitives.Geometry([])
-    bounds_geom = primitives.Geometry([])
-    point_geom = primitives.Geometry([])
+    geom_builder = primitives.GeometryBuilder()
+    bounds_geom_builder = primitives.GeometryBuilder()
+    point_geom_builder = primitives.GeometryBuilder()
     
     for i in range(len(start_angles)):
         for j in range(len(sweep_angles)):
@@ -149,20 +155,24 @@ def generate_arcs():
             end_angle = (start_angles[i] + sweep_angles[j]) * math.pi / 180
             
             a = primitives.Arc((x,y), RADIUS, start_angle, end_angle)
-            geom.items.append(a)
+            geom_builder.add(a)
             
-            point_geom.items.append(primitives.Circle((x, y), POINT_RADIUS))
-            point_geom.items.append(primitives.Circle(a.get_start_point(), POINT_RADIUS))
-            point_geom.items.append(primitives.Circle(a.get_end_point(), POINT_RADIUS))
+            point_geom_builder.add(primitives.Circle((x, y), POINT_RADIUS))
+            point_geom_builder.add(primitives.Circle(a.get_start_point(), POINT_RADIUS))
+            point_geom_builder.add(primitives.Circle(a.get_end_point(), POINT_RADIUS))
             
             bounds = a.get_bounds()
             r = primitives.Rect(bounds[0], (bounds[1][0] - bounds[0][0], bounds[1][1] - bounds[0][1]))
-            bounds_geom.items.append(r)
+            bounds_geom_builder.add(r)
     
     
     width = 2*MARGIN + RADIUS + (2*RADIUS + MARGIN)*len(sweep_angles)
     height = 2*MARGIN + RADIUS + (2*RADIUS + MARGIN)*len(start_angles)
     
+    geom = geom_builder.build()
+    bounds_geom = bounds_geom_builder.build()
+    point_geom = point_geom_builder.build()
+    
     tree = svg_utils.get_svg_tree()
     root = tree.getroot()
     
@@ -0,0 +1,187 @@
+"""
+Contains functionality for rebuilding gears when a manifest of their specifications changes.
+
+The manifest is a text file with a line for each gear, containing the
+command line arguments of gear.py (see gear.run_with_args). Blank lines and
+lines starting with ``#`` are ignored:
+
+    # The pinion and the wheel
+    -n 20 -p 48 -a 20 -k 0.005 -b 0.125 -s pinion.svg
+    -n 60 -p 48 -a 20 -k 0.005 -b 0.25 -s wheel.svg -d wheel.dxf
+
+A Watcher polls the manifest and, each time it changes, builds only the
+lines which were added or changed since the last build. The gears are kept
+between builds, so a gear whose parameters are unchanged (e.g. when only
+its kerf, bore or output files change) reuses its cached profile:
+
+    watch.Watcher('gears.txt').run()
+
+This module can be invoked from the command line. For help, use
+
+    python watch.py -h
+
+"""
+
+import argparse
+import os
+import shlex
+import sys
+import time
+
+import gear
+
+# The default number of seconds between polls of the manifest
+DEFAULT_INTERVAL = 1.0
+
+def read_manifest(file_name):
+    """
+    Read the entries of a manifest.
+
+    The arguments of each line are split as by a shell, so lines which
+    differ only in their spacing or quoting are the same entry.
+
+    :param file_name: The name of the manifest.
+
+    :returns: A list of entries, each a tuple of command line arguments, in the order in which they appear.
+    """
+
+    entries = []
+
+    with open(file_name) as f:
+        for line in f:
+            line = line.strip()
+
+            if line == '' or line.startswith('#'):
+                continue
+
+            entries.append(tuple(shlex.split(line)))
+
+    return entries
+
+class Watcher:
+    """
+    Polls a manifest of gears and builds the entries which have changed.
+
+    An entry which fails to build is reported and built again the next time
+    the manifest changes. An entry is not built again if only its output
+    files are changed or removed outside of the manifest.
+
+    """
+
+    def __init__(self, file_name, interval = DEFAULT_INTERVAL, output = sys.stdout):
+        """
+        :param file_name: The name of the manifest.
+        :param interval: The number of seconds between polls of the manifest.
+        :param output: The file to which to report each build.
+        """
+
+        self.file_name = file_name
+        self.interval = interval
+        self.output = output
+
+        # The modification time and size of the manifest when it was last read
+        self._stat = None
+
+        # The entries which have been built, and the gear of each
+        self._built = {}
+
+        # The gears, keyed by their parameters (see gear.run_with_args)
+        self._gears = {}
+
+    def poll(self):
+        """
+        Build the entries which have changed, if the manifest has changed since it was last read.
+
+        :returns: A list of the entries which were built, each in the form
+            ``(entry, error)``, where ``error`` is None if the entry was built
+            successfully, or a message otherwise.
+        """
+
+        try:
+            stat = os.stat(self.file_name)
+        except OSError:
+            # The manifest is being replaced, or has not been created yet
+            return []
+
+        stat = (stat.st_mtime, stat.st_size)
+
+        if stat == self._stat:
+            return []
+
+        self._stat = stat
+
+        return self.build(read_manifest(self.file_name))
+
+    def build(self, entries):
+        """
+        Build the entries which have not already been built, and forget those which are no longer required.
+
+        :param entries: A list of entries (see ``read_manifest``).
+
+        :returns: A list of the entries which were built (see ``poll``).
+        """
+
+        required = set(entries)
+        built = dict((entry, g) for entry, g in self._built.items() if entry in required)
+        results = []
+
+        for entry in entries:
+            if built.has_key(entry):
+                continue
+
+            try:
+                built[entry] = gear.run_with_args(list(entry), self._gears)
+                error = None
+            except SystemExit:
+                # argparse exits after reporting invalid arguments
+                error = 'Invalid arguments.'
+            except Exception as e:
+                error = str(e)
+
+            results.append((entry, error))
+
+            if self.output != None:
+                if error == None:
+                    self.output.write('Built: {0}\n'.format(' '.join(entry)))
+                else:
+                    self.output.write('Failed: {0}: {1}\n'.format(' '.join(entry), error))
+
+                self.output.flush()
+
+        self._built = built
+
+        # Keep only the gears of the entries which are still required
+        gears = set(id(g) for g in built.values())
+        self._gears = dict((key, g) for key, g in self._gears.items() if id(g) in gears)
+
+        return results
+
+    def run(self, polls = None):
+        """
+        Poll the manifest until interrupted.
+
+        :param polls: The number of polls after which to stop (or None to poll indefinitely).
+        """
+
+        count = 0
+
+        while polls == None or count < polls:
+            if count > 0:
+                time.sleep(self.interval)
+
+            self.poll()
+            count += 1
+
+def run_with_args(input_args):
+    parser = argparse.ArgumentParser(description='Rebuild the gears of a manifest when it changes.')
+    parser.add_argument('manifest', type=str, help='The manifest, with a line of gear.py arguments for each gear.')
+    parser.add_argument('--interval', type=float, default=DEFAULT_INTERVAL, help='The number of seconds between polls of the manifest.')
+    args = parser.parse_args(input_args)
+
+    try:
+        Watcher(args.manifest, args.interval).run()
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == '__main__':
+    run_with_args(sys.argv[1:])